@@ -0,0 +1,580 @@
+import operator
+
+from intbase import InterpreterBase
+from inline_cachev2 import InlineCache
+from type_valuev2 import Type, INT_TYPE
+
+
+# Typed nodes for method bodies. ClassDef lowers the parse tree of each method into these once, when it builds the
+# MethodDef, so evaluators dispatch on the node class and read pre-resolved fields instead of re-inspecting parse
+# lists every time a statement runs. Expression nodes hold the line number of their enclosing statement, since
+# that is the line runtime errors are reported at.
+#
+# Each parameter and let local is given a slot, an index into the frame (a list of Values) of a call of the method.
+# Parameters take the first slots; locals of lets that don't overlap share slots.
+#
+# Nodes that check types at runtime have a dynamic_check attribute, True until the static type checker (see
+# typecheckv2.py) proves the check always passes.
+#
+# A few idioms that make up most loops, like (while (< i n) ... (set i (+ i 1))), are lowered into fused nodes
+# (superinstructions) that do the work of several nodes at once. Each is a subclass of the node it replaces and
+# keeps its children, so the type checker treats it like that node. When it runs, a fused node checks once that its
+# operands are ints and takes a direct path if so, and otherwise runs exactly as the node it replaces would.
+#
+# The nodes are the only thing that keeps a method's parse tree alive once it is lowered: each statement keeps the
+# (compact, see sourcev2.py) parse list it was lowered from, because trace_output prints it before the statement
+# runs and the non-boolean if/while errors quote the tokens of the condition. Class and method headers and field
+# definitions are dropped once their ClassDef is built.
+class Node:
+    __slots__ = ("line_num",)
+
+
+class Statement(Node):
+    __slots__ = ("source",)  # the parse tree the statement was lowered from, printed by trace_output
+
+
+# (begin (statement1) (statement2) ... (statementn))
+class BeginStmt(Statement):
+    __slots__ = ("statements",)
+
+    def __init__(self, statements, line_num, source):
+        self.statements = statements
+        self.line_num = line_num
+        self.source = source
+
+
+# a local variable defined by a let; default_value is None if the default isn't a literal, and slot is None if an
+# earlier local of the same let has the same name
+class LocalDef:
+    __slots__ = ("type", "name", "default_value", "slot", "dynamic_check")
+
+    def __init__(self, var_type, name, default_value, slot):
+        self.type = var_type
+        self.name = name
+        self.default_value = default_value
+        self.slot = slot
+        self.dynamic_check = True
+
+
+# (let ((type1 var1 defaultvalue1) ... (typen varn defaultvaluen)) (statement1) ... (statementn))
+class LetStmt(Statement):
+    __slots__ = ("local_defs", "statements")
+
+    def __init__(self, local_defs, statements, line_num, source):
+        self.local_defs = local_defs
+        self.statements = statements
+        self.line_num = line_num
+        self.source = source
+
+
+# (set varname expression); slot and var_type are the slot and type of the parameter or local named name, or None
+# if no parameter or local of that name is in scope
+class SetStmt(Statement):
+    __slots__ = ("name", "expression", "slot", "var_type", "dynamic_check")
+
+    def __init__(self, name, expression, slot, var_type, line_num, source):
+        self.name = name
+        self.expression = expression
+        self.slot = slot
+        self.var_type = var_type
+        self.dynamic_check = True
+        self.line_num = line_num
+        self.source = source
+
+
+# (set local (+ local n)), (set local (+ n local)) or (set local (- local n)), where local is an int parameter or
+# local and n an int literal; amount is the int added to the local
+class IncrementLocalStmt(SetStmt):
+    __slots__ = ("amount",)
+
+    def __init__(self, name, expression, slot, var_type, amount, line_num, source):
+        super().__init__(name, expression, slot, var_type, line_num, source)
+        self.amount = amount
+
+
+# (set field (+ field n)), (set field (+ n field)) or (set field (- field n)), where field is a field of the class
+# and n an int literal; amount is the int added to the field
+class IncrementFieldStmt(SetStmt):
+    __slots__ = ("amount",)
+
+    def __init__(self, name, expression, amount, line_num, source):
+        super().__init__(name, expression, None, None, line_num, source)
+        self.amount = amount
+
+
+# (inputs varname) or (inputi varname); slot and var_type are as for SetStmt
+class InputStmt(Statement):
+    __slots__ = ("name", "is_string", "slot", "var_type", "dynamic_check")
+
+    def __init__(self, name, is_string, slot, var_type, line_num, source):
+        self.name = name
+        self.is_string = is_string
+        self.slot = slot
+        self.var_type = var_type
+        self.dynamic_check = True
+        self.line_num = line_num
+        self.source = source
+
+
+# (if expression (statement) [(statement)]); else_statement is None if there is no else
+class IfStmt(Statement):
+    __slots__ = ("condition", "then_statement", "else_statement", "dynamic_check")
+
+    def __init__(self, condition, then_statement, else_statement, line_num, source):
+        self.condition = condition
+        self.then_statement = then_statement
+        self.else_statement = else_statement
+        self.dynamic_check = True
+        self.line_num = line_num
+        self.source = source
+
+
+# (while expression (statement))
+class WhileStmt(Statement):
+    __slots__ = ("condition", "body", "dynamic_check")
+
+    def __init__(self, condition, body, line_num, source):
+        self.condition = condition
+        self.body = body
+        self.dynamic_check = True
+        self.line_num = line_num
+        self.source = source
+
+
+# (return [expression]); expression is None for a bare return
+class ReturnStmt(Statement):
+    __slots__ = ("expression", "dynamic_check", "tail_call")
+
+    def __init__(self, expression, line_num, source):
+        self.expression = expression
+        self.dynamic_check = True
+        # a returned call is the last thing the method does, so the tree walker can run it in place of the method
+        self.tail_call = isinstance(expression, CallExpr)
+        self.line_num = line_num
+        self.source = source
+
+
+# (print expression1 expression2 ...)
+class PrintStmt(Statement):
+    __slots__ = ("expressions",)
+
+    def __init__(self, expressions, line_num, source):
+        self.expressions = expressions
+        self.line_num = line_num
+        self.source = source
+
+
+# (call object_ref/me/super methodname param1 param2 ...) as a statement
+class CallStmt(Statement):
+    __slots__ = ("call",)
+
+    def __init__(self, call, line_num, source):
+        self.call = call
+        self.line_num = line_num
+        self.source = source
+
+
+# a statement with an unknown keyword, or that is missing parts; reports a syntax error when it runs
+class UnknownStmt(Statement):
+    __slots__ = ("description",)
+
+    def __init__(self, description, line_num, source):
+        self.description = description
+        self.line_num = line_num
+        self.source = source
+
+
+class Expression(Node):
+    __slots__ = ()
+
+
+# a literal that no variable or field of the method can shadow
+class LiteralExpr(Expression):
+    __slots__ = ("value",)
+
+    def __init__(self, value, line_num):
+        self.value = value
+        self.line_num = line_num
+
+
+# a parameter or local, read from its slot of the frame
+class LocalRef(Expression):
+    __slots__ = ("name", "slot", "var_type")
+
+    def __init__(self, name, slot, var_type, line_num):
+        self.name = name
+        self.slot = slot
+        self.var_type = var_type
+        self.line_num = line_num
+
+
+# a field, or a name that isn't a parameter or local in scope. literal is the Value of the name as a literal, used if
+# the object has no field of that name, or None if the name isn't a literal
+class VarRef(Expression):
+    __slots__ = ("name", "literal")
+
+    def __init__(self, name, literal, line_num):
+        self.name = name
+        self.literal = literal
+        self.line_num = line_num
+
+
+# me, when no variable or field named me can shadow it
+class MeExpr(Expression):
+    __slots__ = ()
+
+    def __init__(self, line_num):
+        self.line_num = line_num
+
+
+# (op expression1 expression2); operation is set by the static type checker to the (python function applying the
+# operator to the unboxed operands, function making the result Value from its result), if both operands are known to
+# be of the same primitive type.
+#
+# Otherwise the tree walker quickens the node: the first time it runs, specialization is set to (Type of the left
+# operand, Type of the right operand, function applying the operator to two Values of those types), so later runs
+# with operands of the same types skip straight to the function. If the operands ever have other types,
+# specialization becomes False and the node runs the generic way from then on.
+class BinOpExpr(Expression):
+    __slots__ = ("operator", "left", "right", "operation", "specialization")
+
+    def __init__(self, operator, left, right, line_num):
+        self.operator = operator
+        self.left = left
+        self.right = right
+        self.operation = None
+        self.specialization = None
+        self.line_num = line_num
+
+
+# (op local1 local2) or (op local literal), where op is a comparison and the literal is an int. left_slot and
+# right_slot are the slots of the locals, right_slot being None if the right operand is a literal, and compare is
+# the python function comparing two ints
+class CompareLocalExpr(BinOpExpr):
+    __slots__ = ("left_slot", "right_slot", "compare")
+
+    COMPARISONS = {
+        "==": operator.eq,
+        "!=": operator.ne,
+        "<": operator.lt,
+        "<=": operator.le,
+        ">": operator.gt,
+        ">=": operator.ge,
+    }
+
+    def __init__(self, operator_name, left, right, line_num):
+        super().__init__(operator_name, left, right, line_num)
+        self.left_slot = left.slot
+        self.right_slot = right.slot if isinstance(right, LocalRef) else None
+        self.compare = CompareLocalExpr.COMPARISONS[operator_name]
+
+
+# (op expression)
+class UnaryOpExpr(Expression):
+    __slots__ = ("operator", "operand")
+
+    def __init__(self, operator, operand, line_num):
+        self.operator = operator
+        self.operand = operand
+        self.line_num = line_num
+
+
+# (new classname)
+class NewExpr(Expression):
+    __slots__ = ("class_name", "class_type")
+
+    def __init__(self, class_name, line_num):
+        self.class_name = class_name
+        self.class_type = Type(class_name)
+        self.line_num = line_num
+
+
+# (call object_ref/me/super methodname p1 p2 p3); target is ME or SUPER, or the expression for the object
+class CallExpr(Expression):
+    __slots__ = ("target", "method_name", "args", "inline_cache")
+
+    ME = InterpreterBase.ME_DEF
+    SUPER = InterpreterBase.SUPER_DEF
+
+    def __init__(self, target, method_name, args, line_num):
+        self.target = target
+        self.method_name = method_name
+        self.args = args
+        self.line_num = line_num
+        self.inline_cache = InlineCache()  # how calls made here were resolved, see inline_cachev2.py
+
+
+# a parenthesized expression that isn't an operation, call or new; evaluates to None
+class UnknownExpr(Expression):
+    __slots__ = ()
+
+    def __init__(self, line_num):
+        self.line_num = line_num
+
+
+# raised by MethodLowering on a statement, or an expression in it, that is missing parts or has a list where a name
+# belongs; the statement is lowered into an UnknownStmt
+class MalformedCode(Exception):
+    pass
+
+
+# Lowers the parse tree of a method body into nodes. Names are resolved as far as possible without running the
+# method: parameters and locals in scope become LocalRefs, and a literal or me becomes a LiteralExpr/MeExpr unless a
+# parameter, local in scope or field of the class has the same name. Lowering never fails; anything malformed
+# becomes a node that reports the error when it runs. Literal Values come from literal_pool, a LiteralPool shared by
+# the whole program. params is a list of the VariableDefs of the method's parameters; after lower, frame_size is the
+# number of slots a frame for the method needs, and call_sites lists its CallExprs.
+class MethodLowering:
+    def __init__(self, params, field_names, literal_pool):
+        self.field_names = field_names
+        self.literal_pool = literal_pool
+        # the parameters, and the locals of each enclosing let; each maps a variable name to its (slot, Type)
+        self.scopes = [{}]
+        for slot, param in enumerate(params):
+            self.scopes[0].setdefault(param.name, (slot, param.type))
+        self.next_slot = len(params)  # the first slot not used by a variable in scope
+        self.frame_size = self.next_slot
+        self.call_sites = []
+
+    # returns the node for the method body code
+    def lower(self, code):
+        return self.__lower_statement(code)
+
+    def __lower_statement(self, code):
+        if not isinstance(code, list) or not code or not isinstance(code[0], str):
+            return UnknownStmt(f"unknown statement {code}", getattr(code, "line_num", None), code)
+        lower_handler = MethodLowering.__statement_lowerings.get(code[0])
+        if lower_handler is None:
+            return UnknownStmt("unknown statement " + code[0], code.line_num, code)
+        try:
+            return lower_handler(self, code)
+        except MalformedCode:
+            return UnknownStmt(f"malformed statement {code}", code.line_num, code)
+
+    # raises MalformedCode unless code has at least min_length elements, and the ones at the indexes in name_indexes
+    # are names rather than lists
+    @staticmethod
+    def __check_shape(code, min_length, name_indexes=()):
+        if len(code) < min_length or any(not isinstance(code[index], str) for index in name_indexes):
+            raise MalformedCode()
+
+    # (begin (statement1) (statement2) ... (statementn))
+    def __lower_begin(self, code):
+        return BeginStmt(
+            [self.__lower_statement(statement) for statement in code[1:]], code.line_num, code
+        )
+
+    # (let ((type1 var1 defaultvalue1) ... (typen varn defaultvaluen)) (statement1) ... (statementn))
+    def __lower_let(self, code):
+        MethodLowering.__check_shape(code, 2)
+        if not isinstance(code[1], list):
+            raise MalformedCode()
+        scope = {}
+        first_slot = self.next_slot
+        local_defs = []
+        for var_def in code[1]:
+            if not isinstance(var_def, list):
+                raise MalformedCode()
+            MethodLowering.__check_shape(var_def, 3, (0, 1))
+            var_type = Type(var_def[0])
+            var_name = var_def[1]
+            slot = None
+            if var_name not in scope:
+                slot = self.next_slot
+                self.next_slot += 1
+                scope[var_name] = (slot, var_type)
+            local_defs.append(LocalDef(var_type, var_name, self.__create_literal(var_def[2]), slot))
+        self.frame_size = max(self.frame_size, self.next_slot)
+        self.scopes.append(scope)
+        try:
+            statements = [self.__lower_statement(statement) for statement in code[2:]]
+        finally:
+            self.scopes.pop()
+            self.next_slot = first_slot
+        return LetStmt(local_defs, statements, code.line_num, code)
+
+    # (set varname expression)
+    def __lower_set(self, code):
+        MethodLowering.__check_shape(code, 3, (1,))
+        slot, var_type = self.__resolve_local(code[1])
+        expression = self.__lower_expression(code[2], code.line_num)
+        amount = MethodLowering.__increment_amount(code[1], expression)
+        if amount is not None:
+            if slot is None:
+                if code[1] in self.field_names:
+                    return IncrementFieldStmt(code[1], expression, amount, code.line_num, code)
+            elif var_type is INT_TYPE:
+                return IncrementLocalStmt(code[1], expression, slot, var_type, amount, code.line_num, code)
+        return SetStmt(code[1], expression, slot, var_type, code.line_num, code)
+
+    # returns the int that expression adds to the variable named name if it is (+ name n), (+ n name) or
+    # (- name n) for an int literal n, or None
+    @staticmethod
+    def __increment_amount(name, expression):
+        if type(expression) is not BinOpExpr or expression.operator not in ("+", "-"):
+            return None
+        variable, literal = expression.left, expression.right
+        if expression.operator == "+" and isinstance(variable, LiteralExpr):
+            variable, literal = literal, variable
+        if not isinstance(variable, (LocalRef, VarRef)) or variable.name != name:
+            return None
+        if not isinstance(literal, LiteralExpr) or literal.value.type() is not INT_TYPE:
+            return None
+        if expression.operator == "-":
+            return -literal.value.value()
+        return literal.value.value()
+
+    # (inputs varname)
+    def __lower_inputs(self, code):
+        MethodLowering.__check_shape(code, 2, (1,))
+        return InputStmt(code[1], True, *self.__resolve_local(code[1]), code.line_num, code)
+
+    # (inputi varname)
+    def __lower_inputi(self, code):
+        MethodLowering.__check_shape(code, 2, (1,))
+        return InputStmt(code[1], False, *self.__resolve_local(code[1]), code.line_num, code)
+
+    # (if expression (statement) [(statement)])
+    def __lower_if(self, code):
+        MethodLowering.__check_shape(code, 3)
+        else_statement = None
+        if len(code) == 4:
+            else_statement = self.__lower_statement(code[3])
+        return IfStmt(
+            self.__lower_expression(code[1], code.line_num),
+            self.__lower_statement(code[2]),
+            else_statement,
+            code.line_num,
+            code,
+        )
+
+    # (while expression (statement))
+    def __lower_while(self, code):
+        MethodLowering.__check_shape(code, 3)
+        return WhileStmt(
+            self.__lower_expression(code[1], code.line_num),
+            self.__lower_statement(code[2]),
+            code.line_num,
+            code,
+        )
+
+    # (return [expression])
+    def __lower_return(self, code):
+        expression = None
+        if len(code) > 1:
+            expression = self.__lower_expression(code[1], code.line_num)
+        return ReturnStmt(expression, code.line_num, code)
+
+    # (print expression1 expression2 ...)
+    def __lower_print(self, code):
+        return PrintStmt(
+            [self.__lower_expression(expr, code.line_num) for expr in code[1:]],
+            code.line_num,
+            code,
+        )
+
+    # (call object_ref/me/super methodname param1 param2 ...)
+    def __lower_call_statement(self, code):
+        return CallStmt(self.__lower_call(code, code.line_num), code.line_num, code)
+
+    def __lower_expression(self, expr, line_num):
+        if not isinstance(expr, list):
+            return self.__lower_name(expr, line_num)
+        if not expr or not isinstance(expr[0], str):
+            return UnknownExpr(line_num)
+        lower_handler = MethodLowering.__expression_lowerings.get(expr[0])
+        if lower_handler is None:
+            return UnknownExpr(line_num)
+        return lower_handler(self, expr, line_num)
+
+    # a variable, field, literal or me; locals shadow parameters, and both shadow fields
+    def __lower_name(self, name, line_num):
+        slot, var_type = self.__resolve_local(name)
+        if slot is not None:
+            return LocalRef(name, slot, var_type, line_num)
+        literal = self.__create_literal(name)
+        if name in self.field_names:
+            return VarRef(name, literal, line_num)
+        if literal is not None:
+            return LiteralExpr(literal, line_num)
+        if name == InterpreterBase.ME_DEF:
+            return MeExpr(line_num)
+        return VarRef(name, None, line_num)
+
+    # returns the (slot, Type) of the innermost parameter or local named name, or (None, None)
+    def __resolve_local(self, name):
+        for scope in reversed(self.scopes):
+            if name in scope:
+                return scope[name]
+        return None, None
+
+    def __create_literal(self, token):
+        try:
+            return self.literal_pool.get(token)
+        except (ValueError, TypeError, IndexError):  # not a well formed literal
+            return None
+
+    # (op expression1 expression2)
+    def __lower_binary_operation(self, expr, line_num):
+        MethodLowering.__check_shape(expr, 3)
+        left = self.__lower_expression(expr[1], line_num)
+        right = self.__lower_expression(expr[2], line_num)
+        if (
+            expr[0] in CompareLocalExpr.COMPARISONS
+            and isinstance(left, LocalRef)
+            and (
+                isinstance(right, LocalRef)
+                or isinstance(right, LiteralExpr) and right.value.type() is INT_TYPE
+            )
+        ):
+            return CompareLocalExpr(expr[0], left, right, line_num)
+        return BinOpExpr(expr[0], left, right, line_num)
+
+    # (op expression)
+    def __lower_unary_operation(self, expr, line_num):
+        MethodLowering.__check_shape(expr, 2)
+        return UnaryOpExpr(expr[0], self.__lower_expression(expr[1], line_num), line_num)
+
+    # (new classname)
+    def __lower_new(self, expr, line_num):
+        MethodLowering.__check_shape(expr, 2, (1,))
+        return NewExpr(expr[1], line_num)
+
+    # (call object_ref/me/super methodname p1 p2 p3)
+    def __lower_call(self, expr, line_num):
+        MethodLowering.__check_shape(expr, 3)
+        target_name = expr[1]
+        if target_name == InterpreterBase.ME_DEF:
+            target = CallExpr.ME
+        elif target_name == InterpreterBase.SUPER_DEF:
+            target = CallExpr.SUPER
+        else:
+            target = self.__lower_expression(target_name, line_num)
+        call = CallExpr(
+            target,
+            expr[2],
+            [self.__lower_expression(arg, line_num) for arg in expr[3:]],
+            line_num,
+        )
+        self.call_sites.append(call)
+        return call
+
+    __statement_lowerings = {
+        InterpreterBase.BEGIN_DEF: __lower_begin,
+        InterpreterBase.SET_DEF: __lower_set,
+        InterpreterBase.IF_DEF: __lower_if,
+        InterpreterBase.CALL_DEF: __lower_call_statement,
+        InterpreterBase.WHILE_DEF: __lower_while,
+        InterpreterBase.RETURN_DEF: __lower_return,
+        InterpreterBase.INPUT_STRING_DEF: __lower_inputs,
+        InterpreterBase.INPUT_INT_DEF: __lower_inputi,
+        InterpreterBase.PRINT_DEF: __lower_print,
+        InterpreterBase.LET_DEF: __lower_let,
+    }
+    __expression_lowerings = dict.fromkeys(
+        ["+", "-", "*", "/", "%", "==", "!=", "<", "<=", ">", ">=", "&", "|"],
+        __lower_binary_operation,
+    )
+    __expression_lowerings["!"] = __lower_unary_operation
+    __expression_lowerings[InterpreterBase.CALL_DEF] = __lower_call
+    __expression_lowerings[InterpreterBase.NEW_DEF] = __lower_new
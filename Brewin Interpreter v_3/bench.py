@@ -0,0 +1,742 @@
+"""
+Micro-benchmarks for the Brewin interpreter; usage: python3 bench.py <suite>
+"""
+
+import gc
+import glob
+import os
+import random
+import resource
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import inline_cachev2
+import sourcev2
+from bparser import BParser
+from inline_cachev2 import InlineCache
+from interpreterv2 import Interpreter
+from type_valuev2 import LiteralPool, Type, TypeManager, create_value
+
+
+def best_of(func, repeat=5):
+    """Run func repeat times; return the fastest wall-clock time in seconds."""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+
+def generate_large_program(num_classes, string_len):
+    """Generate a syntactically valid program with many classes and long string literals."""
+    literal = '"' + "x" * string_len + '"'
+    lines = []
+    for i in range(num_classes):
+        lines.append(f"(class c{i}  # generated class {i}\n")
+        lines.append(f"  (field string s {literal})\n")
+        lines.append("  (method int f ((int a) (int b))\n")
+        lines.append("    (begin\n")
+        lines.append(f"      (print {literal} a b)\n")
+        lines.append("      (return (+ (* a 2) (- b 1)))\n")
+        lines.append("    )\n")
+        lines.append("  )\n")
+        lines.append(")\n")
+    lines.append("(class main (method void main () (print (call (new c0) f 1 2))))\n")
+    return lines
+
+
+def bench_parse():
+    """Compare the regex tokenizer of sourcev2 against BParser's char-by-char tokenizer."""
+    for num_classes, string_len in ((2000, 10), (200, 10000), (20, 200000)):
+        lines = generate_large_program(num_classes, string_len)
+        size = sum(len(line) for line in lines)
+        regex_time = best_of(lambda: sourcev2.parse(lines))
+        legacy_time = best_of(lambda: BParser.parse(lines))
+        print(
+            f"{num_classes:5} classes, {string_len:6}-char strings ({size / 1e6:6.2f} MB): "
+            f"regex {regex_time * 1000:9.1f} ms, legacy {legacy_time * 1000:9.1f} ms, "
+            f"speedup {legacy_time / regex_time:5.1f}x"
+        )
+
+
+def retained_bytes(func):
+    """Return the number of bytes still allocated by func's result after it returns."""
+    gc.collect()  # so garbage left by earlier measurements isn't freed during this one
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    result = func()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del result
+    return after - before
+
+
+def parse_corpus(programs, compact):
+    """Parse every program; the parse trees are returned so they stay alive for measurement."""
+    return [sourcev2.parse(lines, compact) for lines in programs]
+
+
+def bench_memory():
+    """Compare parse tree footprint of StringWithLineNumber tokens vs compact SourceLists."""
+    corpora = []
+    for version in (1, 2, 3):
+        programs = []
+        for srcfile in sorted(glob.glob(f"v{version}/**/*.brewin", recursive=True)):
+            with open(srcfile, encoding="utf-8") as handle:
+                programs.append(handle.readlines())
+        corpora.append((f"v{version} corpus ({len(programs)} programs)", programs))
+    corpora.append(("generated (2000 classes)", [generate_large_program(2000, 10)]))
+    for name, programs in corpora:
+        tokens = retained_bytes(lambda: parse_corpus(programs, False))
+        compact = retained_bytes(lambda: parse_corpus(programs, True))
+        print(
+            f"{name:32}: StringWithLineNumber {tokens / 1024:9.1f} KiB, "
+            f"compact {compact / 1024:9.1f} KiB, saved {100 - compact * 100 / tokens:4.1f}%"
+        )
+
+
+def counted_loop_program(iterations):
+    """A tight counted while loop, the shape of nearly every loop in our programs."""
+    return [
+        "(class main\n",
+        "  (method void main ()\n",
+        "    (let ((int i 0) (int n 0) (int total 0))\n",
+        f"      (set n {iterations})\n",
+        "      (while (< i n)\n",
+        "        (begin\n",
+        "          (set total (+ total i))\n",
+        "          (set i (+ i 1))\n",
+        "        )\n",
+        "      )\n",
+        "      (print total)\n",
+        "    )\n",
+        "  )\n",
+        ")\n",
+    ]
+
+
+def field_loop_program(iterations):
+    """A counted while loop that keeps its counter and running total in fields."""
+    return [
+        "(class main\n",
+        "  (field int i 0)\n",
+        "  (field int total 0)\n",
+        "  (method void main ()\n",
+        "    (begin\n",
+        f"      (while (< i {iterations})\n",
+        "        (begin\n",
+        "          (set total (+ total 3))\n",
+        "          (set i (+ i 1))\n",
+        "        )\n",
+        "      )\n",
+        "      (print total)\n",
+        "    )\n",
+        "  )\n",
+        ")\n",
+    ]
+
+
+def method_call_program(iterations):
+    """A loop that calls a small method on another object every iteration."""
+    return [
+        "(class counter\n",
+        "  (field int total 0)\n",
+        "  (method void add ((int amount)) (set total (+ total amount)))\n",
+        "  (method int get () (return total))\n",
+        ")\n",
+        "(class main\n",
+        "  (method void main ()\n",
+        "    (let ((int i 0) (counter c null))\n",
+        "      (set c (new counter))\n",
+        f"      (while (< i {iterations})\n",
+        "        (begin\n",
+        "          (call c add i)\n",
+        "          (set i (+ i 1))\n",
+        "        )\n",
+        "      )\n",
+        "      (print (call c get))\n",
+        "    )\n",
+        "  )\n",
+        ")\n",
+    ]
+
+
+def recursion_program(depth):
+    """Doubly recursive fibonacci; makes about 1.6^depth method calls."""
+    return [
+        "(class main\n",
+        "  (method int fib ((int n))\n",
+        "    (begin\n",
+        "      (if (< n 2) (return n))\n",
+        "      (return (+ (call me fib (- n 1)) (call me fib (- n 2))))\n",
+        "    )\n",
+        "  )\n",
+        f"  (method void main () (print (call me fib {depth})))\n",
+        ")\n",
+    ]
+
+
+def run_program(lines, **interpreter_options):
+    """Run a program to completion with console output disabled; return its output."""
+    interpreter = Interpreter(False, None, False, **interpreter_options)
+    interpreter.run(lines)
+    return interpreter.get_output()
+
+
+def bench_loop():
+    """Measure statement/expression dispatch throughput on tight counted loops."""
+    iterations = 20000
+    for name, lines in (
+        ("counted loop", counted_loop_program(iterations)),
+        ("counted loop on fields", field_loop_program(iterations)),
+    ):
+        elapsed = best_of(lambda: run_program(lines), 3)
+        print(
+            f"{name:22}, {iterations} iterations: {elapsed * 1000:8.1f} ms, "
+            f"{iterations / elapsed:10.0f} iterations/s"
+        )
+
+
+def bench_engines():
+    """Compare the throughput of each execution engine on loop- and call-heavy programs."""
+    workloads = [
+        ("counted loop (20000 iterations)", counted_loop_program(20000)),
+        ("method calls (10000 calls)", method_call_program(10000)),
+        ("recursive fib(18)", recursion_program(18)),
+    ]
+    engines = [
+        Interpreter.TREE_ENGINE,
+        Interpreter.CLOSURE_ENGINE,
+        Interpreter.BYTECODE_ENGINE,
+        Interpreter.TRANSPILER_ENGINE,
+        Interpreter.TIERED_ENGINE,
+    ]
+    for name, lines in workloads:
+        expected = run_program(lines)
+        timings = []
+        for engine in engines:
+            if run_program(lines, engine=engine) != expected:
+                raise RuntimeError(f"engine {engine} produced the wrong output for {name}")
+            timings.append(best_of(lambda: run_program(lines, engine=engine), 3))
+        print(
+            f"{name:34}: "
+            + ", ".join(
+                f"{engine} {elapsed * 1000:7.1f} ms ({timings[0] / elapsed:4.1f}x)"
+                for engine, elapsed in zip(engines, timings)
+            )
+        )
+
+
+def bench_tiered():
+    """Show which methods the tiered engine promotes, and its speed for a range of call thresholds."""
+    workloads = [
+        ("method calls (10000 calls)", method_call_program(10000)),
+        ("recursive fib(18)", recursion_program(18)),
+    ]
+    for name, lines in workloads:
+        tree_time = best_of(lambda: run_program(lines), 3)
+        print(f"{name}: tree {tree_time * 1000:.1f} ms")
+        for threshold in (1, 50, 1000, 100000):
+            options = {"engine": Interpreter.TIERED_ENGINE, "jit_threshold": threshold}
+            elapsed = best_of(lambda: run_program(lines, **options), 3)
+            interpreter = Interpreter(False, None, False, **options)
+            interpreter.run(lines)
+            engine = interpreter.execution_engine
+            print(
+                f"  threshold {threshold:6}: {elapsed * 1000:7.1f} ms ({tree_time / elapsed:4.1f}x), "
+                f"{len(engine.promoted_methods())} methods promoted, "
+                f"compiled in {engine.compile_seconds() * 1000:.2f} ms"
+            )
+            for line in engine.report():
+                print("    " + line)
+
+
+class UnsharedLiteralPool(LiteralPool):
+    """A literal pool that creates a new Value for every occurrence of a literal, as if there were no pool."""
+
+    def get(self, token):
+        return create_value(token)
+
+
+def load_corpus(version):
+    """Return (name, lines) for each test program of the given language version."""
+    corpus = []
+    for srcfile in sorted(glob.glob(f"v{version}/**/*.brewin", recursive=True)):
+        with open(srcfile, encoding="utf-8") as handle:
+            corpus.append((srcfile, handle.readlines()))
+    return corpus
+
+
+def compile_corpus(corpus, pool_class):
+    """Compile every program with literals resolved through pool_class; return the Programs that compiled."""
+    programs = []
+    for _, lines in corpus:
+        interpreter = Interpreter(False)
+        interpreter.literal_pool = pool_class()
+        try:
+            programs.append(interpreter.compile(lines))
+        except RuntimeError:  # the program has a syntax or type error
+            pass
+    return programs
+
+
+def run_corpus(corpus, pool_class):
+    """Run every program with literals resolved through pool_class, with console output disabled."""
+    for srcfile, lines in corpus:
+        input_file = srcfile[: -len(".brewin")] + ".in"
+        inp = None
+        if os.path.exists(input_file):
+            with open(input_file, encoding="utf-8") as handle:
+                inp = handle.read().splitlines()
+        interpreter = Interpreter(False, inp)
+        interpreter.literal_pool = pool_class()
+        try:
+            interpreter.run(lines)
+        except RuntimeError:  # the program reports an error, as some tests expect
+            pass
+
+
+def peak_bytes(func):
+    """Return the peak number of bytes allocated while func runs, after a warm-up run."""
+    func()
+    gc.collect()
+    tracemalloc.start()
+    func()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak
+
+
+def bench_literals():
+    """Measure the memory saved by sharing one Value per distinct literal through the LiteralPool."""
+    for version in (2, 3):
+        corpus = load_corpus(version)
+        name = f"v{version} corpus ({len(corpus)} programs)"
+        unshared = retained_bytes(lambda: compile_corpus(corpus, UnsharedLiteralPool))
+        shared = retained_bytes(lambda: compile_corpus(corpus, LiteralPool))
+        print(
+            f"{name:26} compiled: unshared literals {unshared / 1024:8.1f} KiB, "
+            f"pooled {shared / 1024:8.1f} KiB, saved {100 - shared * 100 / unshared:4.1f}%"
+        )
+        unshared = peak_bytes(lambda: run_corpus(corpus, UnsharedLiteralPool))
+        shared = peak_bytes(lambda: run_corpus(corpus, LiteralPool))
+        print(
+            f"{name:26} run peak: unshared literals {unshared / 1024:8.1f} KiB, "
+            f"pooled {shared / 1024:8.1f} KiB, saved {100 - shared * 100 / unshared:4.1f}%"
+        )
+
+
+def dispatch_program(depth, num_receiver_classes, iterations):
+    """Calls through one call site on objects of num_receiver_classes classes of a chain of depth classes."""
+    lines = [
+        "(class shape0\n",
+        "  (method int kind () (return 0))\n",
+        "  (method int base_value () (return 1))\n",
+        ")\n",
+    ]
+    for level in range(1, depth):
+        lines.append(f"(class shape{level} inherits shape{level - 1}\n")
+        lines.append(f"  (method int kind () (return {level}))\n")
+        lines.append(")\n")
+    receivers = [depth - 1 - i for i in range(num_receiver_classes)]
+    lines.append("(class main\n")
+    for i in range(num_receiver_classes):
+        lines.append(f"  (field shape0 s{i} null)\n")
+    lines.append("  (method int visit ((shape0 s)) (return (+ (call s kind) (call s base_value))))\n")
+    lines.append("  (method void main ()\n")
+    lines.append("    (let ((int i 0) (int total 0))\n")
+    for i, level in enumerate(receivers):
+        lines.append(f"      (set s{i} (new shape{level}))\n")
+    lines.append(f"      (while (< i {iterations})\n")
+    lines.append("        (begin\n")
+    for i in range(num_receiver_classes):
+        lines.append(f"          (set total (+ total (call me visit s{i})))\n")
+    lines.append("          (set i (+ i 1))\n")
+    lines.append("        )\n")
+    lines.append("      )\n")
+    lines.append("      (print total)\n")
+    lines.append("    )\n")
+    lines.append("  )\n")
+    lines.append(")\n")
+    return lines
+
+
+def bench_dispatch():
+    """Compare method dispatch with and without inline caches on inheritance hierarchies of different depths."""
+    calls = 12000
+    limit = InlineCache.POLYMORPHIC_LIMIT
+    for depth, num_receiver_classes in ((8, 1), (8, 3), (8, 6), (64, 1), (64, 6)):
+        iterations = calls // num_receiver_classes
+        lines = dispatch_program(depth, num_receiver_classes, iterations)
+        expected = run_program(lines)
+        InlineCache.POLYMORPHIC_LIMIT = 0  # every call site goes megamorphic on its first call
+        try:
+            if run_program(lines) != expected:
+                raise RuntimeError("dispatch without inline caches produced the wrong output")
+            uncached = best_of(lambda: run_program(lines), 3)
+        finally:
+            InlineCache.POLYMORPHIC_LIMIT = limit
+        cached = best_of(lambda: run_program(lines), 3)
+        interpreter = Interpreter(False, None, False)
+        interpreter.run(lines)
+        hits, misses = inline_cachev2.totals(interpreter.class_index)
+        print(
+            f"depth {depth:2}, {num_receiver_classes} receiver classes, {calls} visits: uncached {uncached * 1000:7.1f} ms, "
+            f"cached {cached * 1000:7.1f} ms ({uncached / cached:4.2f}x), "
+            f"{hits} hits, {misses} misses ({hits * 100 / (hits + misses):5.1f}% hit rate)"
+        )
+        for line in inline_cachev2.report(interpreter.class_index):
+            print("    " + line)
+
+
+def type_hierarchy(shape, num_classes):
+    """Return a TypeManager holding num_classes classes in a deep chain, a wide fan or a binary tree, unfrozen."""
+    type_manager = TypeManager()
+    type_manager.add_class_type("c0", None)
+    for i in range(1, num_classes):
+        if shape == "deep":
+            superclass = i - 1
+        elif shape == "wide":
+            superclass = 0
+        else:
+            superclass = (i - 1) // 2
+        type_manager.add_class_type(f"c{i}", f"c{superclass}")
+    return type_manager
+
+
+def bench_subtypes():
+    """Compare subtype tests walking the supertype chain against the frozen hierarchy encoding."""
+    num_classes = 10000
+    rng = random.Random(42)
+    queries = [
+        (f"c{rng.randrange(num_classes)}", f"c{rng.randrange(num_classes)}") for _ in range(2000)
+    ]
+    for shape in ("deep", "wide", "binary tree"):
+        type_manager = type_hierarchy(shape, num_classes)
+        walked = [type_manager.is_a_subtype(supertype, subtype) for supertype, subtype in queries]
+        walk_time = best_of(
+            lambda: [type_manager.is_a_subtype(supertype, subtype) for supertype, subtype in queries], 3
+        )
+        freeze_time = best_of(type_manager.freeze, 3)
+        if [type_manager.is_a_subtype(supertype, subtype) for supertype, subtype in queries] != walked:
+            raise RuntimeError(f"the frozen {shape} hierarchy answered a subtype test differently")
+        frozen_time = best_of(
+            lambda: [type_manager.is_a_subtype(supertype, subtype) for supertype, subtype in queries], 3
+        )
+        print(
+            f"{shape:11} ({num_classes} classes), {len(queries)} tests: walk {walk_time * 1000:8.2f} ms, "
+            f"frozen {frozen_time * 1000:6.2f} ms ({walk_time / frozen_time:6.1f}x), "
+            f"freeze {freeze_time * 1000:6.2f} ms"
+        )
+
+
+def count_types(func):
+    """Run func; return (number of Type(...) calls it made, number of distinct Type objects they returned)."""
+    original_new = Type.__new__
+    types = []
+
+    def counting_new(cls, type_name):
+        type_obj = original_new(cls, type_name)
+        types.append(type_obj)
+        return type_obj
+
+    Type.__new__ = staticmethod(counting_new)
+    try:
+        func()
+    finally:
+        Type.__new__ = original_new
+    return len(types), len({id(type_obj) for type_obj in types})
+
+
+def bench_types():
+    """Count the Types loop-heavy programs ask for; with interning, each distinct type is allocated once."""
+    workloads = [
+        ("counted loop (20000 iterations)", counted_loop_program(20000)),
+        ("method calls (10000 calls)", method_call_program(10000)),
+        ("recursive fib(18)", recursion_program(18)),
+        ("dispatch (12000 visits)", dispatch_program(8, 3, 4000)),
+    ]
+    for name, lines in workloads:
+        calls, distinct = count_types(lambda: run_program(lines))
+        elapsed = best_of(lambda: run_program(lines), 3)
+        print(f"{name:32}: {calls:6} Type() calls, {distinct:3} Type objects, {elapsed * 1000:7.1f} ms")
+
+
+def arithmetic_program(iterations):
+    """A counted loop doing five int operations per iteration, three of whose results are small."""
+    return [
+        "(class main\n",
+        "  (method void main ()\n",
+        "    (let ((int i 0) (int total 0))\n",
+        f"      (while (< i {iterations})\n",
+        "        (begin\n",
+        "          (set total (+ total (% (* i 3) 7)))\n",
+        "          (set i (+ i 1))\n",
+        "        )\n",
+        "      )\n",
+        "      (print total)\n",
+        "    )\n",
+        "  )\n",
+        ")\n",
+    ]
+
+
+def linked_list_program(length):
+    """Builds a linked list of length nodes, each holding an int, a bool and a string field, then walks it."""
+    return [
+        "(class node\n",
+        "  (field int value 0)\n",
+        "  (field bool even false)\n",
+        '  (field string label "")\n',
+        "  (field node next null)\n",
+        "  (method void init ((int v) (node n))\n",
+        '    (begin (set value v) (set even (== (% v 2) 0)) (set label "n") (set next n)))\n',
+        "  (method int value () (return value))\n",
+        "  (method node next () (return next))\n",
+        ")\n",
+        "(class main\n",
+        "  (method void main ()\n",
+        "    (let ((int i 0) (int total 0) (node head null) (node n null))\n",
+        f"      (while (< i {length})\n",
+        "        (begin (set n (new node)) (call n init i head) (set head n) (set i (+ i 1))))\n",
+        "      (while (!= head null)\n",
+        "        (begin (set total (+ total (call head value))) (set head (call head next))))\n",
+        "      (print total)\n",
+        "    )\n",
+        "  )\n",
+        ")\n",
+    ]
+
+
+def report_rss_and_time(workload, size):
+    """Run one workload in this process; print its running time and the process's peak RSS in KiB."""
+    lines = {"arithmetic": arithmetic_program, "linked list": linked_list_program}[workload](size)
+    baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    elapsed = best_of(lambda: run_program(lines), 3)
+    print(elapsed, baseline, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+
+
+def bench_values():
+    """Measure ops/sec of an arithmetic loop, and peak RSS of programs holding many Values, each in a new process."""
+    for workload, size, ops_per_unit in (("arithmetic", 50000, 5), ("linked list", 10000, None)):
+        result = subprocess.run(
+            [sys.executable, "-c", f"import bench; bench.report_rss_and_time({workload!r}, {size})"],
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        elapsed, baseline, peak = (float(field) for field in result.stdout.split())
+        throughput = f", {ops_per_unit * size / elapsed:10.0f} ops/s" if ops_per_unit else ""
+        print(
+            f"{workload:11} ({size}): {elapsed * 1000:7.1f} ms{throughput}, "
+            f"peak RSS {peak / 1024:6.1f} MiB ({(peak - baseline) / 1024:5.1f} MiB while running)"
+        )
+
+
+def deep_class_program(depth, count):
+    """Creates count objects of a class derived depth - 1 times from a base class, each class with one field."""
+    lines = ["(class level0 (field int f0 0) (method int get0 () (return f0)))\n"]
+    for level in range(1, depth):
+        lines.append(
+            f"(class level{level} inherits level{level - 1} (field int f{level} {level}) "
+            f"(method int get{level} () (return f{level})))\n"
+        )
+    lines += [
+        "(class main\n",
+        "  (method void main ()\n",
+        f"    (let ((int i 0) (level{depth - 1} obj null))\n",
+        f"      (while (< i {count}) (begin (set obj (new level{depth - 1})) (set i (+ i 1))))\n",
+        f"      (print (call obj get{depth - 1}) (call obj get0))\n",
+        "    )\n",
+        "  )\n",
+        ")\n",
+    ]
+    return lines
+
+
+def bench_objects():
+    """Measure the time and memory it takes to create objects, and count the objects of each class created."""
+    count = 5000
+    for depth in (1, 10, 30):
+        lines = deep_class_program(depth, count)
+        elapsed = best_of(lambda: run_program(lines), 3)
+        interpreter = Interpreter(False)
+        program = interpreter.compile(lines)
+        main_class = program.class_index[f"level{depth - 1}"]
+        objects = []
+
+        def create_objects():
+            objects.extend(interpreter.instantiate(main_class.get_name(), None) for _ in range(1000))
+            return objects
+
+        interpreter.run(program)
+        size = retained_bytes(create_objects)
+        print(
+            f"depth {depth:2}, {count} objects: {elapsed * 1000:7.1f} ms ({count / elapsed:8.0f} objects/s), "
+            f"{size / len(objects):7.0f} bytes per object"
+        )
+    lines = linked_list_program(count)
+    elapsed = best_of(lambda: run_program(lines), 3)
+    interpreter = Interpreter(False, None, False)
+    interpreter.run(lines)
+    allocations = ", ".join(
+        f"{class_def.get_name()} {class_def.num_allocations}" for class_def in interpreter.class_index.values()
+    )
+    print(f"linked list ({count} nodes): {elapsed * 1000:7.1f} ms, objects created: {allocations}")
+
+
+def tail_recursion_program(depth, tail):
+    """Sums 1..depth recursively, with the recursive call in tail position if tail is set."""
+    if tail:
+        recurse = "(return (call me sum (- n 1) (+ acc n)))"
+    else:
+        recurse = "(return (+ 0 (call me sum (- n 1) (+ acc n))))"
+    return [
+        "(class main\n",
+        "  (method int sum ((int n) (int acc))\n",
+        f"    (begin (if (== n 0) (return acc)) {recurse})\n",
+        "  )\n",
+        f"  (method void main () (print (call me sum {depth} 0)))\n",
+        ")\n",
+    ]
+
+
+def mutual_recursion_program(depth):
+    """Decides whether depth is even with two objects that call each other in tail position."""
+    return [
+        "(class parity\n",
+        "  (field parity other null)\n",
+        "  (field bool zero_result true)\n",
+        "  (method void init ((parity o) (bool z)) (begin (set other o) (set zero_result z)))\n",
+        "  (method bool test ((int n))\n",
+        "    (begin (if (== n 0) (return zero_result)) (return (call other test (- n 1))))\n",
+        "  )\n",
+        ")\n",
+        "(class main\n",
+        "  (method void main ()\n",
+        "    (let ((parity even null) (parity odd null))\n",
+        "      (set even (new parity))\n",
+        "      (set odd (new parity))\n",
+        "      (call even init odd true)\n",
+        "      (call odd init even false)\n",
+        f"      (print (call even test {depth}))\n",
+        "    )\n",
+        "  )\n",
+        ")\n",
+    ]
+
+
+def bench_tailcalls():
+    """Show how deep tail and non-tail recursion can go on the tree walker, and how fast it runs."""
+    workloads = [
+        ("non-tail recursion", lambda depth: tail_recursion_program(depth, False)),
+        ("tail recursion", lambda depth: tail_recursion_program(depth, True)),
+        ("mutual tail recursion", mutual_recursion_program),
+    ]
+    for name, program in workloads:
+        for depth in (50, 1000, 100000):
+            lines = program(depth)
+            try:
+                elapsed = best_of(lambda: run_program(lines), 3)
+            except RecursionError:
+                print(f"{name:22} depth {depth:6}: exceeds the python recursion limit")
+                continue
+            print(f"{name:22} depth {depth:6}: {elapsed * 1000:7.1f} ms ({depth / elapsed:8.0f} calls/s)")
+
+
+def bench_depth():
+    """Show how deep non-tail recursion can go on the tree walker and on the bytecode engine's call stack."""
+    for engine in (Interpreter.TREE_ENGINE, Interpreter.BYTECODE_ENGINE):
+        for depth in (50, 1000, 99990, 200000):
+            lines = tail_recursion_program(depth, False)
+            try:
+                elapsed = best_of(lambda: run_program(lines, engine=engine), 1)
+            except RecursionError:
+                print(f"{engine:8} depth {depth:6}: exceeds the python recursion limit")
+                continue
+            except RuntimeError as error:
+                print(f"{engine:8} depth {depth:6}: {error}")
+                continue
+            print(f"{engine:8} depth {depth:6}: {elapsed * 1000:7.1f} ms ({depth / elapsed:8.0f} calls/s)")
+
+
+def untyped_operands_program(iterations):
+    """A loop whose operations the static type checker can't type: the result of get, which returns an int in one
+    class and a string in another, and comparisons of object references."""
+    return [
+        "(class counter (method int get ((int i)) (return i)))\n",
+        '(class label (method string get ((int i)) (return "x")))\n',
+        "(class main\n",
+        "  (method void main ()\n",
+        "    (let ((int i 0) (int total 0) (counter c null) (counter other null))\n",
+        "      (set c (new counter))\n",
+        f"      (while (< i {iterations})\n",
+        "        (begin\n",
+        "          (set total (+ total (call c get i)))\n",
+        "          (if (!= c other) (if (== other null) (if (!= c null) (set i (+ i 1)))))\n",
+        "        )\n",
+        "      )\n",
+        "      (print total)\n",
+        "    )\n",
+        "  )\n",
+        ")\n",
+    ]
+
+
+def bench_quickening():
+    """Measure the tree walker on operations whose operand types are only known at runtime (see BinOpExpr)."""
+    iterations = 20000
+    lines = untyped_operands_program(iterations)
+    elapsed = best_of(lambda: run_program(lines), 5)
+    print(
+        f"untyped operands, {iterations} iterations: {elapsed * 1000:8.1f} ms, "
+        f"{iterations / elapsed:10.0f} iterations/s"
+    )
+
+
+def main():
+    """Entrypoint: select a benchmark suite by name."""
+    if len(sys.argv) < 2:
+        raise ValueError("Error: Missing benchmark suite argument")
+    match sys.argv[1]:
+        case "parse":
+            bench_parse()
+        case "memory":
+            bench_memory()
+        case "loop":
+            bench_loop()
+        case "engines":
+            bench_engines()
+        case "tiered":
+            bench_tiered()
+        case "literals":
+            bench_literals()
+        case "dispatch":
+            bench_dispatch()
+        case "subtypes":
+            bench_subtypes()
+        case "types":
+            bench_types()
+        case "values":
+            bench_values()
+        case "objects":
+            bench_objects()
+        case "tailcalls":
+            bench_tailcalls()
+        case "depth":
+            bench_depth()
+        case "quickening":
+            bench_quickening()
+        case _:
+            raise ValueError(
+                "Unsupported benchmark suite; expect one of parse, memory, loop, engines, tiered, literals, dispatch, subtypes, types, values, objects, tailcalls, depth, quickening"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,780 @@
+import sys
+
+from astv2 import (
+    BeginStmt,
+    LetStmt,
+    SetStmt,
+    IncrementLocalStmt,
+    IncrementFieldStmt,
+    InputStmt,
+    IfStmt,
+    WhileStmt,
+    ReturnStmt,
+    PrintStmt,
+    CallStmt,
+    UnknownStmt,
+    LiteralExpr,
+    LocalRef,
+    VarRef,
+    MeExpr,
+    BinOpExpr,
+    CompareLocalExpr,
+    UnaryOpExpr,
+    NewExpr,
+    CallExpr,
+    UnknownExpr,
+)
+from closurev2 import check_assignment
+from intbase import InterpreterBase, ErrorType
+from operationsv2 import PRIMITIVE_OPERATIONS, BOOL_RESULT_OPERATORS, is_known_type
+from operationsv2 import type_mismatch_description, invalid_default_description, condition_error_description
+from type_valuev2 import INT_TYPE, STRING_TYPE, BOOL_TYPE, Value, create_default_value, VALUE_FACTORIES, int_value, bool_value, string_value
+
+# opcodes. each instruction is an opcode, an argument (None if the opcode takes none) and the line number that
+# errors raised by the instruction are reported at
+LOAD_CONST = 0  # push arg, a prebuilt Value
+LOAD_LOCAL = 1  # push the parameter/local in slot arg
+LOAD_LOCAL_OBJECT = 2  # arg is (slot, Type); push the object variable in slot, giving a null its declared type
+LOAD_FIELD = 3  # push the field in slot arg of the object (see ClassDef.field_slots)
+LOAD_FIELD_OBJECT = 4  # arg is (slot, Type); push the object field, giving a null its declared type
+LOAD_ME = 5  # push a reference to the object running the method
+STORE_LOCAL = 6  # pop a value into slot arg
+STORE_LOCAL_CHECKED = 7  # arg is (slot, Type); pop a value into slot after checking it can be assigned
+STORE_FIELD = 8  # pop a value into the field in slot arg
+STORE_FIELD_CHECKED = 9  # arg is (slot, Type); pop a value into the field after checking it can be assigned
+INPUT_STRING = 10  # push a line of input as a string
+INPUT_INT = 11  # push a line of input as an int
+BINARY_OP = 12  # arg is an operator; pop two operands and push the result of applying the operator
+BINARY_PRIMITIVE = 13  # arg is (operator, python function, result Type, result Value factory) for primitive operands
+UNARY_OP = 14  # arg is an operator; pop an operand and push the result of applying the operator
+NOT = 15  # negate the bool on top of the stack
+NEW = 16  # arg is (class name, Type); push a new instance of the class
+CHECK_NOT_NULL = 17  # report a fault if the object reference on top of the stack is null
+CHECK_SUPER = 18  # report an error if the object running the method has no superclass part
+CALL = 19  # arg is (method name, argument count); pop the arguments and target object, push the result
+CALL_ME = 20  # arg is (method name, argument count); call a method on the object running the method
+CALL_SUPER = 21  # arg is (method name, argument count); call a method on the superclass part of the object
+POP = 22  # discard the value on top of the stack
+PRINT = 23  # pop arg values and print them on one line
+CHECK_BOOL = 24  # report a type error with description arg if the value on top of the stack is not a bool
+POP_JUMP_IF_FALSE = 25  # pop a bool and jump to offset arg if it is false
+JUMP = 26  # jump to offset arg
+RETURN_VALUE = 27  # return the value on top of the stack
+RETURN_CHECKED = 28  # arg is the return Type; check the value on top of the stack can be returned, then return it
+RETURN_DEFAULT = 29  # arg is the return Type; return its default value
+ERROR = 30  # arg is (ErrorType, description); report the error
+TRACE = 31  # arg is a Statement node; print its source before it runs (trace_output mode)
+
+OPCODE_NAMES = [
+    "LOAD_CONST",
+    "LOAD_LOCAL",
+    "LOAD_LOCAL_OBJECT",
+    "LOAD_FIELD",
+    "LOAD_FIELD_OBJECT",
+    "LOAD_ME",
+    "STORE_LOCAL",
+    "STORE_LOCAL_CHECKED",
+    "STORE_FIELD",
+    "STORE_FIELD_CHECKED",
+    "INPUT_STRING",
+    "INPUT_INT",
+    "BINARY_OP",
+    "BINARY_PRIMITIVE",
+    "UNARY_OP",
+    "NOT",
+    "NEW",
+    "CHECK_NOT_NULL",
+    "CHECK_SUPER",
+    "CALL",
+    "CALL_ME",
+    "CALL_SUPER",
+    "POP",
+    "PRINT",
+    "CHECK_BOOL",
+    "POP_JUMP_IF_FALSE",
+    "JUMP",
+    "RETURN_VALUE",
+    "RETURN_CHECKED",
+    "RETURN_DEFAULT",
+    "ERROR",
+    "TRACE",
+]
+JUMP_OPCODES = {POP_JUMP_IF_FALSE, JUMP}
+# opcodes after which execution never falls through to the next instruction
+TERMINAL_OPCODES = {JUMP, RETURN_VALUE, RETURN_CHECKED, RETURN_DEFAULT, ERROR}
+
+CALL_OPCODES = {CALL, CALL_ME, CALL_SUPER}
+
+RETURN_OPCODES = {RETURN_VALUE, RETURN_CHECKED, RETURN_DEFAULT}
+
+
+# The bytecode of one method: three parallel lists holding the opcode, argument and line number of each
+# instruction, plus the number of frame slots the method needs for its parameters and locals
+class CodeObject:
+    def __init__(self, name, num_params, frame_size, ops, args, line_nums, slot_names):
+        self.name = name
+        self.num_params = num_params
+        self.frame_size = frame_size
+        self.ops = ops
+        self.args = args
+        self.line_nums = line_nums
+        self.slot_names = slot_names  # the name(s) of the variables held in each slot, for the disassembler
+
+
+# Execution engine that compiles each method body, the first time it is called, into a flat list of bytecode
+# instructions, and runs it with a single dispatch loop over an operand stack. Nested statements and expressions
+# become jumps and stack operations, and a call saves the state of the calling method on a call stack and carries on
+# in the same loop with the called method, so running a program never recurses in python. How deeply methods can
+# call each other is limited by max_call_depth (no limit if it is None) rather than by python's recursion limit;
+# a call beyond it reports a fault.
+class BytecodeEngine:
+    DEFAULT_MAX_CALL_DEPTH = 100000
+
+    def __init__(self, max_call_depth=DEFAULT_MAX_CALL_DEPTH):
+        self.code_objects = {}  # MethodDef -> CodeObject
+        self.max_call_depth = max_call_depth
+
+    # runs method_def on obj, the ObjectDef part of the class that defines the method; actual_params is a list of
+    # Values that were already checked against the formal parameter types
+    def run_method(self, obj, method_def, actual_params):
+        code = self.code_objects.get(method_def)
+        if code is None:
+            code = self.compile_method(obj.interpreter, obj.class_def, method_def)
+        return execute(self, obj, code, actual_params + [None] * (code.frame_size - code.num_params))
+
+    # returns the CodeObject for method_def, defined in class_def, compiling it if needed
+    def compile_method(self, interpreter, class_def, method_def):
+        code = self.code_objects.get(method_def)
+        if code is None:
+            code = peephole(BytecodeCompiler(interpreter, class_def, method_def).compile())
+            self.code_objects[method_def] = code
+        return code
+
+
+# runs code on obj with the given frame, a list holding the Value of each parameter followed by a slot for each
+# local, along with every method it calls; returns the method's result
+def execute(engine, obj, code, frame):
+    max_call_depth = engine.max_call_depth
+    calls = []  # (obj, code, frame, operand stack, pc) of each method waiting for a call it made to return
+    ops = code.ops
+    args = code.args
+    stack = []
+    push = stack.append
+    pop = stack.pop
+    pc = 0
+    while True:
+        op = ops[pc]
+        arg = args[pc]
+        pc += 1
+        if op == LOAD_LOCAL:
+            push(frame[arg])
+        elif op == LOAD_CONST:
+            push(arg)
+        elif op == BINARY_PRIMITIVE:
+            right = pop()
+            stack[-1] = arg[3](arg[1](stack[-1].v, right.v))
+        elif op == STORE_LOCAL:
+            frame[arg] = pop()
+        elif op == POP_JUMP_IF_FALSE:
+            if not pop().v:
+                pc = arg
+        elif op == JUMP:
+            pc = arg
+        elif op == LOAD_FIELD:
+            push(obj.slots[arg])
+        elif op == STORE_FIELD:
+            obj.slots[arg] = pop()
+        elif op in CALL_OPCODES:
+            base = len(stack) - arg[1]
+            actual_args = stack[base:]
+            del stack[base:]
+            line_num = code.line_nums[pc - 1]
+            super_only = op == CALL_SUPER
+            if op == CALL_ME:
+                target = obj
+            elif super_only:
+                target = obj.super_object
+            else:
+                target = pop().v
+            # find the part of the object to run the method on, as ObjectDef.call_method does
+            num_superclasses, method_def = target.resolve_method(arg[0], actual_args, super_only, line_num)
+            start = target if super_only else target.anchor_object
+            callee = start.get_part(start.part_index + num_superclasses)
+            if max_call_depth is not None and len(calls) >= max_call_depth:
+                obj.interpreter.error(
+                    ErrorType.FAULT_ERROR, f"maximum call depth of {max_call_depth} exceeded", line_num
+                )
+            calls.append((obj, code, frame, stack, pc))
+            obj = callee
+            code = engine.compile_method(obj.interpreter, obj.class_def, method_def)
+            ops = code.ops
+            args = code.args
+            frame = actual_args + [None] * (code.frame_size - code.num_params)
+            stack = []
+            push = stack.append
+            pop = stack.pop
+            pc = 0
+        elif op in RETURN_OPCODES:
+            if op == RETURN_VALUE:
+                result = pop()
+            elif op == RETURN_DEFAULT:
+                result = create_default_value(arg)
+            else:
+                result = pop()
+                line_num = code.line_nums[pc - 1]
+                if result.is_typeless_null():
+                    check_assignment(obj, arg, result, line_num)
+                    result = Value(arg, None)  # propagate return type to null
+                check_assignment(obj, arg, result, line_num)
+            if not calls:
+                return result
+            # resume the method that made the call, with the result on its operand stack
+            obj, code, frame, stack, pc = calls.pop()
+            ops = code.ops
+            args = code.args
+            push = stack.append
+            pop = stack.pop
+            push(result)
+        elif op == CHECK_BOOL:
+            if stack[-1].t != BOOL_TYPE:
+                obj.interpreter.error(ErrorType.TYPE_ERROR, arg, code.line_nums[pc - 1])
+        elif op == LOAD_LOCAL_OBJECT:
+            value = frame[arg[0]]
+            push(Value(arg[1], None) if value.is_null() else value)
+        elif op == LOAD_FIELD_OBJECT:
+            value = obj.slots[arg[0]]
+            push(Value(arg[1], None) if value.is_null() else value)
+        elif op == STORE_LOCAL_CHECKED:
+            value = pop()
+            check_assignment(obj, arg[1], value, code.line_nums[pc - 1])
+            frame[arg[0]] = value
+        elif op == STORE_FIELD_CHECKED:
+            value = pop()
+            check_assignment(obj, arg[1], value, code.line_nums[pc - 1])
+            obj.slots[arg[0]] = value
+        elif op == BINARY_OP:
+            right = pop()
+            stack[-1] = obj.evaluate_binary_operation(arg, stack[-1], right, code.line_nums[pc - 1])
+        elif op == NOT:
+            stack[-1] = bool_value(not stack[-1].v)
+        elif op == UNARY_OP:
+            stack[-1] = obj.evaluate_unary_operation(arg, stack[-1], code.line_nums[pc - 1])
+        elif op == LOAD_ME:
+            push(obj.get_me_as_value())
+        elif op == POP:
+            pop()
+        elif op == PRINT:
+            base = len(stack) - arg
+            output = ""
+            for term in stack[base:]:
+                val = term.v
+                if term.t == BOOL_TYPE:
+                    val = "true" if val else "false"
+                output += str(val)
+            del stack[base:]
+            obj.interpreter.output(output)
+        elif op == NEW:
+            push(Value(arg[1], obj.interpreter.instantiate(arg[0], code.line_nums[pc - 1])))
+        elif op == CHECK_NOT_NULL:
+            if stack[-1].is_null():
+                obj.interpreter.error(ErrorType.FAULT_ERROR, "null dereference", code.line_nums[pc - 1])
+        elif op == CHECK_SUPER:
+            if not obj.super_object:
+                obj.interpreter.error(
+                    ErrorType.TYPE_ERROR,
+                    "invalid call to super object by class " + obj.class_def.get_name(),
+                    code.line_nums[pc - 1],
+                )
+        elif op == INPUT_STRING:
+            push(string_value(obj.interpreter.get_input()))
+        elif op == INPUT_INT:
+            push(int_value(int(obj.interpreter.get_input())))
+        elif op == ERROR:
+            obj.interpreter.error(arg[0], arg[1], code.line_nums[pc - 1])
+        elif op == TRACE:
+            print(f"{arg.line_num}: {arg.source}")
+        else:
+            raise ValueError(f"Unknown opcode {op}")
+
+
+# Compiles one method into a CodeObject from its body lowered into nodes (see astv2.py), which already resolve each
+# name to a slot, field, literal or me. Every value a statement computes is consumed by the statement, so the
+# operand stack is empty between statements. Errors are only reported when the offending code runs, exactly as in
+# the tree-walking evaluator, so code that can never run correctly compiles to an ERROR instruction.
+class BytecodeCompiler:
+    def __init__(self, interpreter, class_def, method_def):
+        self.interpreter = interpreter  # used at compile time for type queries only
+        self.class_def = class_def
+        self.method_def = method_def
+        # the name(s) of the variables held in each slot; parameters first, then the locals that share each slot
+        self.slot_names = [formal.name for formal in method_def.formal_params]
+        self.slot_names += [""] * (method_def.frame_size - len(self.slot_names))
+        self.ops = []
+        self.args = []
+        self.line_nums = []
+
+    def compile(self):
+        return_type = self.method_def.get_return_type()
+        if self.method_def.duplicate_param_name is not None:
+            self.__emit(
+                ERROR,
+                (ErrorType.NAME_ERROR, "duplicate formal param name " + self.method_def.duplicate_param_name),
+                self.method_def.line_num,
+            )
+        else:
+            self.__compile_statement(self.method_def.body)
+        # The method didn't explicitly return a value, so return the default return type for the method
+        self.__emit(RETURN_DEFAULT, return_type, self.method_def.line_num)
+        return CodeObject(
+            self.method_def.get_method_name(),
+            len(self.method_def.formal_params),
+            self.method_def.frame_size,
+            self.ops,
+            self.args,
+            self.line_nums,
+            self.slot_names,
+        )
+
+    # appends an instruction; returns its offset
+    def __emit(self, op, arg, line_num):
+        self.ops.append(op)
+        self.args.append(arg)
+        self.line_nums.append(line_num)
+        return len(self.ops) - 1
+
+    # points the jump at offset to the next instruction to be emitted
+    def __patch_jump(self, offset):
+        self.args[offset] = len(self.ops)
+
+    # returns True if a value whose exact type is known at compile time can be assigned to a variable of type
+    # var_type without a runtime check
+    def __is_statically_assignable(self, var_type, value_type):
+        return value_type is not None and self.interpreter.check_type_compatibility(
+            var_type, value_type, True
+        )
+
+    def __compile_statement(self, code):
+        if self.interpreter.trace_output:
+            self.__emit(TRACE, code, code.line_num)
+        BytecodeCompiler.__statement_compilers[type(code)](self, code)
+
+    # a statement with an unknown keyword, or one that is missing parts
+    def __compile_unknown(self, code):
+        self.__emit(ERROR, (ErrorType.SYNTAX_ERROR, code.description), code.line_num)
+
+    # (begin (statement1) (statement2) ... (statementn))
+    def __compile_begin(self, code):
+        for statement in code.statements:
+            self.__compile_statement(statement)
+
+    # (let ((type1 var1 defaultvalue1) ... (typen varn defaultvaluen)) (statement1) ... (statementn))
+    def __compile_let(self, code):
+        line_num = code.line_num
+        for local_def in code.local_defs:
+            default_value = local_def.default_value
+            if default_value is None:
+                self.__emit(ERROR, (ErrorType.TYPE_ERROR, invalid_default_description(local_def)), line_num)
+                return
+            if not self.interpreter.check_type_compatibility(local_def.type, default_value.type(), True):
+                description = type_mismatch_description(local_def.type, default_value.type())
+                self.__emit(ERROR, (ErrorType.TYPE_ERROR, description), line_num)
+                return
+            if local_def.slot is None:
+                self.__emit(
+                    ERROR, (ErrorType.NAME_ERROR, "duplicate local variable name " + local_def.name), line_num
+                )
+                return
+        for local_def in code.local_defs:
+            slot = local_def.slot
+            if self.slot_names[slot]:
+                self.slot_names[slot] += "/" + local_def.name
+            else:
+                self.slot_names[slot] = local_def.name
+            self.__emit(LOAD_CONST, local_def.default_value, line_num)
+            self.__emit(STORE_LOCAL, slot, line_num)
+        for statement in code.statements:
+            self.__compile_statement(statement)
+
+    # (set varname expression)
+    def __compile_set(self, code):
+        value_type = self.__compile_expression(code.expression)
+        self.__compile_assignment(code, value_type)
+
+    # (inputs target_variable) or (inputi target_variable)
+    def __compile_input(self, code):
+        if code.is_string:
+            self.__emit(INPUT_STRING, None, code.line_num)
+            self.__compile_assignment(code, STRING_TYPE)
+        else:
+            self.__emit(INPUT_INT, None, code.line_num)
+            self.__compile_assignment(code, INT_TYPE)
+
+    # stores the value on top of the stack, of static type value_type, in the parameter, local or field assigned by
+    # code, a SetStmt or InputStmt
+    def __compile_assignment(self, code, value_type):
+        line_num = code.line_num
+        if code.slot is not None:
+            if self.__is_statically_assignable(code.var_type, value_type):
+                self.__emit(STORE_LOCAL, code.slot, line_num)
+            else:
+                self.__emit(STORE_LOCAL_CHECKED, (code.slot, code.var_type), line_num)
+            return
+        if code.name in self.class_def.field_map:
+            field_type = self.class_def.field_map[code.name].type
+            field_slot = self.class_def.field_slots[code.name]
+            if self.__is_statically_assignable(field_type, value_type):
+                self.__emit(STORE_FIELD, field_slot, line_num)
+            else:
+                self.__emit(STORE_FIELD_CHECKED, (field_slot, field_type), line_num)
+            return
+        self.__emit(ERROR, (ErrorType.NAME_ERROR, "unknown field/variable " + code.name), line_num)
+
+    # evaluates the condition of code, an IfStmt or WhileStmt, and emits a jump past the statement taken when it is
+    # false; returns the offset of the jump so it can be patched
+    def __compile_condition(self, code):
+        condition_type = self.__compile_expression(code.condition)
+        if not is_known_type(condition_type, BOOL_TYPE):
+            self.__emit(CHECK_BOOL, condition_error_description(code), code.line_num)
+        return self.__emit(POP_JUMP_IF_FALSE, None, code.line_num)
+
+    # (if expression (statement) [(statement)])
+    def __compile_if(self, code):
+        line_num = code.line_num
+        jump_to_else = self.__compile_condition(code)
+        self.__compile_statement(code.then_statement)
+        if code.else_statement is not None:
+            jump_to_end = self.__emit(JUMP, None, line_num)
+            self.__patch_jump(jump_to_else)
+            self.__compile_statement(code.else_statement)
+            self.__patch_jump(jump_to_end)
+        else:
+            self.__patch_jump(jump_to_else)
+
+    # (while expression (statement))
+    def __compile_while(self, code):
+        line_num = code.line_num
+        loop_start = len(self.ops)
+        jump_to_end = self.__compile_condition(code)
+        self.__compile_statement(code.body)
+        self.__emit(JUMP, loop_start, line_num)
+        self.__patch_jump(jump_to_end)
+
+    # (return [expression])
+    def __compile_return(self, code):
+        line_num = code.line_num
+        return_type = self.method_def.get_return_type()
+        if code.expression is None:
+            self.__emit(RETURN_DEFAULT, return_type, line_num)
+            return
+        value_type = self.__compile_expression(code.expression)
+        if is_known_type(value_type, return_type):
+            self.__emit(RETURN_VALUE, None, line_num)
+        else:
+            self.__emit(RETURN_CHECKED, return_type, line_num)
+
+    # (print expression1 expression2 ...)
+    def __compile_print(self, code):
+        for expr in code.expressions:
+            self.__compile_expression(expr)
+        self.__emit(PRINT, len(code.expressions), code.line_num)
+
+    # (call object_ref/me/super methodname param1 param2 ...) as a statement
+    def __compile_call_statement(self, code):
+        self.__compile_call(code.call)
+        self.__emit(POP, None, code.line_num)
+
+    # emits code pushing the value of expr; returns the exact Type of every value the expression produces if it is
+    # known at compile time, and None otherwise
+    def __compile_expression(self, expr):
+        return BytecodeCompiler.__expression_compilers[type(expr)](self, expr)
+
+    # a parameter or local
+    def __compile_local_ref(self, expr):
+        if expr.var_type.type_name in PRIMITIVE_OPERATIONS:
+            self.__emit(LOAD_LOCAL, expr.slot, expr.line_num)
+            return expr.var_type
+        self.__emit(LOAD_LOCAL_OBJECT, (expr.slot, expr.var_type), expr.line_num)
+        return None
+
+    # a field, or a literal or me that a field could have shadowed
+    def __compile_var_ref(self, expr):
+        if expr.name in self.class_def.field_map:
+            field_type = self.class_def.field_map[expr.name].type
+            field_slot = self.class_def.field_slots[expr.name]
+            if field_type.type_name in PRIMITIVE_OPERATIONS:
+                self.__emit(LOAD_FIELD, field_slot, expr.line_num)
+                return field_type
+            self.__emit(LOAD_FIELD_OBJECT, (field_slot, field_type), expr.line_num)
+            return None
+        if expr.literal is not None:
+            self.__emit(LOAD_CONST, expr.literal, expr.line_num)
+            return expr.literal.type()
+        if expr.name == InterpreterBase.ME_DEF:
+            return self.__compile_me(expr)
+        self.__emit(ERROR, (ErrorType.NAME_ERROR, "invalid field or parameter " + expr.name), expr.line_num)
+        return None
+
+    def __compile_literal(self, expr):
+        self.__emit(LOAD_CONST, expr.value, expr.line_num)
+        return expr.value.type()
+
+    def __compile_me(self, expr):
+        self.__emit(LOAD_ME, None, expr.line_num)
+        return None
+
+    # a parenthesized expression that isn't an operation, call or new
+    def __compile_unknown_expression(self, expr):
+        self.__emit(LOAD_CONST, None, expr.line_num)
+        return None
+
+    # (op expression1 expression2)
+    def __compile_binary_operation(self, expr):
+        operator_token = expr.operator
+        line_num = expr.line_num
+        left_type = self.__compile_expression(expr.left)
+        right_type = self.__compile_expression(expr.right)
+        if is_known_type(right_type, left_type) and left_type.type_name in PRIMITIVE_OPERATIONS:
+            operations, error_description = PRIMITIVE_OPERATIONS[left_type.type_name]
+            if operator_token not in operations:
+                self.__emit(ERROR, (ErrorType.TYPE_ERROR, error_description), line_num)
+                return None
+            operation, result_type = operations[operator_token]
+            self.__emit(
+                BINARY_PRIMITIVE,
+                (operator_token, operation, result_type, VALUE_FACTORIES[result_type]),
+                line_num,
+            )
+            return result_type
+        self.__emit(BINARY_OP, operator_token, line_num)
+        return BOOL_TYPE if operator_token in BOOL_RESULT_OPERATORS else None
+
+    # (op expression)
+    def __compile_unary_operation(self, expr):
+        operand_type = self.__compile_expression(expr.operand)
+        if is_known_type(operand_type, BOOL_TYPE):
+            self.__emit(NOT, None, expr.line_num)
+            return BOOL_TYPE
+        self.__emit(UNARY_OP, expr.operator, expr.line_num)
+        return None
+
+    # (new classname)
+    def __compile_new(self, expr):
+        self.__emit(NEW, (expr.class_name, expr.class_type), expr.line_num)
+        return expr.class_type
+
+    # (call object_ref/me/super methodname p1 p2 p3)
+    def __compile_call(self, expr):
+        line_num = expr.line_num
+        if expr.target is CallExpr.ME:
+            call_op = CALL_ME
+        elif expr.target is CallExpr.SUPER:
+            call_op = CALL_SUPER
+            self.__emit(CHECK_SUPER, None, line_num)
+        else:
+            call_op = CALL
+            self.__compile_expression(expr.target)
+            self.__emit(CHECK_NOT_NULL, None, line_num)
+        for arg in expr.args:
+            self.__compile_expression(arg)
+        self.__emit(call_op, (expr.method_name, len(expr.args)), line_num)
+        return None
+
+    # dispatch tables mapping each statement and expression node class to its compiler; the fused nodes compile
+    # like the nodes they replace, since the instructions already specialize on the static types of the operands
+    __statement_compilers = {
+        BeginStmt: __compile_begin,
+        LetStmt: __compile_let,
+        SetStmt: __compile_set,
+        IncrementLocalStmt: __compile_set,
+        IncrementFieldStmt: __compile_set,
+        InputStmt: __compile_input,
+        IfStmt: __compile_if,
+        WhileStmt: __compile_while,
+        ReturnStmt: __compile_return,
+        PrintStmt: __compile_print,
+        CallStmt: __compile_call_statement,
+        UnknownStmt: __compile_unknown,
+    }
+    __expression_compilers = {
+        LocalRef: __compile_local_ref,
+        VarRef: __compile_var_ref,
+        LiteralExpr: __compile_literal,
+        MeExpr: __compile_me,
+        BinOpExpr: __compile_binary_operation,
+        CompareLocalExpr: __compile_binary_operation,
+        UnaryOpExpr: __compile_unary_operation,
+        NewExpr: __compile_new,
+        CallExpr: __compile_call,
+        UnknownExpr: __compile_unknown_expression,
+    }
+
+
+# Peephole optimizer. Each pass takes the (op, arg, line_num) instructions of a method and returns a rewritten
+# list, or None if it found nothing to change; jump arguments are instruction offsets. The passes are repeated
+# until none of them changes anything, since each can expose opportunities for the others.
+
+
+# retargets jumps whose target is an unconditional jump to that jump's own target
+def thread_jumps(instructions):
+    changed = False
+    rewritten = []
+    for op, arg, line_num in instructions:
+        if op in JUMP_OPCODES:
+            target = arg
+            seen = set()
+            # seen guards against a cycle of jumps, e.g. from (while true (begin))
+            while instructions[target][0] == JUMP and target not in seen:
+                seen.add(target)
+                target = instructions[target][1]
+            if target != arg:
+                changed = True
+                arg = target
+        rewritten.append((op, arg, line_num))
+    return rewritten if changed else None
+
+
+# drops instructions that no path from the start of the method reaches, e.g. statements after a return
+def remove_unreachable(instructions):
+    reachable = [False] * len(instructions)
+    pending = [0]
+    while pending:
+        offset = pending.pop()
+        while offset < len(instructions) and not reachable[offset]:
+            reachable[offset] = True
+            op, arg, _ = instructions[offset]
+            if op in JUMP_OPCODES:
+                pending.append(arg)
+            if op in TERMINAL_OPCODES:
+                break
+            offset += 1
+    if all(reachable):
+        return None
+    return relocate(instructions, reachable)
+
+
+# drops unconditional jumps to the instruction that follows them
+def remove_jumps_to_next(instructions):
+    kept = [
+        not (op == JUMP and arg == offset + 1)
+        for offset, (op, arg, _) in enumerate(instructions)
+    ]
+    if all(kept):
+        return None
+    return relocate(instructions, kept)
+
+
+# returns the instructions for which kept is True, with jump targets moved to account for the dropped ones. a
+# jump to a dropped instruction goes to the next kept instruction instead
+def relocate(instructions, kept):
+    new_offsets = []
+    num_kept = 0
+    for is_kept in kept:
+        new_offsets.append(num_kept)
+        num_kept += is_kept
+    new_offsets.append(num_kept)
+    return [
+        (op, new_offsets[arg] if op in JUMP_OPCODES else arg, line_num)
+        for (op, arg, line_num), is_kept in zip(instructions, kept)
+        if is_kept
+    ]
+
+
+PEEPHOLE_PASSES = [thread_jumps, remove_unreachable, remove_jumps_to_next]
+
+
+# returns code with the peephole passes applied
+def peephole(code):
+    instructions = list(zip(code.ops, code.args, code.line_nums))
+    changed = True
+    while changed:
+        changed = False
+        for optimization in PEEPHOLE_PASSES:
+            rewritten = optimization(instructions)
+            if rewritten is not None:
+                instructions = rewritten
+                changed = True
+    return CodeObject(
+        code.name,
+        code.num_params,
+        code.frame_size,
+        [op for op, _, _ in instructions],
+        [arg for _, arg, _ in instructions],
+        [line_num for _, _, line_num in instructions],
+        code.slot_names,
+    )
+
+
+# returns a human readable listing of code, one instruction per line, in the style of python's dis module
+def disassemble(code):
+    lines = [f"method {code.name} ({code.num_params} params, {code.frame_size} slots)"]
+    jump_targets = {arg for op, arg in zip(code.ops, code.args) if op in JUMP_OPCODES}
+    previous_line_num = None
+    for offset, (op, arg, line_num) in enumerate(zip(code.ops, code.args, code.line_nums)):
+        line_column = ""
+        if line_num != previous_line_num:
+            line_column = str(line_num)
+            previous_line_num = line_num
+        marker = ">>" if offset in jump_targets else ""
+        lines.append(
+            (
+                f"{line_column:>6} {marker:>2} {offset:4} {OPCODE_NAMES[op]:20} "
+                + describe_argument(code, op, arg)
+            ).rstrip()
+        )
+    return "\n".join(lines)
+
+
+# returns the argument of an instruction as text for the disassembler
+def describe_argument(code, op, arg):
+    if arg is None:
+        return ""
+    if op in (LOAD_LOCAL, STORE_LOCAL):
+        return f"{arg} ({code.slot_names[arg]})"
+    if op in (LOAD_LOCAL_OBJECT, STORE_LOCAL_CHECKED):
+        return f"{arg[0]} ({code.slot_names[arg[0]]}: {arg[1].type_name})"
+    if op in (LOAD_FIELD_OBJECT, STORE_FIELD_CHECKED):
+        return f"{arg[0]}: {arg[1].type_name}"
+    if op == LOAD_CONST:
+        return describe_value(arg)
+    if op == BINARY_PRIMITIVE:
+        return f"{arg[0]} -> {arg[2].type_name}"
+    if op in (NEW, CALL, CALL_ME, CALL_SUPER):
+        return f"{arg[0]}" if op == NEW else f"{arg[0]} ({arg[1]} args)"
+    if op in (RETURN_CHECKED, RETURN_DEFAULT):
+        return arg.type_name
+    if op == ERROR:
+        return f"{arg[0]}: {arg[1]}"
+    if op in JUMP_OPCODES:
+        return f"to {arg}"
+    if op == TRACE:
+        return str(arg.source)
+    return str(arg)
+
+
+def describe_value(value):
+    if value.t == BOOL_TYPE:
+        return "true" if value.v else "false"
+    if value.t == STRING_TYPE:
+        return f'"{value.v}"'
+    if value.v is None:
+        return InterpreterBase.NULL_DEF
+    return str(value.v)
+
+
+# Prints the bytecode of every method of a program; usage: python3 bytecodev2.py <program.brewin>
+def main():
+    from interpreterv2 import Interpreter  # interpreterv2 imports this module
+
+    if len(sys.argv) < 2:
+        raise ValueError("Error: Missing program argument")
+    interpreter = Interpreter(False, None, False, engine=Interpreter.BYTECODE_ENGINE)
+    with open(sys.argv[1], encoding="utf-8") as program_file:
+        program = interpreter.compile(program_file)
+    for class_name, class_def in program.class_index.items():
+        for method_def in class_def.get_methods():
+            code = interpreter.execution_engine.compile_method(interpreter, class_def, method_def)
+            print(f"class {class_name} " + disassemble(code) + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+import hashlib
+import marshal
+import os
+import sys
+import tempfile
+import time
+
+from sourcev2 import SourceList
+
+
+# Content-addressed on-disk cache of parsed programs. Each entry is named by the sha256 of the program source
+# and holds the compact parse tree of a program that has already been loaded and type checked successfully, so
+# a hit lets the interpreter skip lexing and validation. Entries are written atomically (temp file + rename) and
+# unreadable entries are treated as misses, so several processes can share one cache directory. The directory is
+# kept under max_bytes by evicting the least recently used entries; a hit refreshes the entry's mtime.
+class ProgramCache:
+    # bump when the entry layout or the meaning of a cached tree changes
+    FORMAT_VERSION = 1
+    DEFAULT_DIR = os.path.join(os.path.expanduser("~"), ".cache", "brewin")
+    DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+    ENTRY_SUFFIX = ".bin"
+    TEMP_SUFFIX = ".tmp"
+    # a temp file older than this was left by a write that was interrupted, rather than one still in progress
+    STALE_TEMP_SECONDS = 10 * 60
+
+    def __init__(self, cache_dir=DEFAULT_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(cache_dir, exist_ok=True)
+
+    # returns the cache key for a program given as a list of source lines. marshal output is specific to the
+    # python version, so that is part of the key too
+    def key(self, lines):
+        digest = hashlib.sha256(
+            f"{ProgramCache.FORMAT_VERSION}:{sys.implementation.cache_tag}\n".encode()
+        )
+        for line in lines:
+            # length-prefix each line so that line boundaries (and thus line numbers) are part of the key
+            encoded = line.encode("utf-8", "surrogatepass")
+            digest.update(f"{len(encoded)}:".encode())
+            digest.update(encoded)
+        return digest.hexdigest()
+
+    # returns the list of top-level parsed items stored under key, or None on a miss. an entry that cannot be
+    # read back as a list of SourceLists is corrupt; it counts as a miss and is deleted so that it gets rewritten
+    def load(self, key):
+        path = self.__path(key)
+        try:
+            with open(path, "rb") as handle:
+                data = handle.read()
+        except OSError:  # missing, or being evicted by another process
+            self.misses += 1
+            return None
+        try:
+            version, encoded_items = marshal.loads(data)
+            if version != ProgramCache.FORMAT_VERSION:
+                raise ValueError("cache entry has a different format version")
+            items = [ProgramCache.__decode(item) for item in encoded_items]
+            if not all(isinstance(item, SourceList) for item in items):
+                raise ValueError("cache entry holds a top-level token")
+        except (EOFError, ValueError, TypeError):
+            self.misses += 1
+            try:
+                os.unlink(path)
+            except OSError:  # already deleted by another process
+                pass
+            return None
+        try:
+            os.utime(path)  # mark as recently used
+        except OSError:
+            pass
+        self.hits += 1
+        return items
+
+    # stores the list of top-level parsed items under key, then evicts old entries if the cache is too big
+    def store(self, key, items):
+        data = marshal.dumps(
+            (ProgramCache.FORMAT_VERSION, [ProgramCache.__encode(item) for item in items])
+        )
+        handle, temp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=ProgramCache.TEMP_SUFFIX)
+        try:
+            with os.fdopen(handle, "wb") as temp_file:
+                temp_file.write(data)
+            os.replace(temp_path, self.__path(key))
+        except OSError:
+            try:
+                os.unlink(temp_path)
+            except OSError:
+                pass
+            return
+        self.__evict()
+
+    def __path(self, key):
+        return os.path.join(self.cache_dir, key + ProgramCache.ENTRY_SUFFIX)
+
+    # deletes the temp files of interrupted writes, then the least recently used entries until the entries and the
+    # temp files of writes still in progress fit in max_bytes
+    def __evict(self):
+        entries = []
+        total_size = 0
+        stale_before = time.time() - ProgramCache.STALE_TEMP_SECONDS
+        with os.scandir(self.cache_dir) as scan:
+            for entry in scan:
+                is_entry = entry.name.endswith(ProgramCache.ENTRY_SUFFIX)
+                if not is_entry and not entry.name.endswith(ProgramCache.TEMP_SUFFIX):
+                    continue
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                if not is_entry and stat.st_mtime < stale_before:
+                    try:
+                        os.unlink(entry.path)
+                    except OSError:  # already deleted by another process
+                        pass
+                    continue
+                if is_entry:
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+                total_size += stat.st_size
+        entries.sort()
+        for _, size, path in entries:
+            if total_size <= self.max_bytes:
+                break
+            try:
+                os.unlink(path)
+            except OSError:  # already evicted by another process
+                pass
+            total_size -= size
+
+    # a SourceList is stored as a (children, line number bytes) tuple; tokens are stored as-is, and marshal
+    # preserves their interning
+    @staticmethod
+    def __encode(item):
+        if isinstance(item, SourceList):
+            return (
+                tuple(ProgramCache.__encode(child) for child in item),
+                item.line_nums.tobytes(),
+            )
+        return item
+
+    # raises ValueError or TypeError if item is not the encoding of a SourceList or a token
+    @staticmethod
+    def __decode(item):
+        if isinstance(item, str):
+            return item
+        if not isinstance(item, tuple):
+            raise ValueError("cache entry holds an item that is neither a list nor a token")
+        children, line_nums = item
+        source_list = SourceList()
+        source_list.extend(ProgramCache.__decode(child) for child in children)
+        source_list.line_nums.frombytes(line_nums)
+        if len(source_list.line_nums) != len(source_list):
+            raise ValueError("cache entry has a list whose line numbers do not match its items")
+        return source_list
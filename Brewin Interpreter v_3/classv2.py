@@ -35,8 +35,9 @@
    a null pointer of type person to a null pointer of type robot
 """
 
+from astv2 import MethodLowering
 from intbase import InterpreterBase, ErrorType
-from type_valuev2 import Type, create_value
+from type_valuev2 import Type, LiteralPool
 
 class VariableDef:
     # var_type is a Type() and value is a Value()
@@ -52,15 +53,29 @@ class VariableDef:
 # parses and holds the definition of a member method
 # [method return_type method_name [[type1 param1] [type2 param2] ...] [statement]]
 class MethodDef:
-    def __init__(self, method_source):
-        self.line_num = method_source[0].line_num  # used for errors
+    # field_names are the names of the fields of the class defining the method, which can shadow literals.
+    # literal_pool is the LiteralPool the method's literals are resolved with; by default the method gets its own
+    def __init__(self, method_source, field_names=(), literal_pool=None):
+        self.line_num = method_source.line_num  # used for errors
         self.method_name = method_source[2]
         if method_source[1] == InterpreterBase.VOID_DEF:
             self.return_type = Type(InterpreterBase.NOTHING_DEF)
         else:
             self.return_type = Type(method_source[1])
         self.formal_params = self.__parse_params(method_source[3])
-        self.code = method_source[4]
+        # the body lowered into typed nodes (see astv2.py), which every execution engine runs or compiles from; the
+        # method keeps no other reference to its parse tree
+        if literal_pool is None:
+            literal_pool = LiteralPool()
+        lowering = MethodLowering(self.formal_params, field_names, literal_pool)
+        self.body = lowering.lower(method_source[4])
+        self.frame_size = lowering.frame_size  # number of slots for the parameters and locals of a call
+        self.call_sites = lowering.call_sites  # the CallExprs in the body, each with its inline cache
+        # the name of the first parameter that has the same name as an earlier one, or None; reported when called
+        param_names = [param.name for param in self.formal_params]
+        self.duplicate_param_name = next(
+            (name for i, name in enumerate(param_names) if name in param_names[:i]), None
+        )
 
     def get_method_name(self):
         return self.method_name
@@ -72,9 +87,6 @@ class MethodDef:
     def get_return_type(self):
         return self.return_type
 
-    def get_code(self):
-        return self.code
-
     # input params in the form of [[type1 param1] [type2 param2] ...]
     # output is a set of VariableDefs
     def __parse_params(self, params):
@@ -93,12 +105,30 @@ class ClassDef:
     def __init__(self, class_source, interpreter):
         self.interpreter = interpreter
         self.name = class_source[1]
-        self.class_source = class_source
+        self.class_type = Type(self.name)
         fields_and_methods_start_index = (
             self.__check_for_inheritance_and_set_superclass_info(class_source)
         )
         self.__create_field_list(class_source[fields_and_methods_start_index:])
         self.__create_method_list(class_source[fields_and_methods_start_index:])
+        self.__create_vtable()
+        self.num_allocations = 0  # the number of objects of this class created since the program was compiled
+
+    # checks field default values and method signatures against the types known to the interpreter;
+    # this is separate from construction so a ClassDef can be built as soon as its source is parsed,
+    # before later classes that it refers to have been registered as types
+    def check_types(self):
+        for var_def, line_num in zip(self.fields, self.field_line_nums):
+            if not self.interpreter.check_type_compatibility(
+                var_def.type, var_def.value.type(), True
+            ):
+                self.interpreter.error(
+                    ErrorType.TYPE_ERROR,
+                    "invalid type/type mismatch with field " + var_def.name,
+                    line_num,
+                )
+        for method_def in self.methods:
+            self.__check_method_names_and_types(method_def)
 
     # get the classname
     def get_name(self):
@@ -116,20 +146,41 @@ class ClassDef:
     def get_superclass(self):
         return self.super_class
 
+    # returns (number of superclasses between this class and the class defining the method, MethodDef) for the
+    # method a call of method_name with arguments of types arg_types (a list of Types) runs on an object whose most
+    # derived class is this one, or None if there is no such method
+    def find_method(self, method_name, arg_types):
+        for formal_types, num_superclasses, _, method_def in self.vtable.get(method_name, ()):
+            if len(formal_types) == len(arg_types) and all(
+                self.interpreter.check_type_compatibility(formal_type, arg_type, True)
+                for formal_type, arg_type in zip(formal_types, arg_types)
+            ):
+                return num_superclasses, method_def
+        return None
+
     def __check_for_inheritance_and_set_superclass_info(self, class_source):
         if class_source[2] != InterpreterBase.INHERITS_DEF:
             self.super_class = None
+            self.num_superclasses = 0
             return 2  # fields and method definitions start after [class classname ...], jump to the correct place to continue parsing
 
         super_class_name = class_source[3]
         self.super_class = self.interpreter.get_class_def(
-            super_class_name, class_source[0].line_num
+            super_class_name, class_source.line_num
         )
+        self.num_superclasses = self.super_class.num_superclasses + 1
         return 4  # fields and method definitions start after [class classname inherits baseclassname ...]
 
+    # an object holds the fields of its class and all its superclasses in one list of Values, base class fields
+    # first, so the fields of a class are in the same slots of the list in objects of every class derived from it.
+    # field_slots maps the name of each field of this class to its slot, and num_fields is the length of the list.
+    # field_prototype is a tuple holding the default Value of every slot; a new object's list starts as a copy of it
     def __create_field_list(self, class_body):
         self.fields = []  # array of VariableDefs with default values set
+        self.field_line_nums = []  # line of each field definition, parallel to self.fields, used by check_types
         self.field_map = {}
+        self.field_slots = {}
+        self.num_fields = 0 if self.super_class is None else self.super_class.num_fields
         fields_defined_so_far = set()
         for member in class_body:
             # member format is [field typename varname default_value]
@@ -138,28 +189,24 @@ class ClassDef:
                     self.interpreter.error(
                         ErrorType.NAME_ERROR,
                         "duplicate field " + member[2],
-                        member[0].line_num,
+                        member.line_num,
                     )
                 var_def = self.__create_variable_def_from_field(member)
                 self.fields.append(var_def)
+                self.field_line_nums.append(member.line_num)
                 self.field_map[member[2]] = var_def
+                self.field_slots[member[2]] = self.num_fields
+                self.num_fields += 1
                 fields_defined_so_far.add(member[2])
+        inherited = () if self.super_class is None else self.super_class.field_prototype
+        self.field_prototype = inherited + tuple(var_def.value for var_def in self.fields)
 
     # field def: [field typename varname defvalue]
     # returns a VariableDef object that represents that field
     def __create_variable_def_from_field(self, field_def):
-        var_def = VariableDef(
-            Type(field_def[1]), field_def[2], create_value(field_def[3])
+        return VariableDef(
+            Type(field_def[1]), field_def[2], self.interpreter.literal_pool.get(field_def[3])
         )
-        if not self.interpreter.check_type_compatibility(
-            var_def.type, var_def.value.type(), True
-        ):
-            self.interpreter.error(
-                ErrorType.TYPE_ERROR,
-                "invalid type/type mismatch with field " + field_def[2],
-                field_def[0].line_num,
-            )
-        return var_def
 
     def __create_method_list(self, class_body):
         self.methods = []
@@ -167,18 +214,38 @@ class ClassDef:
         methods_defined_so_far = set()
         for member in class_body:
             if member[0] == InterpreterBase.METHOD_DEF:
-                method_def = MethodDef(member)
+                method_def = MethodDef(member, self.field_map, self.interpreter.literal_pool)
                 if method_def.method_name in methods_defined_so_far:  # redefinition
                     self.interpreter.error(
                         ErrorType.NAME_ERROR,
                         "duplicate method " + method_def.method_name,
-                        member[0].line_num,
+                        member.line_num,
                     )
-                self.__check_method_names_and_types(method_def)
                 self.methods.append(method_def)
                 self.method_map[method_def.method_name] = method_def
                 methods_defined_so_far.add(method_def.method_name)
 
+    # the vtable maps each method name to the list of (formal parameter Types, number of superclasses between this
+    # class and the defining class, defining ClassDef, MethodDef) of the methods with that name in this class and its
+    # superclasses, most derived first, which is the order calls try them in. A method is left out if a more derived
+    # class defines one with the same parameter types, since a call would never get past the overriding one. The
+    # superclass was defined before this class, so its vtable is complete and this one is built on top of it.
+    def __create_vtable(self):
+        self.vtable = {}
+        for method_def in self.methods:
+            formal_types = [param.type for param in method_def.formal_params]
+            self.vtable[method_def.method_name] = [(formal_types, 0, self, method_def)]
+        if self.super_class is None:
+            return
+        for method_name, inherited in self.super_class.vtable.items():
+            overloads = self.vtable.setdefault(method_name, [])
+            overridden = {
+                tuple(formal_type.type_name for formal_type in formal_types) for formal_types, *_ in overloads
+            }
+            for formal_types, num_superclasses, class_def, method_def in inherited:
+                if tuple(formal_type.type_name for formal_type in formal_types) not in overridden:
+                    overloads.append((formal_types, num_superclasses + 1, class_def, method_def))
+
     # for a given method, make sure that the parameter types are valid, return type is valid, and param names
     # are not duplicated
     def __check_method_names_and_types(self, method_def):
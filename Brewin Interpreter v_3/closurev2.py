@@ -0,0 +1,522 @@
+from astv2 import (
+    BeginStmt,
+    LetStmt,
+    SetStmt,
+    IncrementLocalStmt,
+    IncrementFieldStmt,
+    InputStmt,
+    IfStmt,
+    WhileStmt,
+    ReturnStmt,
+    PrintStmt,
+    CallStmt,
+    UnknownStmt,
+    LiteralExpr,
+    LocalRef,
+    VarRef,
+    MeExpr,
+    BinOpExpr,
+    CompareLocalExpr,
+    UnaryOpExpr,
+    NewExpr,
+    CallExpr,
+    UnknownExpr,
+)
+from intbase import InterpreterBase, ErrorType
+from operationsv2 import PRIMITIVE_OPERATIONS, BOOL_RESULT_OPERATORS, is_known_type
+from operationsv2 import type_mismatch_description, invalid_default_description, condition_error_description
+from type_valuev2 import Value, create_default_value, INT_TYPE, STRING_TYPE, BOOL_TYPE
+from type_valuev2 import VALUE_FACTORIES, int_value, bool_value, string_value
+
+# returned by a compiled (return) statement without an expression; the method then returns its default value
+RETURN_NOTHING = object()
+
+
+# Execution engine that compiles each method body, the first time it is called, into a tree of python closures.
+# Fields are resolved to object slots and operators on statically typed operands to python functions ahead of time,
+# so executing a statement never re-inspects the method's nodes.
+class ClosureEngine:
+    def __init__(self):
+        self.method_bodies = {}  # MethodDef -> compiled body
+
+    # runs method_def on obj, the ObjectDef part of the class that defines the method; actual_params is a list of
+    # Values that were already checked against the formal parameter types
+    def run_method(self, obj, method_def, actual_params):
+        body = self.method_bodies.get(method_def)
+        if body is None:
+            body = MethodCompiler(obj.interpreter, obj.class_def, method_def).compile()
+            self.method_bodies[method_def] = body
+        return body(obj, actual_params)
+
+
+# Compiles one method from its body lowered into nodes (see astv2.py), which already resolve each name to a slot,
+# field, literal or me. Compiled statements and expressions are closures taking (obj, frame), where obj is the
+# ObjectDef part running the method and frame is a list holding the Value of each parameter and local variable.
+# Expressions return a Value; statements return None to proceed, or the method's result (a Value or RETURN_NOTHING).
+# Errors are only reported when the offending code runs, exactly as in the tree-walking evaluator.
+class MethodCompiler:
+    def __init__(self, interpreter, class_def, method_def):
+        self.interpreter = interpreter  # used at compile time for type queries only
+        self.class_def = class_def
+        self.method_def = method_def
+
+    # returns a function (obj, actual_params) -> Value that runs the method
+    def compile(self):
+        if self.method_def.duplicate_param_name is not None:
+            return MethodCompiler.__compile_duplicate_param_error(
+                self.method_def.duplicate_param_name, self.method_def.line_num
+            )
+        statement = self.__compile_statement(self.method_def.body)
+        num_locals = self.method_def.frame_size - len(self.method_def.formal_params)
+        return_type = self.method_def.get_return_type()
+
+        def body(obj, actual_params):
+            frame = actual_params + [None] * num_locals
+            result = statement(obj, frame)
+            if result is None or result is RETURN_NOTHING:
+                # The method didn't explicitly return a value, so return the default return type for the method
+                return create_default_value(return_type)
+            return result
+
+        return body
+
+    @staticmethod
+    def __compile_duplicate_param_error(param_name, line_num):
+        def body(obj, _actual_params):
+            obj.interpreter.error(
+                ErrorType.NAME_ERROR, "duplicate formal param name " + param_name, line_num
+            )
+
+        return body
+
+    # returns True if a value whose exact type is known at compile time can be assigned to a variable of type
+    # var_type without a runtime check
+    def __is_statically_assignable(self, var_type, value_type):
+        return value_type is not None and self.interpreter.check_type_compatibility(
+            var_type, value_type, True
+        )
+
+    @staticmethod
+    def __compile_error(error_type, description, line_num):
+        def raise_error(obj, _frame):
+            obj.interpreter.error(error_type, description, line_num)
+
+        return raise_error
+
+    def __compile_statement(self, code):
+        statement = MethodCompiler.__statement_compilers[type(code)](self, code)
+        if self.interpreter.trace_output:
+            statement = MethodCompiler.__trace(statement, code)
+        return statement
+
+    @staticmethod
+    def __trace(statement, code):
+        def traced_statement(obj, frame):
+            print(f"{code.line_num}: {code.source}")
+            return statement(obj, frame)
+
+        return traced_statement
+
+    # a statement with an unknown keyword, or one that is missing parts
+    def __compile_unknown(self, code):
+        return MethodCompiler.__compile_error(ErrorType.SYNTAX_ERROR, code.description, code.line_num)
+
+    @staticmethod
+    def __compile_block(statements):
+        if len(statements) == 1:
+            return statements[0]
+
+        def block(obj, frame):
+            for statement in statements:
+                result = statement(obj, frame)
+                if result is not None:
+                    return result
+            return None
+
+        return block
+
+    # (begin (statement1) (statement2) ... (statementn))
+    def __compile_begin(self, code):
+        return MethodCompiler.__compile_block(
+            [self.__compile_statement(statement) for statement in code.statements]
+        )
+
+    # (let ((type1 var1 defaultvalue1) ... (typen varn defaultvaluen)) (statement1) ... (statementn))
+    def __compile_let(self, code):
+        line_num = code.line_num
+        initial_values = []  # (slot, Value) for each local
+        for local_def in code.local_defs:
+            default_value = local_def.default_value
+            if default_value is None:
+                return MethodCompiler.__compile_error(
+                    ErrorType.TYPE_ERROR, invalid_default_description(local_def), line_num
+                )
+            if not self.interpreter.check_type_compatibility(local_def.type, default_value.type(), True):
+                return MethodCompiler.__compile_error(
+                    ErrorType.TYPE_ERROR, type_mismatch_description(local_def.type, default_value.type()), line_num
+                )
+            if local_def.slot is None:
+                return MethodCompiler.__compile_error(
+                    ErrorType.NAME_ERROR, "duplicate local variable name " + local_def.name, line_num
+                )
+            initial_values.append((local_def.slot, default_value))
+        block = MethodCompiler.__compile_block(
+            [self.__compile_statement(statement) for statement in code.statements]
+        )
+
+        def let(obj, frame):
+            for slot, value in initial_values:
+                frame[slot] = value
+            return block(obj, frame)
+
+        return let
+
+    # (set varname expression)
+    def __compile_set(self, code):
+        expression, value_type = self.__compile_expression(code.expression)
+        return self.__compile_assignment(code, expression, value_type)
+
+    # (inputs target_variable) or (inputi target_variable)
+    def __compile_input(self, code):
+        if code.is_string:
+
+            def get_input(obj, _frame):
+                return string_value(obj.interpreter.get_input())
+
+            return self.__compile_assignment(code, get_input, STRING_TYPE)
+
+        def get_int(obj, _frame):
+            return int_value(int(obj.interpreter.get_input()))
+
+        return self.__compile_assignment(code, get_int, INT_TYPE)
+
+    # stores the value of expression in the parameter, local or field assigned by code, a SetStmt or InputStmt
+    def __compile_assignment(self, code, expression, value_type):
+        line_num = code.line_num
+        if code.slot is not None:
+            slot = code.slot
+            var_type = code.var_type
+            if self.__is_statically_assignable(var_type, value_type):
+
+                def set_variable(obj, frame):
+                    frame[slot] = expression(obj, frame)
+
+            else:
+
+                def set_variable(obj, frame):
+                    value = expression(obj, frame)
+                    check_assignment(obj, var_type, value, line_num)
+                    frame[slot] = value
+
+            return set_variable
+
+        if code.name in self.class_def.field_map:
+            field_type = self.class_def.field_map[code.name].type
+            field_slot = self.class_def.field_slots[code.name]
+            if self.__is_statically_assignable(field_type, value_type):
+
+                def set_field(obj, frame):
+                    obj.slots[field_slot] = expression(obj, frame)
+
+            else:
+
+                def set_field(obj, frame):
+                    value = expression(obj, frame)
+                    check_assignment(obj, field_type, value, line_num)
+                    obj.slots[field_slot] = value
+
+            return set_field
+
+        var_name = code.name
+
+        def set_unknown(obj, frame):
+            expression(obj, frame)
+            obj.interpreter.error(
+                ErrorType.NAME_ERROR, "unknown field/variable " + var_name, line_num
+            )
+
+        return set_unknown
+
+    # (if expression (statement) [(statement)])
+    def __compile_if(self, code):
+        line_num = code.line_num
+        description = condition_error_description(code)
+        condition, condition_type = self.__compile_expression(code.condition)
+        check_condition = not is_known_type(condition_type, BOOL_TYPE)
+        then_statement = self.__compile_statement(code.then_statement)
+        else_statement = None
+        if code.else_statement is not None:
+            else_statement = self.__compile_statement(code.else_statement)
+
+        def if_statement(obj, frame):
+            value = condition(obj, frame)
+            if check_condition and value.t != BOOL_TYPE:
+                obj.interpreter.error(ErrorType.TYPE_ERROR, description, line_num)
+            if value.v:
+                return then_statement(obj, frame)
+            if else_statement is not None:
+                return else_statement(obj, frame)
+            return None
+
+        return if_statement
+
+    # (while expression (statement))
+    def __compile_while(self, code):
+        line_num = code.line_num
+        description = condition_error_description(code)
+        condition, condition_type = self.__compile_expression(code.condition)
+        check_condition = not is_known_type(condition_type, BOOL_TYPE)
+        body = self.__compile_statement(code.body)
+
+        def while_statement(obj, frame):
+            while True:
+                value = condition(obj, frame)
+                if check_condition and value.t != BOOL_TYPE:
+                    obj.interpreter.error(ErrorType.TYPE_ERROR, description, line_num)
+                if not value.v:
+                    return None
+                result = body(obj, frame)
+                if result is not None:
+                    return result
+
+        return while_statement
+
+    # (return [expression])
+    def __compile_return(self, code):
+        if code.expression is None:
+            return lambda obj, frame: RETURN_NOTHING
+        line_num = code.line_num
+        return_type = self.method_def.get_return_type()
+        expression, value_type = self.__compile_expression(code.expression)
+        if is_known_type(value_type, return_type):
+            return expression
+
+        def return_statement(obj, frame):
+            result = expression(obj, frame)
+            if result.is_typeless_null():
+                check_assignment(obj, return_type, result, line_num)
+                result = Value(return_type, None)  # propagate return type to null
+            check_assignment(obj, return_type, result, line_num)
+            return result
+
+        return return_statement
+
+    # (print expression1 expression2 ...)
+    def __compile_print(self, code):
+        expressions = [self.__compile_expression(expr)[0] for expr in code.expressions]
+
+        def print_statement(obj, frame):
+            output = ""
+            for expression in expressions:
+                term = expression(obj, frame)
+                val = term.v
+                if term.t == BOOL_TYPE:
+                    val = "true" if val else "false"
+                output += str(val)
+            obj.interpreter.output(output)
+
+        return print_statement
+
+    # (call object_ref/me/super methodname param1 param2 ...) as a statement
+    def __compile_call_statement(self, code):
+        call = self.__compile_call(code.call)[0]
+
+        def call_statement(obj, frame):
+            call(obj, frame)
+
+        return call_statement
+
+    # returns (expression, type) where type is the exact Type of every value the expression produces if it is known
+    # at compile time, and None otherwise
+    def __compile_expression(self, expr):
+        return MethodCompiler.__expression_compilers[type(expr)](self, expr)
+
+    # a parameter or local
+    def __compile_local_ref(self, expr):
+        slot = expr.slot
+        var_type = expr.var_type
+        if var_type.type_name in PRIMITIVE_OPERATIONS:
+            return (lambda obj, frame: frame[slot]), var_type
+
+        def get_object_variable(_obj, frame):
+            value = frame[slot]
+            if value.is_null():
+                return Value(var_type, None)
+            return value
+
+        return get_object_variable, None
+
+    # a field, or a literal or me that a field could have shadowed
+    def __compile_var_ref(self, expr):
+        if expr.name in self.class_def.field_map:
+            field_type = self.class_def.field_map[expr.name].type
+            field_slot = self.class_def.field_slots[expr.name]
+            if field_type.type_name in PRIMITIVE_OPERATIONS:
+                return (lambda obj, _frame: obj.slots[field_slot]), field_type
+
+            def get_object_field(obj, _frame):
+                value = obj.slots[field_slot]
+                if value.is_null():
+                    return Value(field_type, None)
+                return value
+
+            return get_object_field, None
+
+        value = expr.literal
+        if value is not None:
+            return (lambda obj, frame: value), value.type()
+        if expr.name == InterpreterBase.ME_DEF:
+            return self.__compile_me(expr)
+        return (
+            MethodCompiler.__compile_error(
+                ErrorType.NAME_ERROR, "invalid field or parameter " + expr.name, expr.line_num
+            ),
+            None,
+        )
+
+    def __compile_literal(self, expr):
+        value = expr.value
+        return (lambda obj, frame: value), value.type()
+
+    def __compile_me(self, _expr):
+        return (lambda obj, frame: obj.get_me_as_value()), None
+
+    # a parenthesized expression that isn't an operation, call or new
+    def __compile_unknown_expression(self, _expr):
+        return (lambda obj, frame: None), None
+
+    # (op expression1 expression2)
+    def __compile_binary_operation(self, expr):
+        operator_token = expr.operator
+        line_num = expr.line_num
+        left, left_type = self.__compile_expression(expr.left)
+        right, right_type = self.__compile_expression(expr.right)
+        result_type = BOOL_TYPE if operator_token in BOOL_RESULT_OPERATORS else None
+
+        if is_known_type(right_type, left_type):
+            if left_type.type_name in PRIMITIVE_OPERATIONS:
+                operations, error_description = PRIMITIVE_OPERATIONS[left_type.type_name]
+                if operator_token not in operations:
+
+                    def invalid_operation(obj, frame):
+                        left(obj, frame)
+                        right(obj, frame)
+                        obj.interpreter.error(ErrorType.TYPE_ERROR, error_description, line_num)
+
+                    return invalid_operation, None
+                operation, result_type = operations[operator_token]
+                make_value = VALUE_FACTORIES[result_type]
+
+                def primitive_operation(obj, frame):
+                    return make_value(operation(left(obj, frame).v, right(obj, frame).v))
+
+                return primitive_operation, result_type
+
+        def binary_operation(obj, frame):
+            return obj.evaluate_binary_operation(
+                operator_token, left(obj, frame), right(obj, frame), line_num
+            )
+
+        return binary_operation, result_type
+
+    # (op expression)
+    def __compile_unary_operation(self, expr):
+        operator_token = expr.operator
+        line_num = expr.line_num
+        operand, operand_type = self.__compile_expression(expr.operand)
+        if is_known_type(operand_type, BOOL_TYPE):
+            return (lambda obj, frame: bool_value(not operand(obj, frame).v)), BOOL_TYPE
+
+        def unary_operation(obj, frame):
+            return obj.evaluate_unary_operation(operator_token, operand(obj, frame), line_num)
+
+        return unary_operation, None
+
+    # (new classname)
+    def __compile_new(self, expr):
+        class_name = expr.class_name
+        class_type = expr.class_type
+        line_num = expr.line_num
+
+        def new(obj, _frame):
+            return Value(class_type, obj.interpreter.instantiate(class_name, line_num))
+
+        return new, class_type
+
+    # (call object_ref/me/super methodname p1 p2 p3)
+    def __compile_call(self, expr):
+        method_name = expr.method_name
+        line_num = expr.line_num
+        arguments = [self.__compile_expression(arg)[0] for arg in expr.args]
+
+        if expr.target is CallExpr.ME:
+
+            def call_me(obj, frame):
+                actual_args = [argument(obj, frame) for argument in arguments]
+                return obj.call_method(method_name, actual_args, False, line_num)
+
+            return call_me, None
+
+        if expr.target is CallExpr.SUPER:
+
+            def call_super(obj, frame):
+                if not obj.super_object:
+                    obj.interpreter.error(
+                        ErrorType.TYPE_ERROR,
+                        "invalid call to super object by class " + obj.class_def.get_name(),
+                        line_num,
+                    )
+                actual_args = [argument(obj, frame) for argument in arguments]
+                return obj.super_object.call_method(method_name, actual_args, True, line_num)
+
+            return call_super, None
+
+        target = self.__compile_expression(expr.target)[0]
+
+        def call_object(obj, frame):
+            target_value = target(obj, frame)
+            if target_value.is_null():
+                obj.interpreter.error(ErrorType.FAULT_ERROR, "null dereference", line_num)
+            actual_args = [argument(obj, frame) for argument in arguments]
+            return target_value.v.call_method(method_name, actual_args, False, line_num)
+
+        return call_object, None
+
+    # dispatch tables mapping each statement and expression node class to its compiler; the fused nodes compile
+    # like the nodes they replace, since the closures already specialize on the static types of the operands
+    __statement_compilers = {
+        BeginStmt: __compile_begin,
+        LetStmt: __compile_let,
+        SetStmt: __compile_set,
+        IncrementLocalStmt: __compile_set,
+        IncrementFieldStmt: __compile_set,
+        InputStmt: __compile_input,
+        IfStmt: __compile_if,
+        WhileStmt: __compile_while,
+        ReturnStmt: __compile_return,
+        PrintStmt: __compile_print,
+        CallStmt: __compile_call_statement,
+        UnknownStmt: __compile_unknown,
+    }
+    __expression_compilers = {
+        LocalRef: __compile_local_ref,
+        VarRef: __compile_var_ref,
+        LiteralExpr: __compile_literal,
+        MeExpr: __compile_me,
+        BinOpExpr: __compile_binary_operation,
+        CompareLocalExpr: __compile_binary_operation,
+        UnaryOpExpr: __compile_unary_operation,
+        NewExpr: __compile_new,
+        CallExpr: __compile_call,
+        UnknownExpr: __compile_unknown_expression,
+    }
+
+
+# reports a type error unless value can be assigned to a variable of type var_type
+def check_assignment(obj, var_type, value, line_num):
+    if not obj.interpreter.check_type_compatibility(var_type, value.type(), True):
+        obj.interpreter.error(
+            ErrorType.TYPE_ERROR,
+            type_mismatch_description(var_type, value.type()),
+            line_num,
+        )
@@ -0,0 +1,85 @@
+from intbase import InterpreterBase
+
+
+# The inline cache of one (call ...) site, which remembers how the calls made there were resolved so the tree walker
+# doesn't have to search the object's class and superclasses for the method on every call (see
+# ObjectDef.call_method). How a call resolves depends only on the method name and the calling class, which are the
+# same for every call made at a site, and on the key: the class of the object the call is on (None for calls on
+# super, which don't depend on it) and the types of the arguments. Each entry maps a key to
+# (number of superclass parts between the part the search starts at and the part defining the method, MethodDef).
+#
+# A cache starts out empty, is monomorphic once it has an entry and polymorphic once it has more than one. A call
+# with a new key once the cache has POLYMORPHIC_LIMIT entries makes it megamorphic: its entries are dropped and every
+# later call at the site is resolved from scratch, since a site that sees that many kinds of objects is unlikely to
+# hit often enough to pay for the lookup.
+class InlineCache:
+    POLYMORPHIC_LIMIT = 4
+
+    def __init__(self):
+        self.entries = {}
+        self.megamorphic = False
+        self.hits = 0
+        self.misses = 0
+
+    # returns the entry for key, or None
+    def lookup(self, key):
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return entry
+
+    def store(self, key, entry):
+        if self.megamorphic:
+            return
+        if len(self.entries) >= InlineCache.POLYMORPHIC_LIMIT:
+            self.megamorphic = True
+            self.entries.clear()
+            return
+        self.entries[key] = entry
+
+    def state(self):
+        if self.megamorphic:
+            return "megamorphic"
+        if not self.entries:
+            return "uninitialized"
+        if len(self.entries) == 1:
+            return "monomorphic"
+        return "polymorphic"
+
+
+# yields (ClassDef, MethodDef, CallExpr) for each call site in the methods of the classes in class_index
+def call_sites(class_index):
+    for class_def in class_index.values():
+        for method_def in class_def.get_methods():
+            for call in method_def.call_sites:
+                yield class_def, method_def, call
+
+
+# returns (hits, misses) summed over the inline caches of every call site in class_index
+def totals(class_index):
+    hits = misses = 0
+    for _, _, call in call_sites(class_index):
+        hits += call.inline_cache.hits
+        misses += call.inline_cache.misses
+    return hits, misses
+
+
+# returns one line per call site in class_index that has run, busiest first, describing its inline cache
+def report(class_index):
+    sites = [site for site in call_sites(class_index) if site[2].inline_cache.hits or site[2].inline_cache.misses]
+    sites.sort(key=lambda site: -(site[2].inline_cache.hits + site[2].inline_cache.misses))
+    lines = []
+    for class_def, method_def, call in sites:
+        cache = call.inline_cache
+        if call.target is InterpreterBase.ME_DEF or call.target is InterpreterBase.SUPER_DEF:
+            target = call.target
+        else:
+            target = "object"
+        lines.append(
+            f"{class_def.get_name()}.{method_def.get_method_name()} line {call.line_num}, "
+            f"call {target} {call.method_name}: {cache.state()}, {len(cache.entries)} entries, "
+            f"{cache.hits} hits, {cache.misses} misses"
+        )
+    return lines
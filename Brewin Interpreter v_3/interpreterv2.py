@@ -1,27 +1,115 @@
 from classv2 import ClassDef
 from intbase import InterpreterBase, ErrorType
-from bparser import BParser
+from jitv2 import TieredEngine
+from bytecodev2 import BytecodeEngine
+from cachev2 import ProgramCache
+from closurev2 import ClosureEngine
 from objectv2 import ObjectDef
-from type_valuev2 import TypeManager
+from sourcev2 import parse_stream
+from transpilerv2 import TranspilerEngine
+from type_valuev2 import TypeManager, LiteralPool
+from typecheckv2 import TypeChecker, TypeCheckError
 
 # need to document that each class has at least one method guaranteed
 
+
+# A compiled program: the type hierarchy and the ClassDefs for every class, built once by Interpreter.compile
+# and then run any number of times by Interpreter.run
+class Program:
+    def __init__(self, type_manager, class_index):
+        self.type_manager = type_manager
+        self.class_index = class_index
+        self.type_errors = None  # the TypeCheckErrors found by the static type checker, once it has run
+
+
 # Main interpreter class
 class Interpreter(InterpreterBase):
-    def __init__(self, console_output=True, inp=None, trace_output=False):
+    # execution engines that can be selected with the engine constructor argument
+    TREE_ENGINE = "tree"  # walks the parse tree of each statement every time it runs
+    CLOSURE_ENGINE = "closure"  # compiles each method into python closures on its first call (see closurev2.py)
+    BYTECODE_ENGINE = "bytecode"  # compiles each method into bytecode for a stack VM on first call (see bytecodev2.py)
+    TRANSPILER_ENGINE = "brewin2py"  # translates the whole program into a python module (see transpilerv2.py)
+    TIERED_ENGINE = "tiered"  # interprets each method until it gets hot, then compiles it to python (see jitv2.py)
+
+    # if cache_dir is set (e.g., to ProgramCache.DEFAULT_DIR), parsed programs are cached on disk there, keyed by
+    # the hash of their source, and the cache is kept under cache_max_bytes. jit_threshold is the number of calls
+    # after which the tiered engine compiles a method. max_call_depth is the number of calls the bytecode engine
+    # lets be in progress at once before it reports a fault, or None for no limit
+    def __init__(
+        self,
+        console_output=True,
+        inp=None,
+        trace_output=False,
+        cache_dir=None,
+        cache_max_bytes=ProgramCache.DEFAULT_MAX_BYTES,
+        engine=TREE_ENGINE,
+        jit_threshold=TieredEngine.DEFAULT_THRESHOLD,
+        max_call_depth=BytecodeEngine.DEFAULT_MAX_CALL_DEPTH,
+    ):
         super().__init__(console_output, inp)
         self.trace_output = trace_output
+        if engine == Interpreter.TREE_ENGINE:
+            self.execution_engine = None
+        elif engine == Interpreter.CLOSURE_ENGINE:
+            self.execution_engine = ClosureEngine()
+        elif engine == Interpreter.BYTECODE_ENGINE:
+            self.execution_engine = BytecodeEngine(max_call_depth)
+        elif engine == Interpreter.TRANSPILER_ENGINE:
+            self.execution_engine = TranspilerEngine()
+        elif engine == Interpreter.TIERED_ENGINE:
+            self.execution_engine = TieredEngine(jit_threshold)
+        else:
+            raise ValueError(f"Unsupported engine {engine}")
+        self.literal_pool = LiteralPool()  # shared by the literals of every program this interpreter loads
+        self.program_cache = None
+        if cache_dir is not None:
+            self.program_cache = ProgramCache(cache_dir, cache_max_bytes)
+        self.validated_source = None  # the last program passed to validate_program, and its compiled Program
+        self.validated_program = None
 
-    # run a program, provided in an array of strings, one string per line of source code
-    # usese the provided BParser class found in parser.py to parse the program into lists
-    def run(self, program):
-        status, parsed_program = BParser.parse(program)
-        if not status:
-            super().error(
-                ErrorType.SYNTAX_ERROR, f"Parse error on program: {parsed_program}"
-            )
-        self.__add_all_class_types_to_type_manager(parsed_program)
-        self.__map_class_names_to_class_defs(parsed_program)
+    # compile a program, provided as an array of strings or any other iterable of lines (e.g., an open file),
+    # one string per line of source code, into a Program. uses sourcev2.parse_stream to parse the program one class
+    # at a time, so each class is registered and its ClassDef is built as soon as its closing paren is read. the
+    # compact parse tree holds interned tokens, with line numbers kept aside in SourceList.line_nums
+    def compile(self, program):
+        if self.program_cache is None:
+            self.__load_program(parse_stream(program, compact=True))
+        else:
+            self.__load_program_through_cache(program)
+        return Program(self.type_manager, self.class_index)
+
+    # compiles the program so that a following run() of the same program object reuses the result.
+    # returns False only if the program has a syntax error
+    def validate_program(self, program):
+        self.validated_source = None
+        self.validated_program = None
+        try:
+            compiled_program = self.compile(program)
+        except RuntimeError:
+            is_valid = self.error_type != ErrorType.SYNTAX_ERROR
+            self.reset()
+            return is_valid
+        self.validated_source = program
+        self.validated_program = compiled_program
+        return True
+
+    # run a program, provided as a Program returned by compile() or as source lines (see compile), with fresh I/O
+    # state. if inp is not None, it replaces the list of input lines passed to the constructor
+    def run(self, program, inp=None):
+        if not isinstance(program, Program):
+            if program is self.validated_source:
+                program = self.validated_program
+            else:
+                program = self.compile(program)
+        self.reset()
+        if inp is not None:
+            self.inp = inp
+        self.type_manager = program.type_manager
+        self.class_index = program.class_index
+        # the static type checker annotates the method bodies so that the tree walker skips runtime type checks
+        # that always pass; errors it finds are still reported when the offending code runs
+        if program.type_errors is None:
+            program.type_errors = TypeChecker(self).check()
 
         # instantiate main class
         invalid_line_num_of_caller = None
@@ -36,6 +124,20 @@ class Interpreter(InterpreterBase):
 
         # program terminates!
 
+    # check-only mode: compiles a program, provided as for compile, and statically checks it without running it.
+    # returns a list of TypeCheckErrors, one for each piece of code that reports an error whenever it runs, or the
+    # error that stopped the program from compiling
+    def check(self, program):
+        try:
+            compiled_program = self.compile(program)
+        except RuntimeError as error:
+            description = str(error).partition(": ")[2]
+            errors = [TypeCheckError(self.error_type, description, self.error_line)]
+            self.reset()
+            return errors
+        compiled_program.type_errors = TypeChecker(self).check()
+        return compiled_program.type_errors
+
     # user passes in the line number of the statement that performed the new command so we can generate an error
     # if the user tries to new an class name that does not exist. This will report the line number of the statement
     # with the new command
@@ -76,25 +178,91 @@ class Interpreter(InterpreterBase):
     def check_type_compatibility(self, typea, typeb, for_assignment=False):
         return self.type_manager.check_type_compatibility(typea, typeb, for_assignment)
 
-    def __map_class_names_to_class_defs(self, program):
-        self.class_index = {}
-        for item in program:
-            if item[0] == InterpreterBase.CLASS_DEF:
-                if item[1] in self.class_index:
-                    super().error(
-                        ErrorType.TYPE_ERROR,
-                        f"Duplicate class name {item[1]}",
-                        item[0].line_num,
+    # reports a syntax error if item is a class definition whose header, fields, methods or parameters don't have
+    # the shape ClassDef and MethodDef expect (e.g., v1 syntax), instead of letting them fail on it
+    # [class classname [inherits superclassname] [field typename varname default_value] ...
+    #  [method return_type method_name [[type1 param1] ...] [statement]] ...]
+    def __check_class_syntax(self, item):
+        if not isinstance(item, list) or not item or item[0] != InterpreterBase.CLASS_DEF:
+            return
+        header_length = 4 if len(item) > 2 and item[2] == InterpreterBase.INHERITS_DEF else 2
+        if len(item) < header_length or not all(isinstance(token, str) for token in item[1:header_length]):
+            super().error(ErrorType.SYNTAX_ERROR, "malformed class definition", item.line_num)
+        for member in item[header_length:]:
+            if not isinstance(member, list) or not member:
+                continue
+            # like ClassDef and MethodDef, anything after the default value or body is ignored
+            if member[0] == InterpreterBase.FIELD_DEF:
+                well_formed = len(member) >= 4 and all(isinstance(token, str) for token in member[:4])
+            elif member[0] == InterpreterBase.METHOD_DEF:
+                well_formed = (
+                    len(member) >= 5
+                    and isinstance(member[1], str)
+                    and isinstance(member[2], str)
+                    and isinstance(member[3], list)
+                    and all(
+                        isinstance(param, list) and len(param) == 2 and all(isinstance(token, str) for token in param)
+                        for param in member[3]
                     )
-                self.class_index[item[1]] = ClassDef(item, self)
+                )
+            else:
+                continue
+            if not well_formed:
+                super().error(ErrorType.SYNTAX_ERROR, f"malformed {member[0]} definition", member.line_num)
 
-    # [class classname inherits superclassname [items]]
-    def __add_all_class_types_to_type_manager(self, parsed_program):
+    # registers the type and builds the ClassDef of each (status, item) pair yielded by sourcev2.parse_stream.
+    # if parsed_items is a list, each item is appended to it as it is loaded
+    def __load_program(self, parsed_stream, check_types=True, parsed_items=None):
         self.type_manager = TypeManager()
-        for item in parsed_program:
-            if item[0] == InterpreterBase.CLASS_DEF:
-                class_name = item[1]
-                superclass_name = None
-                if item[2] == InterpreterBase.INHERITS_DEF:
-                    superclass_name = item[3]
-                self.type_manager.add_class_type(class_name, superclass_name)
+        self.class_index = {}
+        for status, item in parsed_stream:
+            if not status:
+                super().error(
+                    ErrorType.SYNTAX_ERROR, f"Parse error on program: {item}"
+                )
+            if parsed_items is not None:
+                parsed_items.append(item)
+            self.__check_class_syntax(item)
+            self.__add_class_type_to_type_manager(item)
+            self.__map_class_name_to_class_def(item)
+        self.type_manager.freeze()  # every class is registered, so subtype tests can use the encoded hierarchy
+        # field and method types may refer to classes defined later in the program, so they are
+        # only checked once every class has been registered
+        if check_types:
+            for class_def in self.class_index.values():
+                class_def.check_types()
+
+    # on a cache hit, the cached parse tree is loaded without lexing; it was only stored after loading and
+    # type checking it succeeded, so the type checks are skipped too. on a miss, the program is loaded normally
+    # and then stored
+    def __load_program_through_cache(self, program):
+        lines = list(program)  # the whole source is needed to compute the key
+        key = self.program_cache.key(lines)
+        cached_items = self.program_cache.load(key)
+        if cached_items is not None:
+            self.__load_program(((True, item) for item in cached_items), False)
+            return
+        parsed_items = []
+        self.__load_program(
+            parse_stream(lines, compact=True), True, parsed_items
+        )
+        self.program_cache.store(key, parsed_items)
+
+    def __map_class_name_to_class_def(self, item):
+        if item[0] == InterpreterBase.CLASS_DEF:
+            if item[1] in self.class_index:
+                super().error(
+                    ErrorType.TYPE_ERROR,
+                    f"Duplicate class name {item[1]}",
+                    item.line_num,
+                )
+            self.class_index[item[1]] = ClassDef(item, self)
+
+    # [class classname inherits superclassname [items]]
+    def __add_class_type_to_type_manager(self, item):
+        if item[0] == InterpreterBase.CLASS_DEF:
+            class_name = item[1]
+            superclass_name = None
+            if item[2] == InterpreterBase.INHERITS_DEF:
+                superclass_name = item[3]
+            self.type_manager.add_class_type(class_name, superclass_name)
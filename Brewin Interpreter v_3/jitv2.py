@@ -0,0 +1,143 @@
+import time
+
+from intbase import InterpreterBase
+from transpilerv2 import Transpiler, load_module
+
+
+# Execution engine that runs each method on the tree walker until it has been called threshold times, and then
+# compiles it into a python function with brewin2py (see transpilerv2.py) and runs that function from then on. Most
+# methods run only a few times and never pay for compilation, while hot ones, like small recursive helpers, do.
+#
+# Hot methods are compiled for the class of the object they are running on when they get promoted: calls on me are
+# resolved against that class at compile time, so they become direct calls whose primitive results stay unboxed.
+# Every call of such a method first checks that the object is still of that class; if it isn't, the assumption
+# baked into the compiled code doesn't hold, and the call falls back to the tree walker. A method whose check fails
+# DEOPTIMIZATION_LIMIT times is recompiled without assuming anything about the object's class.
+class TieredEngine:
+    DEFAULT_THRESHOLD = 50  # calls after which a method is compiled
+    DEOPTIMIZATION_LIMIT = 10
+
+    def __init__(self, threshold=DEFAULT_THRESHOLD):
+        self.threshold = threshold
+        self.profiles = {}  # MethodDef -> MethodProfile
+        self.profiled_class_index = None  # the class index of the program the profiles are for
+
+    # runs method_def on obj, the ObjectDef part of the class that defines the method; actual_params is a list of
+    # Values that were already checked against the formal parameter types
+    def run_method(self, obj, method_def, actual_params):
+        profile = self.profiles.get(method_def)
+        if profile is None:
+            if obj.interpreter.class_index is not self.profiled_class_index:
+                # a new program is running; drop the profiles and compiled functions of the previous one
+                self.profiles = {}
+                self.profiled_class_index = obj.interpreter.class_index
+            profile = self.profiles[method_def] = MethodProfile(obj.class_def, method_def)
+        profile.calls += 1
+        function = profile.function
+        if function is not None:
+            if profile.guard_class is None or obj.anchor_object.class_def is profile.guard_class:
+                return function(obj, *actual_params)
+            return self.__deoptimize(obj, profile, actual_params)
+        if profile.calls >= self.threshold and profile.compilable:
+            self.__compile(obj, profile, obj.anchor_object.class_def)
+            if profile.function is not None:
+                return profile.function(obj, *actual_params)
+        return obj.interpret_method(method_def, actual_params)
+
+    # runs a call whose object isn't of the class the method was compiled for
+    def __deoptimize(self, obj, profile, actual_params):
+        profile.deoptimizations += 1
+        if profile.deoptimizations >= TieredEngine.DEOPTIMIZATION_LIMIT:
+            self.__compile(obj, profile, None)
+            if profile.function is not None:
+                return profile.function(obj, *actual_params)
+        return obj.interpret_method(profile.method_def, actual_params)
+
+    # compiles the method of profile, assuming it runs on objects of class anchor_class if that isn't None
+    def __compile(self, obj, profile, anchor_class):
+        start = time.perf_counter()
+        interpreter = obj.interpreter
+        transpiler = Transpiler(interpreter, self.run_method)
+        resolver = CallResolver(profile.class_def, anchor_class)
+        source = transpiler.translate_method(profile.class_def, profile.method_def, resolver.resolve)
+        try:
+            module = load_module(source, transpiler.bindings)
+        except (SyntaxError, RecursionError, MemoryError):
+            # too deeply nested for python to compile (see TranspilerEngine.load_program); keep interpreting it
+            profile.function = None
+            profile.compilable = False
+        else:
+            profile.function = module.FUNCTION
+            profile.guard_class = anchor_class if resolver.speculated else None
+            profile.compilations += 1
+        profile.compile_seconds += time.perf_counter() - start
+
+    # returns the profiles of the methods that were compiled
+    def promoted_methods(self):
+        return [profile for profile in self.profiles.values() if profile.compilations]
+
+    # returns the total time spent compiling methods, in seconds
+    def compile_seconds(self):
+        return sum(profile.compile_seconds for profile in self.profiles.values())
+
+    # returns one line per method that has run, hottest first, describing how it ran
+    def report(self):
+        profiles = sorted(self.profiles.values(), key=lambda profile: -profile.calls)
+        return [str(profile) for profile in profiles]
+
+
+# The counters TieredEngine keeps for one method
+class MethodProfile:
+    def __init__(self, class_def, method_def):
+        self.class_def = class_def  # the class defining the method
+        self.method_def = method_def
+        self.calls = 0
+        self.function = None  # the compiled function, once the method is promoted
+        self.guard_class = None  # the ClassDef the compiled function assumes the object is, or None
+        self.compilable = True
+        self.compilations = 0
+        self.compile_seconds = 0.0
+        self.deoptimizations = 0  # calls that fell back to the tree walker because the object had another class
+
+    def __str__(self):
+        name = f"{self.class_def.get_name()}.{self.method_def.get_method_name()}"
+        if not self.compilations:
+            state = "interpreted" if self.compilable else "interpreted (could not be compiled)"
+        elif self.guard_class is None:
+            state = "compiled"
+        else:
+            state = f"compiled for class {self.guard_class.get_name()}"
+        return (
+            f"{name}: {self.calls} calls, {state}, {self.compilations} compilations in "
+            f"{self.compile_seconds * 1000:.2f} ms, {self.deoptimizations} deoptimizations"
+        )
+
+
+# Resolves calls on me and super in a method of class_def at compile time (see MethodTranspiler), the way
+# ObjectDef.call_method would for arguments of the given types. Calls on super don't depend on the object, but calls
+# on me are only resolved if anchor_class, the class the object is assumed to be, is given; speculated is set if
+# any was.
+class CallResolver:
+    def __init__(self, class_def, anchor_class):
+        self.class_def = class_def
+        self.anchor_class = anchor_class
+        self.speculated = False
+
+    def resolve(self, target, method_name, arg_types):
+        if any(arg_type is None for arg_type in arg_types):
+            return None
+        if target == InterpreterBase.SUPER_DEF:
+            superclass = self.class_def.get_superclass()
+            found = None if superclass is None else superclass.find_method(method_name, arg_types)
+            if found is None:
+                return None
+            num_superclasses, method_def = found
+            return f"obj.get_part(obj.part_index + {num_superclasses + 1})", method_def
+
+        if self.anchor_class is None or self.class_def.find_method(method_name, arg_types) is None:
+            return None  # can't be resolved, or the call reports an unknown method
+        num_superclasses, method_def = self.anchor_class.find_method(method_name, arg_types)
+        self.speculated = True
+        if method_def in self.class_def.get_methods():
+            return "obj", method_def
+        return f"obj.get_part({num_superclasses})", method_def
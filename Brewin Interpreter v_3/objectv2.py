@@ -1,240 +1,328 @@
-from classv2 import VariableDef
-import copy
-from env_v2 import EnvironmentManager
+from astv2 import (
+    BeginStmt,
+    LetStmt,
+    SetStmt,
+    IncrementLocalStmt,
+    IncrementFieldStmt,
+    InputStmt,
+    IfStmt,
+    WhileStmt,
+    ReturnStmt,
+    PrintStmt,
+    CallStmt,
+    UnknownStmt,
+    LiteralExpr,
+    LocalRef,
+    VarRef,
+    MeExpr,
+    BinOpExpr,
+    CompareLocalExpr,
+    UnaryOpExpr,
+    NewExpr,
+    CallExpr,
+    UnknownExpr,
+)
 from intbase import InterpreterBase, ErrorType
-from type_valuev2 import create_value, create_default_value
-from type_valuev2 import Type, Value
+from operationsv2 import type_mismatch_description, invalid_default_description, condition_error_description
+from type_valuev2 import create_default_value
+from type_valuev2 import Type, Value, int_value, bool_value, string_value, INT_TYPE
 
 
+# An object, or one part of it. An object is created with the most derived class it is an instance of, and holds the
+# Values of the fields of that class and all its superclasses in a single list (see ClassDef.field_slots). A method
+# of a class runs on the part of the object for that class, which sees the object's fields and knows where calls on
+# super and me start. The object itself is the part for the most derived class; the parts for its superclasses
+# share its fields and are only created when a method of their class first runs.
 class ObjectDef:
+    __slots__ = ("interpreter", "class_def", "anchor_object", "trace_output", "slots", "parts", "part_index")
+
     # statement execution results
     STATUS_PROCEED = 0
     STATUS_RETURN = 1
+    STATUS_TAIL_CALL = 2  # a (return (call ...)) left the call for interpret_method to run, see __execute_return
 
     # type constants
     INT_TYPE_CONST = Type(InterpreterBase.INT_DEF)
     STRING_TYPE_CONST = Type(InterpreterBase.STRING_DEF)
     BOOL_TYPE_CONST = Type(InterpreterBase.BOOL_DEF)
 
-    # class_def is a ClassDef object
-    def __init__(self, interpreter, class_def, anchor_object=None, trace_output=False):
+    # the operations that can be applied to Values of each type, shared by all objects, e.g., (+ 5 6)
+    binary_ops = {}
+    binary_ops[InterpreterBase.INT_DEF] = {
+        "+": lambda a, b: int_value(a.value() + b.value()),
+        "-": lambda a, b: int_value(a.value() - b.value()),
+        "*": lambda a, b: int_value(a.value() * b.value()),
+        "/": lambda a, b: int_value(a.value() // b.value()),  # // for integer ops
+        "%": lambda a, b: int_value(a.value() % b.value()),
+        "==": lambda a, b: bool_value(a.value() == b.value()),
+        "!=": lambda a, b: bool_value(a.value() != b.value()),
+        ">": lambda a, b: bool_value(a.value() > b.value()),
+        "<": lambda a, b: bool_value(a.value() < b.value()),
+        ">=": lambda a, b: bool_value(a.value() >= b.value()),
+        "<=": lambda a, b: bool_value(a.value() <= b.value()),
+    }
+    binary_ops[InterpreterBase.STRING_DEF] = {
+        "+": lambda a, b: string_value(a.value() + b.value()),
+        "==": lambda a, b: bool_value(a.value() == b.value()),
+        "!=": lambda a, b: bool_value(a.value() != b.value()),
+        ">": lambda a, b: bool_value(a.value() > b.value()),
+        "<": lambda a, b: bool_value(a.value() < b.value()),
+        ">=": lambda a, b: bool_value(a.value() >= b.value()),
+        "<=": lambda a, b: bool_value(a.value() <= b.value()),
+    }
+    binary_ops[InterpreterBase.BOOL_DEF] = {
+        "&": lambda a, b: bool_value(a.value() and b.value()),
+        "|": lambda a, b: bool_value(a.value() or b.value()),
+        "==": lambda a, b: bool_value(a.value() == b.value()),
+        "!=": lambda a, b: bool_value(a.value() != b.value()),
+    }
+    binary_ops[InterpreterBase.CLASS_DEF] = {
+        "==": lambda a, b: bool_value(a.value() == b.value()),
+        "!=": lambda a, b: bool_value(a.value() != b.value()),
+    }
+
+    unary_ops = {}
+    unary_ops[InterpreterBase.BOOL_DEF] = {
+        "!": lambda a: bool_value(not a.value()),
+    }
+
+    # class_def is a ClassDef object. anchor_object is None for a new object; otherwise this is the part of
+    # anchor_object for class_def, which is at part_index in its parts
+    def __init__(self, interpreter, class_def, anchor_object=None, trace_output=False, part_index=0):
         self.interpreter = interpreter  # objref to interpreter object. used to report errors, get input, produce output
         self.class_def = class_def
-
+        self.trace_output = trace_output
+        self.part_index = part_index  # the index of this part in parts
         if anchor_object is None:
             self.anchor_object = self
+            self.slots = list(class_def.field_prototype)  # the fields, set to their defaults
+            class_def.num_allocations += 1
+            # the parts of the object, from the most derived class to the base class, or None until created
+            self.parts = [self] + [None] * class_def.num_superclasses
         else:
             self.anchor_object = anchor_object
-        self.trace_output = trace_output
-        self.__instantiate_fields()
-        self.__map_method_names_to_method_definitions()
-        self.__create_map_of_operations_to_lambdas()  # sets up maps to facilitate binary and unary operations, e.g., (+ 5 6)
-        self.__init_superclass_if_any()  # construct default values for superclass fields all the way to the base class
-
-    def __get_obj_with_method(self, start_obj, method_name, actual_params):
-        cur_obj = start_obj
-        while cur_obj is not None:
-            if method_name not in cur_obj.methods:
-                cur_obj = cur_obj.super_object
-                continue
-            method_def = cur_obj.methods[method_name]
-            if len(actual_params) == len(
-                method_def.formal_params
-            ) and self.__compatible_param_types(
-                actual_params, method_def.formal_params
-            ):
-                break
+            self.slots = anchor_object.slots
+            self.parts = anchor_object.parts
 
-            cur_obj = cur_obj.super_object
-
-        return cur_obj
+    # returns the part of the object at part_index in parts, creating it if needed
+    def get_part(self, part_index):
+        part = self.parts[part_index]
+        if part is None:
+            anchor = self.anchor_object
+            class_def = anchor.class_def
+            for _ in range(part_index):
+                class_def = class_def.get_superclass()
+            part = ObjectDef(self.interpreter, class_def, anchor, self.trace_output, part_index)
+            self.parts[part_index] = part
+        return part
+
+    # the part of the object for the superclass of this part's class, or None if the class has no superclass
+    @property
+    def super_object(self):
+        if self.class_def.super_class is None:
+            return None
+        return self.get_part(self.part_index + 1)
 
     # actual_params is a list of Value objects; all parameters are passed by value
     # the caller passes in its line number so if there's an error (e.g., mismatched # of parameters or unknown
     # method name) we can generate an error at the source (where the call is initiated) for better context
     def call_method(self, method_name, actual_params, super_only, line_num_of_caller):
+        num_superclasses, method_def = self.resolve_method(
+            method_name, actual_params, super_only, line_num_of_caller
+        )
+        start = self if super_only else self.anchor_object
+        obj_to_call_on = start.get_part(start.part_index + num_superclasses)
+        return obj_to_call_on.invoke_method(method_def, actual_params)
+
+    # returns (number of superclasses between the class of the part the search starts at and the class defining the
+    # method, MethodDef) for the version of method_name a call of it on this object part with actual_params runs.
+    # The search starts at the most derived part of the object, or at this part if super_only is set.
+    def resolve_method(self, method_name, actual_params, super_only, line_num_of_caller):
+        arg_types = [actual.type() for actual in actual_params]
         # check to see if we have a method in this class or its base class(es) matching this signature
-        if self.__get_obj_with_method(self, method_name, actual_params) is None:
+        found = self.class_def.find_method(method_name, arg_types)
+        if found is None:
             self.interpreter.error(
                 ErrorType.NAME_ERROR,
                 "unknown method " + method_name,
                 line_num_of_caller,
             )
+        if super_only:
+            return found
 
         # Yes, we have a method with the right name/parameters known to this class or its base classes...
         # So now find the proper version of the method in the most-derived class, which may be in a derived class
-        # of this class!  Start from the anchor object (most derived part of the object) and search for the most
-        # derived object part that has this method.
-        if super_only:
-            anchor = self
-        else:
-            anchor = self.anchor_object
-        obj_to_call_on = self.__get_obj_with_method(anchor, method_name, actual_params)
-
-        method_def = obj_to_call_on.methods[method_name]
-
-        # handle the call in the object
-        env = (
-            EnvironmentManager()
-        )  # maintains lexical environment for function; just params for now
-        for formal, actual in zip(method_def.formal_params, actual_params):
-            formal_copy = copy.copy(formal)  # VariableDef obj.
-            formal_copy.set_value(actual)  # actual is a Value obj.
-            if not env.create_new_symbol(formal_copy.name):
-                self.interpreter.error(
+        # of this class! The vtable of the most derived class already has overriding applied.
+        return self.anchor_object.class_def.find_method(method_name, arg_types)
+
+    # runs method_def, a method of this object part's class, with the selected execution engine
+    def invoke_method(self, method_def, actual_params):
+        # an alternative execution engine, if one was selected, runs the method body instead of the tree walker below
+        engine = self.interpreter.execution_engine
+        if engine is not None:
+            return engine.run_method(self, method_def, actual_params)
+        return self.interpret_method(method_def, actual_params)
+
+    # runs method_def, a method of this object part's class, on the tree walker; actual_params is a list of Values
+    # that were already checked against the formal parameter types
+    def interpret_method(self, method_def, actual_params):
+        obj = self
+        # a method that ends with a tail call is finished once the call is made, so the called method runs in this
+        # loop instead of a nested one, which keeps the python stack from growing with the depth of tail recursion.
+        # The checks of the returns that made tail calls still apply to the final result, latest first.
+        pending_checks = []
+        while True:
+            if method_def.duplicate_param_name is not None:
+                obj.interpreter.error(
                     ErrorType.NAME_ERROR,
-                    "duplicate formal param name " + formal.name,
+                    "duplicate formal param name " + method_def.duplicate_param_name,
                     method_def.line_num,
                 )
-            env.set(formal_copy.name, formal_copy)
-        # since each method has a single top-level statement, execute it.
-        status, return_value = obj_to_call_on.__execute_statement(
-            env, method_def.return_type, method_def.code
-        )
+            # the frame holds the Value of each parameter and local in its slot (see astv2.py); parameters come first
+            frame = actual_params + [None] * (method_def.frame_size - len(actual_params))
+            # since each method has a single top-level statement, execute it.
+            status, return_value = obj.__execute_statement(
+                frame, method_def.return_type, method_def.body
+            )
+            if status != ObjectDef.STATUS_TAIL_CALL:
+                break
+            obj, method_def, actual_params, return_type, code = return_value
+            if code.dynamic_check:
+                pending_checks.append((return_type, code.line_num))
         # if the method explicitly used the (return expression) statement to return a value, then return that
         # value back to the caller
-        if status == ObjectDef.STATUS_RETURN and return_value is not None:
-            return return_value
-        # The method didn't explicitly return a value, so return the default return type for the method
-        return create_default_value(method_def.get_return_type())
+        if status != ObjectDef.STATUS_RETURN or return_value is None:
+            # The method didn't explicitly return a value, so return the default return type for the method
+            return_value = create_default_value(method_def.get_return_type())
+        for return_type, line_num in reversed(pending_checks):
+            return_value = self.__check_return_value(return_type, return_value, line_num)
+        return return_value
 
     # def get_me_as_value(self):
     #     return Value(Type(self.class_def.name), self)
 
     def get_me_as_value(self):
         anchor = self.anchor_object
-        return Value(Type(anchor.class_def.name), anchor)
-
-    # checks whether each formal parameter has a compatible type with the actual parameter
-    def __compatible_param_types(self, actual_params, formal_params):
-        for formal, actual in zip(formal_params, actual_params):
-            if not self.interpreter.check_type_compatibility(
-                formal.type, actual.type(), True
-            ):
-                return False
-        return True
+        return Value(anchor.class_def.class_type, anchor)
 
     # returns (status_code, return_value) where:
     # - status_code indicates whether the statement (or one of its sub-statements) executed a return command and thus
     #   the current method needs to terminate immediately, or whether the statement simply ran but didn't execute a
     #   return statement, and thus the next statement in the method should run normally
     # - return value is a value of type Value which is the returned value from the function
-    def __execute_statement(self, env, return_type, code):
+    # code is a Statement node (see astv2.py)
+    def __execute_statement(self, frame, return_type, code):
         if self.trace_output:
-            print(f"{code[0].line_num}: {code}")
-        tok = code[0]
-        if tok == InterpreterBase.BEGIN_DEF:
-            return self.__execute_begin(env, return_type, code)
-        elif tok == InterpreterBase.SET_DEF:
-            return self.__execute_set(env, code)
-        elif tok == InterpreterBase.IF_DEF:
-            return self.__execute_if(env, return_type, code)
-        elif tok == InterpreterBase.CALL_DEF:
-            return self.__execute_call(env, code)
-        elif tok == InterpreterBase.WHILE_DEF:
-            return self.__execute_while(env, return_type, code)
-        elif tok == InterpreterBase.RETURN_DEF:
-            return self.__execute_return(env, return_type, code)
-        elif tok == InterpreterBase.INPUT_STRING_DEF:
-            return self.__execute_input(env, code, True)
-        elif tok == InterpreterBase.INPUT_INT_DEF:
-            return self.__execute_input(env, code, False)
-        elif tok == InterpreterBase.PRINT_DEF:
-            return self.__execute_print(env, code)
-        elif tok == InterpreterBase.LET_DEF:
-            return self.__execute_let(env, return_type, code)
-        else:
-            # Report error via interpreter
-            self.interpreter.error(
-                ErrorType.SYNTAX_ERROR, "unknown statement " + tok, tok.line_num
-            )
+            print(f"{code.line_num}: {code.source}")
+        return ObjectDef.__statement_handlers[type(code)](self, frame, return_type, code)
+
+    # a statement with an unknown keyword, or one that is missing parts
+    def __execute_unknown(self, frame, _return_type, code):
+        # Report error via interpreter
+        self.interpreter.error(ErrorType.SYNTAX_ERROR, code.description, code.line_num)
 
     # This method is used for both the begin and let statements
     # (begin (statement1) (statement2) ... (statementn))
     # (let ((type1 var1 defaultvalue1) ... (typen varn defaultvaluen)) (statement1) ... (statementn))
-    def __execute_begin(self, env, return_type, code, has_vardef=False):
+    def __execute_begin(self, frame, return_type, code, has_vardef=False):
         if has_vardef: #handles the let case
-            code_start = 2
-            env.block_nest()
-            self.__add_locals_to_env(env, code[1], code[0].line_num)
-        else: #handles the begin case
-            code_start = 1
+            self.__add_locals_to_frame(frame, code.local_defs, code.line_num)
 
         status = ObjectDef.STATUS_PROCEED
         return_value = None
-        for statement in code[code_start:]:
-            status, return_value = self.__execute_statement(env, return_type, statement)
-            if status == ObjectDef.STATUS_RETURN:
+        for statement in code.statements:
+            status, return_value = self.__execute_statement(frame, return_type, statement)
+            if status != ObjectDef.STATUS_PROCEED:
                 break
         # if we run through the entire block without a return, then just return proceed
         # we don't want the enclosing block to exit with a return
-        if has_vardef:
-            env.block_unnest()
         return status, return_value  # could be a valid return of a value or an error
 
-    # add all local variables defined in a let to the environment
-    def __add_locals_to_env(self, env, var_defs, line_number):
-        for var_def in var_defs:
-            # vardef in the form of (typename varname defvalue)
-            var_type = Type(var_def[0])
-            var_name = var_def[1]
-            default_value = create_value(var_def[2])
+    # initialize the slots of all local variables defined in a let to their default values
+    def __add_locals_to_frame(self, frame, local_defs, line_number):
+        for local_def in local_defs:
+            default_value = local_def.default_value
+            if default_value is None:
+                self.interpreter.error(
+                    ErrorType.TYPE_ERROR, invalid_default_description(local_def), line_number
+                )
             # make sure default value for each local is of a matching type
-            self.__check_type_compatibility(
-                var_type, default_value.type(), True, line_number
-            )
-            if not env.create_new_symbol(var_name):
+            if local_def.dynamic_check:
+                self.__check_type_compatibility(
+                    local_def.type, default_value.type(), True, line_number
+                )
+            if local_def.slot is None:
                 self.interpreter.error(
                     ErrorType.NAME_ERROR,
-                    "duplicate local variable name " + var_name,
+                    "duplicate local variable name " + local_def.name,
                     line_number,
                 )
-            var_def = VariableDef(var_type, var_name, default_value)
-            env.set(var_name, var_def)
+            frame[local_def.slot] = default_value
 
     # (let ((type1 var1 defval1) (type2 var2 defval2)) (statement1) (statement2) ...)
     # uses helper function __execute_begin to implement its functionality
-    def __execute_let(self, env, return_type, code):
-        return self.__execute_begin(env, return_type, code, True)
+    def __execute_let(self, frame, return_type, code):
+        return self.__execute_begin(frame, return_type, code, True)
 
     # (call object_ref/me methodname param1 param2 param3)
     # where params are expressions, and expresion could be a value, or a (+ ...)
     # statement version of a method call; there's also an expression version of a method call below
-    def __execute_call(self, env, code):
-        return ObjectDef.STATUS_PROCEED, self.__execute_call_aux(
-            env, code, code[0].line_num
-        )
+    def __execute_call(self, frame, _return_type, code):
+        return ObjectDef.STATUS_PROCEED, self.__execute_call_aux(frame, code.call)
 
     # (set varname expression), where expression could be a value, or a (+ ...)
-    def __execute_set(self, env, code):
-        val = self.__evaluate_expression(env, code[2], code[0].line_num)
-        self.__set_variable_aux(
-            env, code[1], val, code[0].line_num
-        )  # checks/reports type and name errors
+    def __execute_set(self, frame, _return_type, code):
+        val = self.__evaluate_expression(frame, code.expression)
+        self.__set_variable_aux(frame, code, val)  # checks/reports type and name errors
+        return ObjectDef.STATUS_PROCEED, None
+
+    # (set local (+ local n)) for an int local; see IncrementLocalStmt
+    def __execute_increment_local(self, frame, return_type, code):
+        value = frame[code.slot]
+        if value.t is not INT_TYPE:
+            return self.__execute_set(frame, return_type, code)
+        frame[code.slot] = int_value(value.v + code.amount)
+        return ObjectDef.STATUS_PROCEED, None
+
+    # (set field (+ field n)); see IncrementFieldStmt
+    def __execute_increment_field(self, frame, return_type, code):
+        slot = self.class_def.field_slots[code.name]
+        value = self.slots[slot]
+        # a field holding an int is an int field, so the new int can be stored without checking the assignment
+        if value.t is not INT_TYPE:
+            return self.__execute_set(frame, return_type, code)
+        self.slots[slot] = int_value(value.v + code.amount)
         return ObjectDef.STATUS_PROCEED, None
 
     # (return expression) where expresion could be a value, or a (+ ...)
-    def __execute_return(self, env, return_type, code):
-        if len(code) == 1:
+    def __execute_return(self, frame, return_type, code):
+        if code.expression is None:
             # [return] with no return value; return default value for type
             return ObjectDef.STATUS_RETURN, None
-        else:
-            result = self.__evaluate_expression(env, code[1], code[0].line_num)
-            # CAREY FIX
-            if result.is_typeless_null():
-                self.__check_type_compatibility(return_type, result.type(), True, code[0].line_num) 
-                result = Value(return_type, None)  # propagate return type to null ###
-        self.__check_type_compatibility(
-            return_type, result.type(), True, code[0].line_num
-        )
-        return ObjectDef.STATUS_RETURN, result
+        if code.tail_call and self.interpreter.execution_engine is None:
+            # (return (call ...)): hand the call to interpret_method rather than running it from here
+            obj_to_call_on, method_def, actual_args = self.__prepare_call(frame, code.expression)
+            return ObjectDef.STATUS_TAIL_CALL, (obj_to_call_on, method_def, actual_args, return_type, code)
+        result = self.__evaluate_expression(frame, code.expression)
+        if not code.dynamic_check:
+            return ObjectDef.STATUS_RETURN, result
+        return ObjectDef.STATUS_RETURN, self.__check_return_value(return_type, result, code.line_num)
+
+    # checks that result can be returned from a method with return_type, and returns it as the method's result
+    def __check_return_value(self, return_type, result, line_num):
+        # CAREY FIX
+        if result.is_typeless_null():
+            self.__check_type_compatibility(return_type, result.type(), True, line_num)
+            result = Value(return_type, None)  # propagate return type to null ###
+        self.__check_type_compatibility(return_type, result.type(), True, line_num)
+        return result
 
     # (print expression1 expression2 ...) where expresion could be a variable, value, or a (+ ...)
-    def __execute_print(self, env, code):
+    def __execute_print(self, frame, _return_type, code):
         output = ""
-        for expr in code[1:]:
+        for expr in code.expressions:
             # TESTING NOTE: Will not test printing of object references
-            term = self.__evaluate_expression(env, expr, code[0].line_num)
+            term = self.__evaluate_expression(frame, expr)
             val = term.value()
             typ = term.type()
             if typ == ObjectDef.BOOL_TYPE_CONST:
@@ -248,48 +336,49 @@ class ObjectDef:
         return ObjectDef.STATUS_PROCEED, None
 
     # (inputs target_variable) or (inputi target_variable) sets target_variable to input string/int
-    def __execute_input(self, env, code, get_string):
+    def __execute_input(self, frame, _return_type, code):
         inp = self.interpreter.get_input()
-        if get_string:
-            val = Value(ObjectDef.STRING_TYPE_CONST, inp)
+        if code.is_string:
+            val = string_value(inp)
         else:
-            val = Value(ObjectDef.INT_TYPE_CONST, int(inp))
+            val = int_value(int(inp))
 
-        self.__set_variable_aux(env, code[1], val, code[0].line_num)
+        self.__set_variable_aux(frame, code, val)
         return ObjectDef.STATUS_PROCEED, None
 
     # helper method used to set either parameter variables or member fields; parameters currently shadow
-    # member fields
-    def __set_variable_aux(self, env, var_name, value, line_num):
+    # member fields. code is the SetStmt or InputStmt doing the assignment
+    def __set_variable_aux(self, frame, code, value):
         # parameters shadows fields, locals shadow parameters (and outer-block locals)
-        if self.__set_local_or_param(
-            env, var_name, value, line_num
-        ):  # may report a type error
+        if code.slot is not None:
+            if code.dynamic_check:
+                self.__check_type_compatibility(code.var_type, value.type(), True, code.line_num)
+            frame[code.slot] = value
             return
-        if self.__set_field(var_name, value, line_num):  # may report a type error
+        if self.__set_field(code.name, value, code.line_num, code.dynamic_check):  # may report a type error
             return
         self.interpreter.error(
-            ErrorType.NAME_ERROR, "unknown field/variable " + var_name, line_num
+            ErrorType.NAME_ERROR, "unknown field/variable " + code.name, code.line_num
         )
 
     # (if expression (statement) (statement) ) where expresion could be a boolean constant (e.g., true), member
     # variable without ()s, or a boolean expression in parens, like (> 5 a)
-    def __execute_if(self, env, return_type, code):
-        condition = self.__evaluate_expression(env, code[1], code[0].line_num)
-        if condition.type() != ObjectDef.BOOL_TYPE_CONST:
+    def __execute_if(self, frame, return_type, code):
+        condition = self.__evaluate_expression(frame, code.condition)
+        if code.dynamic_check and condition.type() != ObjectDef.BOOL_TYPE_CONST:
             self.interpreter.error(
                 ErrorType.TYPE_ERROR,
-                "non-boolean if condition " + ' '.join(x for x in code[1]),
-                code[0].line_num,
+                condition_error_description(code),
+                code.line_num,
             )
         if condition.value():
             status, return_value = self.__execute_statement(
-                env, return_type, code[2]
+                frame, return_type, code.then_statement
             )  # if condition was true
             return status, return_value
-        elif len(code) == 4:
+        elif code.else_statement is not None:
             status, return_value = self.__execute_statement(
-                env, return_type, code[3]
+                frame, return_type, code.else_statement
             )  # if condition was false, do else
             return status, return_value
         else:
@@ -297,148 +386,192 @@ class ObjectDef:
 
     # (while expression (statement) ) where expresion could be a boolean value, boolean member variable,
     # or a boolean expression in parens, like (> 5 a)
-    def __execute_while(self, env, return_type, code):
+    def __execute_while(self, frame, return_type, code):
         while True:
-            condition = self.__evaluate_expression(env, code[1], code[0].line_num)
-            if condition.type() != ObjectDef.BOOL_TYPE_CONST:
+            condition = self.__evaluate_expression(frame, code.condition)
+            if code.dynamic_check and condition.type() != ObjectDef.BOOL_TYPE_CONST:
                 self.interpreter.error(
                     ErrorType.TYPE_ERROR,
-                    "non-boolean while condition " + ' '.join(x for x in code[1]),
-                    code[0].line_num,
+                    condition_error_description(code),
+                    code.line_num,
                 )
             if not condition.value():  # condition is false, exit loop immediately
                 return ObjectDef.STATUS_PROCEED, None
             # condition is true, run body of while loop
-            status, return_value = self.__execute_statement(env, return_type, code[2])
-            if status == ObjectDef.STATUS_RETURN:
+            status, return_value = self.__execute_statement(frame, return_type, code.body)
+            if status != ObjectDef.STATUS_PROCEED:
                 return (
                     status,
                     return_value,
                 )  # could be a valid return of a value or an error
 
-    # var_def is a VariableDef
-    # this method checks to see if a variable holds a null value, and if so, changes the type of the null value
-    # to the type of the variable, e.g.,
-    def __propagate_type_to_null(self, var_def):
-        if var_def.value.is_null():
-            return Value(var_def.type, None)
-        return var_def.value
+    # this method checks to see if a field holds a null value, and if so, changes the type of the null value
+    # to the type of the field
+    def __propagate_type_to_null(self, field_name, value):
+        if value.is_null():
+            return Value(self.class_def.field_map[field_name].type, None)
+        return value
 
     # given an expression, return a Value object with the expression's evaluated result
     # expressions could be: constants (true, 5, "blah"), variables (e.g., x), arithmetic/string/logical expressions
     # like (+ 5 6), (+ "abc" "def"), (> a 5), method calls (e.g., (call me foo)), or instantiations (e.g., new dog_class)
-    def __evaluate_expression(self, env, expr, line_num_of_statement):
-        if type(expr) is not list:
-            # locals shadow member variables
-            var_def = env.get(expr)
-            if var_def is not None:
-                return self.__propagate_type_to_null(var_def)
-            elif expr in self.fields:
-                return self.__propagate_type_to_null(
-                    self.fields[expr]
-                )  # return the Value object
-            # need to check for variable name and get its value too
-            value = create_value(expr)
-            if value is not None:
-                return value
-            if expr == InterpreterBase.ME_DEF:
-                return (
-                    self.get_me_as_value()
-                )  # create Value object for current object with right type
-            self.interpreter.error(
-                ErrorType.NAME_ERROR,
-                "invalid field or parameter " + expr,
-                line_num_of_statement,
-            )
+    # expr is an Expression node (see astv2.py)
+    def __evaluate_expression(self, frame, expr):
+        return ObjectDef.__expression_handlers[type(expr)](self, frame, expr)
+
+    # a parameter or local
+    def __evaluate_local_ref(self, frame, expr):
+        value = frame[expr.slot]
+        if value.is_null():
+            return Value(expr.var_type, None)
+        return value
+
+    # a field, or a literal or me that a field could have shadowed
+    def __evaluate_var_ref(self, frame, expr):
+        slot = self.class_def.field_slots.get(expr.name)
+        if slot is not None:
+            return self.__propagate_type_to_null(
+                expr.name, self.slots[slot]
+            )  # return the Value object
+        if expr.literal is not None:
+            return expr.literal
+        if expr.name == InterpreterBase.ME_DEF:
+            return (
+                self.get_me_as_value()
+            )  # create Value object for current object with right type
+        self.interpreter.error(
+            ErrorType.NAME_ERROR,
+            "invalid field or parameter " + expr.name,
+            expr.line_num,
+        )
 
-        operator = expr[0]
-        if operator in self.binary_op_list:
-            operand1 = self.__evaluate_expression(env, expr[1], line_num_of_statement)
-            operand2 = self.__evaluate_expression(env, expr[2], line_num_of_statement)
-            if (
-                operand1.type() == operand2.type()
-                and operand1.type() == ObjectDef.INT_TYPE_CONST
-            ):
-                if operator not in self.binary_ops[InterpreterBase.INT_DEF]:
-                    self.interpreter.error(
-                        ErrorType.TYPE_ERROR,
-                        "invalid operator applied to ints",
-                        line_num_of_statement,
-                    )
-                return self.binary_ops[InterpreterBase.INT_DEF][operator](
-                    operand1, operand2
+    def __evaluate_literal(self, frame, expr):
+        return expr.value
+
+    def __evaluate_me(self, frame, expr):
+        return self.get_me_as_value()
+
+    # a parenthesized expression that isn't an operation, call or new
+    def __evaluate_unknown(self, frame, expr):
+        return None
+
+    # (op expression1 expression2)
+    def __evaluate_binary_operation(self, frame, expr):
+        operand1 = self.__evaluate_expression(frame, expr.left)
+        operand2 = self.__evaluate_expression(frame, expr.right)
+        if expr.operation is not None:  # the operand types were checked statically
+            function, make_value = expr.operation
+            return make_value(function(operand1.v, operand2.v))
+        specialization = expr.specialization
+        if specialization:
+            left_type, right_type, function = specialization
+            if operand1.t is left_type and operand2.t is right_type:
+                return function(operand1, operand2)
+            expr.specialization = False  # the operand types vary here; don't specialize again
+        function = self.__select_binary_operation(
+            expr.operator, operand1, operand2, expr.line_num
+        )
+        if specialization is None:
+            expr.specialization = (operand1.t, operand2.t, function)
+        return function(operand1, operand2)
+
+    # (op local1 local2) or (op local n) for a comparison op; see CompareLocalExpr
+    def __evaluate_compare_local(self, frame, expr):
+        left = frame[expr.left_slot]
+        right = expr.right.value if expr.right_slot is None else frame[expr.right_slot]
+        if left.t is INT_TYPE is right.t:
+            return bool_value(expr.compare(left.v, right.v))
+        return self.__evaluate_binary_operation(frame, expr)
+
+    # applies a binary operator to two already evaluated Values, checking that the operator is valid for their types
+    def evaluate_binary_operation(self, operator, operand1, operand2, line_num_of_statement):
+        return self.__select_binary_operation(
+            operator, operand1, operand2, line_num_of_statement
+        )(operand1, operand2)
+
+    # returns the function in binary_ops that applies operator to Values of the types of operand1 and operand2,
+    # reporting an error if the operator is not valid for them
+    def __select_binary_operation(self, operator, operand1, operand2, line_num_of_statement):
+        if (
+            operand1.type() == operand2.type()
+            and operand1.type() == ObjectDef.INT_TYPE_CONST
+        ):
+            if operator not in self.binary_ops[InterpreterBase.INT_DEF]:
+                self.interpreter.error(
+                    ErrorType.TYPE_ERROR,
+                    "invalid operator applied to ints",
+                    line_num_of_statement,
                 )
-            if (
-                operand1.type() == operand2.type()
-                and operand1.type() == ObjectDef.STRING_TYPE_CONST
-            ):
-                if operator not in self.binary_ops[InterpreterBase.STRING_DEF]:
-                    self.interpreter.error(
-                        ErrorType.TYPE_ERROR,
-                        "invalid operator applied to strings",
-                        line_num_of_statement,
-                    )
-                return self.binary_ops[InterpreterBase.STRING_DEF][operator](
-                    operand1, operand2
+            return self.binary_ops[InterpreterBase.INT_DEF][operator]
+        if (
+            operand1.type() == operand2.type()
+            and operand1.type() == ObjectDef.STRING_TYPE_CONST
+        ):
+            if operator not in self.binary_ops[InterpreterBase.STRING_DEF]:
+                self.interpreter.error(
+                    ErrorType.TYPE_ERROR,
+                    "invalid operator applied to strings",
+                    line_num_of_statement,
                 )
-            if (
-                operand1.type() == operand2.type()
-                and operand1.type() == ObjectDef.BOOL_TYPE_CONST
-            ):
-                if operator not in self.binary_ops[InterpreterBase.BOOL_DEF]:
-                    self.interpreter.error(
-                        ErrorType.TYPE_ERROR,
-                        "invalid operator applied to bool",
-                        line_num_of_statement,
-                    )
-                return self.binary_ops[InterpreterBase.BOOL_DEF][operator](
-                    operand1, operand2
+            return self.binary_ops[InterpreterBase.STRING_DEF][operator]
+        if (
+            operand1.type() == operand2.type()
+            and operand1.type() == ObjectDef.BOOL_TYPE_CONST
+        ):
+            if operator not in self.binary_ops[InterpreterBase.BOOL_DEF]:
+                self.interpreter.error(
+                    ErrorType.TYPE_ERROR,
+                    "invalid operator applied to bool",
+                    line_num_of_statement,
                 )
-            # handle object reference comparisons last
-            if self.interpreter.check_type_compatibility(
-                operand1.type(), operand2.type(), False
-            ):
-                return self.binary_ops[InterpreterBase.CLASS_DEF][operator](
-                    operand1, operand2
+            return self.binary_ops[InterpreterBase.BOOL_DEF][operator]
+        # handle object reference comparisons last
+        if self.interpreter.check_type_compatibility(
+            operand1.type(), operand2.type(), False
+        ):
+            return self.binary_ops[InterpreterBase.CLASS_DEF][operator]
+        self.interpreter.error(
+            ErrorType.TYPE_ERROR,
+            f"operator {operator} applied to two incompatible types",
+            line_num_of_statement,
+        )
+
+    # (op expression)
+    def __evaluate_unary_operation(self, frame, expr):
+        operand = self.__evaluate_expression(frame, expr.operand)
+        return self.evaluate_unary_operation(expr.operator, operand, expr.line_num)
+
+    # applies a unary operator to an already evaluated Value, checking that the operator is valid for its type
+    def evaluate_unary_operation(self, operator, operand, line_num_of_statement):
+        if operand.type() == ObjectDef.BOOL_TYPE_CONST:
+            if operator not in self.unary_ops[InterpreterBase.BOOL_DEF]:
+                self.interpreter.error(
+                    ErrorType.TYPE_ERROR,
+                    "invalid unary operator applied to bool",
+                    line_num_of_statement,
                 )
-            self.interpreter.error(
-                ErrorType.TYPE_ERROR,
-                f"operator {operator} applied to two incompatible types",
-                line_num_of_statement,
-            )
-        if operator in self.unary_op_list:
-            operand = self.__evaluate_expression(env, expr[1], line_num_of_statement)
-            if operand.type() == ObjectDef.BOOL_TYPE_CONST:
-                if operator not in self.unary_ops[InterpreterBase.BOOL_DEF]:
-                    self.interpreter.error(
-                        ErrorType.TYPE_ERROR,
-                        "invalid unary operator applied to bool",
-                        line_num_of_statement,
-                    )
-                return self.unary_ops[InterpreterBase.BOOL_DEF][operator](operand)
-
-        # handle call expression: (call objref methodname p1 p2 p3)
-        if operator == InterpreterBase.CALL_DEF:
-            return self.__execute_call_aux(env, expr, line_num_of_statement)
-        # handle new expression: (new classname)
-        if operator == InterpreterBase.NEW_DEF:
-            return self.__execute_new_aux(env, expr, line_num_of_statement)
+            return self.unary_ops[InterpreterBase.BOOL_DEF][operator](operand)
 
     # (new classname)
-    def __execute_new_aux(self, env, code, line_num_of_statement):
-        class_name = code[1]
-        obj = self.interpreter.instantiate(code[1], line_num_of_statement)
-        return Value(Type(class_name), obj)
+    def __execute_new_aux(self, frame, code):
+        obj = self.interpreter.instantiate(code.class_name, code.line_num)
+        return Value(code.class_type, obj)
 
     # this method is a helper used by call statements and call expressions
     # (call object_ref/me methodname p1 p2 p3)
-    def __execute_call_aux(self, env, code, line_num_of_statement):
+    def __execute_call_aux(self, frame, code):
+        obj_to_call_on, method_def, actual_args = self.__prepare_call(frame, code)
+        return obj_to_call_on.invoke_method(method_def, actual_args)
+
+    # evaluates the object and arguments of the (call ...) expression code and resolves the method it calls; returns
+    # (the part of the object to run the method on, MethodDef, list of argument Values)
+    def __prepare_call(self, frame, code):
         # determine which object we want to call the method on
         super_only = False
-        obj_name = code[1]
-        if obj_name == InterpreterBase.ME_DEF:
+        line_num_of_statement = code.line_num
+        if code.target is CallExpr.ME:
             obj = self
-        elif obj_name == InterpreterBase.SUPER_DEF:
+        elif code.target is CallExpr.SUPER:
             if not self.super_object:
                 self.interpreter.error(
                     ErrorType.TYPE_ERROR,
@@ -450,7 +583,7 @@ class ObjectDef:
             super_only = True
         else:
             # return a Value() object which has a type and a value
-            obj_val = self.__evaluate_expression(env, obj_name, line_num_of_statement)
+            obj_val = self.__evaluate_expression(frame, code.target)
             if obj_val.is_null():
                 self.interpreter.error(
                     ErrorType.FAULT_ERROR, "null dereference", line_num_of_statement
@@ -458,37 +591,33 @@ class ObjectDef:
             obj = obj_val.value()
         # prepare the actual arguments for passing
         actual_args = []
-        for expr in code[3:]:
-            actual_args.append(
-                self.__evaluate_expression(env, expr, line_num_of_statement)
+        for expr in code.args:
+            actual_args.append(self.__evaluate_expression(frame, expr))
+        # calls on super resolve the same way whatever the object is, so their cache key leaves out its class
+        if super_only:
+            start = obj
+            key = (None, *[arg.t for arg in actual_args])
+        else:
+            start = obj.anchor_object
+            key = (start.class_def, *[arg.t for arg in actual_args])
+        cache = code.inline_cache
+        entry = cache.lookup(key)
+        if entry is None:
+            entry = obj.resolve_method(
+                code.method_name, actual_args, super_only, line_num_of_statement
             )
-        return obj.call_method(code[2], actual_args, super_only, line_num_of_statement)
-
-    def __map_method_names_to_method_definitions(self):
-        self.methods = {}
-        for method in self.class_def.get_methods():
-            self.methods[method.method_name] = method
-
-    def __instantiate_fields(self):
-        self.fields = {}
-        # get_fields() returns a set of VariableDefs
-        for vardef in self.class_def.get_fields():
-            self.fields[vardef.name] = copy.copy(vardef)
+            cache.store(key, entry)
+        num_superclasses, method_def = entry
+        return start.get_part(start.part_index + num_superclasses), method_def, actual_args
 
-    def __set_field(self, field_name, value, line_num):
-        if field_name not in self.fields:
+    def __set_field(self, field_name, value, line_num, dynamic_check):
+        slot = self.class_def.field_slots.get(field_name)
+        if slot is None:
             return False
-        var_def = self.fields[field_name]
-        self.__check_type_compatibility(var_def.type, value.type(), True, line_num)
-        var_def.set_value(value)
-        return True
-
-    def __set_local_or_param(self, env, var_name, value, line_num):
-        var_def = env.get(var_name)
-        if var_def is None:
-            return False
-        self.__check_type_compatibility(var_def.type, value.type(), True, line_num)
-        var_def.set_value(value)
+        if dynamic_check:
+            field_type = self.class_def.field_map[field_name].type
+            self.__check_type_compatibility(field_type, value.type(), True, line_num)
+        self.slots[slot] = value
         return True
 
     def __check_type_compatibility(
@@ -499,74 +628,34 @@ class ObjectDef:
         ):
             self.interpreter.error(
                 ErrorType.TYPE_ERROR,
-                f"type mismatch {lvalue_type.type_name} and {rvalue_type.type_name}",
+                type_mismatch_description(lvalue_type, rvalue_type),
                 line_num,
             )
 
-    def __create_map_of_operations_to_lambdas(self):
-        self.binary_op_list = [
-            "+",
-            "-",
-            "*",
-            "/",
-            "%",
-            "==",
-            "!=",
-            "<",
-            "<=",
-            ">",
-            ">=",
-            "&",
-            "|",
-        ]
-        self.unary_op_list = ["!"]
-        self.binary_ops = {}
-        self.binary_ops[InterpreterBase.INT_DEF] = {
-            "+": lambda a, b: Value(ObjectDef.INT_TYPE_CONST, a.value() + b.value()),
-            "-": lambda a, b: Value(ObjectDef.INT_TYPE_CONST, a.value() - b.value()),
-            "*": lambda a, b: Value(ObjectDef.INT_TYPE_CONST, a.value() * b.value()),
-            "/": lambda a, b: Value(
-                ObjectDef.INT_TYPE_CONST, a.value() // b.value()
-            ),  # // for integer ops
-            "%": lambda a, b: Value(ObjectDef.INT_TYPE_CONST, a.value() % b.value()),
-            "==": lambda a, b: Value(ObjectDef.BOOL_TYPE_CONST, a.value() == b.value()),
-            "!=": lambda a, b: Value(ObjectDef.BOOL_TYPE_CONST, a.value() != b.value()),
-            ">": lambda a, b: Value(ObjectDef.BOOL_TYPE_CONST, a.value() > b.value()),
-            "<": lambda a, b: Value(ObjectDef.BOOL_TYPE_CONST, a.value() < b.value()),
-            ">=": lambda a, b: Value(ObjectDef.BOOL_TYPE_CONST, a.value() >= b.value()),
-            "<=": lambda a, b: Value(ObjectDef.BOOL_TYPE_CONST, a.value() <= b.value()),
-        }
-        self.binary_ops[InterpreterBase.STRING_DEF] = {
-            "+": lambda a, b: Value(ObjectDef.STRING_TYPE_CONST, a.value() + b.value()),
-            "==": lambda a, b: Value(ObjectDef.BOOL_TYPE_CONST, a.value() == b.value()),
-            "!=": lambda a, b: Value(ObjectDef.BOOL_TYPE_CONST, a.value() != b.value()),
-            ">": lambda a, b: Value(ObjectDef.BOOL_TYPE_CONST, a.value() > b.value()),
-            "<": lambda a, b: Value(ObjectDef.BOOL_TYPE_CONST, a.value() < b.value()),
-            ">=": lambda a, b: Value(ObjectDef.BOOL_TYPE_CONST, a.value() >= b.value()),
-            "<=": lambda a, b: Value(ObjectDef.BOOL_TYPE_CONST, a.value() <= b.value()),
-        }
-        self.binary_ops[InterpreterBase.BOOL_DEF] = {
-            "&": lambda a, b: Value(ObjectDef.BOOL_TYPE_CONST, a.value() and b.value()),
-            "|": lambda a, b: Value(ObjectDef.BOOL_TYPE_CONST, a.value() or b.value()),
-            "==": lambda a, b: Value(ObjectDef.BOOL_TYPE_CONST, a.value() == b.value()),
-            "!=": lambda a, b: Value(ObjectDef.BOOL_TYPE_CONST, a.value() != b.value()),
-        }
-        self.binary_ops[InterpreterBase.CLASS_DEF] = {
-            "==": lambda a, b: Value(ObjectDef.BOOL_TYPE_CONST, a.value() == b.value()),
-            "!=": lambda a, b: Value(ObjectDef.BOOL_TYPE_CONST, a.value() != b.value()),
-        }
-
-        self.unary_ops = {}
-        self.unary_ops[InterpreterBase.BOOL_DEF] = {
-            "!": lambda a: Value(ObjectDef.BOOL_TYPE_CONST, not a.value()),
-        }
-
-    def __init_superclass_if_any(self):
-        superclass_def = self.class_def.get_superclass()
-        if superclass_def is None:
-            self.super_object = None
-            return
-
-        self.super_object = ObjectDef(
-            self.interpreter, superclass_def, self.anchor_object, self.trace_output
-        )
+    # dispatch tables mapping each statement and expression node class to its handler
+    __statement_handlers = {
+        BeginStmt: __execute_begin,
+        SetStmt: __execute_set,
+        IncrementLocalStmt: __execute_increment_local,
+        IncrementFieldStmt: __execute_increment_field,
+        IfStmt: __execute_if,
+        CallStmt: __execute_call,
+        WhileStmt: __execute_while,
+        ReturnStmt: __execute_return,
+        InputStmt: __execute_input,
+        PrintStmt: __execute_print,
+        LetStmt: __execute_let,
+        UnknownStmt: __execute_unknown,
+    }
+    __expression_handlers = {
+        LocalRef: __evaluate_local_ref,
+        VarRef: __evaluate_var_ref,
+        LiteralExpr: __evaluate_literal,
+        MeExpr: __evaluate_me,
+        BinOpExpr: __evaluate_binary_operation,
+        CompareLocalExpr: __evaluate_compare_local,
+        UnaryOpExpr: __evaluate_unary_operation,
+        CallExpr: __execute_call_aux,
+        NewExpr: __execute_new_aux,
+        UnknownExpr: __evaluate_unknown,
+    }
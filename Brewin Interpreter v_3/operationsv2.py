@@ -0,0 +1,67 @@
+import operator
+
+from intbase import InterpreterBase
+from type_valuev2 import INT_TYPE, STRING_TYPE, BOOL_TYPE
+
+# The operators of the language on primitive operands, shared by the static type checker and the execution engines
+# that resolve operators ahead of time, and the descriptions of the type errors every engine reports the same way
+
+# python implementations of the binary operators for each pair of identically typed primitive operands, along with
+# the type of the result
+INT_OPERATIONS = {
+    "+": (operator.add, INT_TYPE),
+    "-": (operator.sub, INT_TYPE),
+    "*": (operator.mul, INT_TYPE),
+    "/": (operator.floordiv, INT_TYPE),  # // for integer ops
+    "%": (operator.mod, INT_TYPE),
+    "==": (operator.eq, BOOL_TYPE),
+    "!=": (operator.ne, BOOL_TYPE),
+    ">": (operator.gt, BOOL_TYPE),
+    "<": (operator.lt, BOOL_TYPE),
+    ">=": (operator.ge, BOOL_TYPE),
+    "<=": (operator.le, BOOL_TYPE),
+}
+STRING_OPERATIONS = {
+    "+": (operator.add, STRING_TYPE),
+    "==": (operator.eq, BOOL_TYPE),
+    "!=": (operator.ne, BOOL_TYPE),
+    ">": (operator.gt, BOOL_TYPE),
+    "<": (operator.lt, BOOL_TYPE),
+    ">=": (operator.ge, BOOL_TYPE),
+    "<=": (operator.le, BOOL_TYPE),
+}
+BOOL_OPERATIONS = {
+    "&": (lambda a, b: a and b, BOOL_TYPE),
+    "|": (lambda a, b: a or b, BOOL_TYPE),
+    "==": (operator.eq, BOOL_TYPE),
+    "!=": (operator.ne, BOOL_TYPE),
+}
+PRIMITIVE_OPERATIONS = {
+    InterpreterBase.INT_DEF: (INT_OPERATIONS, "invalid operator applied to ints"),
+    InterpreterBase.STRING_DEF: (STRING_OPERATIONS, "invalid operator applied to strings"),
+    InterpreterBase.BOOL_DEF: (BOOL_OPERATIONS, "invalid operator applied to bool"),
+}
+# operators whose result is a bool whenever they succeed, whatever their operand types
+BOOL_RESULT_OPERATORS = {"==", "!=", "<", "<=", ">", ">=", "&", "|"}
+
+
+# returns True if static_type, the Type an expression was found to have at compile time (or None if unknown), is
+# known to be expected_type
+def is_known_type(static_type, expected_type):
+    return static_type is not None and expected_type is not None and static_type == expected_type
+
+
+# a value of rvalue_type can't be assigned to (or returned as, or passed as) a variable of lvalue_type
+def type_mismatch_description(lvalue_type, rvalue_type):
+    return f"type mismatch {lvalue_type.type_name} and {rvalue_type.type_name}"
+
+
+# the default value of local_def, a LocalDef, isn't a literal
+def invalid_default_description(local_def):
+    return "invalid default value for local " + local_def.name
+
+
+# the condition of code, an IfStmt or WhileStmt, evaluated to a non-bool; the description ends with the tokens of
+# the condition (for a bare name, its characters)
+def condition_error_description(code):
+    return f"non-boolean {code.source[0]} condition " + " ".join(str(x) for x in code.source[1])
@@ -0,0 +1,103 @@
+import re
+import sys
+from array import array
+
+from bparser import BParser, StringWithLineNumber
+
+# Parsers for Brewin source that the interpreter uses instead of BParser.parse, which is kept as provided (the
+# grader substitutes its own copy of bparser.py). They accept the same programs and produce the same parse trees
+# and error strings as BParser.parse, but scan each line once with TOKEN_REGEX, can yield the program one top-level
+# item at a time, and can build a compact tree (see SourceList).
+
+# every character of a line is matched by exactly one alternative; group 1 is empty for runs of whitespace, and
+# holds a string literal, a paren, a lone quote (unclosed string), a comment char, or a bare token otherwise
+TOKEN_REGEX = re.compile(r'[ \t\r\n]+|("[^"]*"|[()"#]|[^ \t\r\n()"#]+)')
+
+
+# Compact alternative to a list of StringWithLineNumber tokens: the elements are plain interned strs (or nested
+# SourceLists), and line numbers are kept in the parallel array line_nums, one entry per element (a nested list
+# records the line of its open paren).
+class SourceList(list):
+    __slots__ = ("line_nums",)
+
+    def __init__(self):
+        super().__init__()
+        self.line_nums = array("i")
+
+    # appends item along with the line number it was read from
+    def add(self, item, line_num):
+        self.append(item)
+        self.line_nums.append(line_num)
+
+    # the line number of the first element, or None for an empty list
+    @property
+    def line_num(self):
+        if not self.line_nums:
+            return None
+        return self.line_nums[0]
+
+
+# returns (True, list of top-level items) or (False, error message), like BParser.parse. if compact is set, the
+# items are built from SourceLists of interned strs
+def parse(lines, compact=False):
+    output = []
+    for status, item in parse_stream(lines, compact):
+        if not status:
+            return False, item
+        output.append(item)
+    return True, output
+
+
+# generator version of parse that accepts any iterable of lines (e.g., an open file) and yields (True, item) for
+# each top-level item as soon as it is complete, so a top-level list is yielded the moment its closing parenthesis
+# is read. on a parse error, yields (False, error message) and stops
+def parse_stream(lines, compact=False):
+    if compact:
+        return _parse_stream(lines, SourceList, SourceList.add, _interned_token)
+    return _parse_stream(lines, list, _append, StringWithLineNumber)
+
+
+# the token loop of parse_stream; new_list() creates an empty list, add(items, item, line_num) appends item read on
+# line_num to the list items, and make_token(token, line_num) returns the element for a bare token
+def _parse_stream(lines, new_list, add, make_token):
+    output_stack = []
+    cur_list = None
+    for line_no, line in enumerate(lines):
+        for token in TOKEN_REGEX.findall(line):
+            if not token:
+                continue
+            if token == BParser.OPEN_PAREN_CHAR:
+                nested = new_list()
+                if cur_list is not None:
+                    add(cur_list, nested, line_no)
+                output_stack.append(nested)
+                cur_list = nested
+            elif token == BParser.CLOSE_PAREN_CHAR:
+                if not output_stack:
+                    yield False, "Extra closing parenthesis"
+                    return
+                completed = output_stack.pop()
+                if output_stack:
+                    cur_list = output_stack[-1]
+                else:
+                    cur_list = None
+                    yield True, completed
+            elif token == BParser.COMMENT_CHAR:
+                break
+            elif token == BParser.QUOTE_CHAR:
+                yield False, "Unclosed string"
+                return
+            elif cur_list is None:
+                yield True, make_token(token, line_no)
+            else:
+                add(cur_list, make_token(token, line_no), line_no)
+    if output_stack:
+        yield False, "Unclosed parenthesis"
+
+
+def _append(items, item, _line_num):
+    items.append(item)
+
+
+def _interned_token(token, _line_num):
+    return sys.intern(token)
@@ -4,8 +4,12 @@ Implements all CS 131-related test logic; is entry-point for testing framework.
 
 import asyncio
 import importlib
+import marshal
+import os
 from os import environ
 import sys
+import tempfile
+import time
 import traceback
 from operator import itemgetter
 
@@ -18,10 +22,27 @@ from harness import (
 
 
 class TestScaffold(AbstractTestScaffold):
-    """Implement scaffold for Brewin' interpreter; load file, validate syntax, run testcase."""
+    """Implement scaffold for Brewin' interpreter; load file, validate syntax, run testcase.
 
-    def __init__(self, interpreter_lib):
+    A test case may also set:
+    - interpreter_options: Interpreter keyword arguments that override the scaffold's, e.g. to pin the engine
+    - error_line: for a failure, the expected error is "<error type> on line <n>" rather than just the type
+    - mode: "check" compares the output of Interpreter.check, one error per line, instead of running the program;
+      "cache_hit", "cache_corrupt", "cache_wrong_shape" and "cache_evict" run the program through a disk cache in a new directory
+    """
+
+    def __init__(self, interpreter_lib, interpreter_options=None):
         self.interpreter_lib = interpreter_lib
+        self.interpreter_options = interpreter_options or {}
+
+    def new_interpreter(self, test_case, stdin, **options):
+        """Create an interpreter with the scaffold's options, then the test case's, then options."""
+        return self.interpreter_lib.Interpreter(
+            False,
+            stdin,
+            False,
+            **{**self.interpreter_options, **test_case.get("interpreter_options", {}), **options},
+        )
 
     def setup(self, test_case):
         inputfile, expfile, srcfile = itemgetter("inputfile", "expfile", "srcfile")(
@@ -51,14 +72,22 @@ class TestScaffold(AbstractTestScaffold):
         stdin, expected, program = itemgetter("stdin", "expected", "program")(
             environment
         )
-        interpreter = self.interpreter_lib.Interpreter(False, stdin, False)
+        mode = test_case.get("mode")
+        if mode == "check":
+            return self.run_check_case(test_case, environment)
+        if mode is not None:
+            return self.run_cache_case(test_case, environment)
+        interpreter = self.new_interpreter(test_case, stdin)
         try:
             interpreter.validate_program(program)
             interpreter.run(program)
         except Exception as exception:  # pylint: disable=broad-except
             if expect_failure:
-                error_type, _ = interpreter.get_error_type_and_line()
-                received = [f"{error_type}"]
+                error_type, error_line = interpreter.get_error_type_and_line()
+                if test_case.get("error_line"):
+                    received = [f"{error_type} on line {error_line}"]
+                else:
+                    received = [f"{error_type}"]
                 if received == expected:
                     return 1
                 print("\nExpected error:")
@@ -87,9 +116,101 @@ class TestScaffold(AbstractTestScaffold):
 
         return int(passed)
 
+    def run_check_case(self, test_case, environment):
+        """Statically check the program; the errors found must be the expected lines."""
+        stdin, expected, program = itemgetter("stdin", "expected", "program")(
+            environment
+        )
+        interpreter = self.new_interpreter(test_case, stdin)
+        received = [str(error) for error in interpreter.check(program)]
+        if received != expected:
+            print("\nExpected errors:")
+            print(expected)
+            print("\nReported errors:")
+            print(received)
+            return 0
+        return 1
+
+    def run_cache_case(self, test_case, environment):
+        """Run the program through a disk cache, checking the output of every run and which runs hit the cache.
+
+        cache_hit: a second run hits the entry the first run stored.
+        cache_corrupt: a run after the entry is overwritten with garbage misses, and stores it again.
+        cache_wrong_shape: likewise for entries that unmarshal but do not hold a parse tree.
+        cache_evict: with room for two entries, storing a third evicts the least recently used one.
+        """
+        stdin, expected, program = itemgetter("stdin", "expected", "program")(
+            environment
+        )
+        with tempfile.TemporaryDirectory() as cache_dir:
+
+            def run(lines, **options):
+                """Run lines with a new interpreter; return (hits, misses) of its cache."""
+                interpreter = self.new_interpreter(test_case, stdin, cache_dir=cache_dir, **options)
+                interpreter.run(lines)
+                if interpreter.get_output() != expected:
+                    print("\nExpected output:")
+                    print(expected)
+                    print("\nActual output:")
+                    print(interpreter.get_output())
+                    return None
+                cache = interpreter.program_cache
+                return cache.hits, cache.misses
+
+            def entry_paths():
+                return [
+                    os.path.join(cache_dir, name) for name in os.listdir(cache_dir) if name.endswith(".bin")
+                ]
+
+            def overwrite_entries(data):
+                for path in entry_paths():
+                    with open(path, "wb") as handle:
+                        handle.write(data)
+
+            match test_case["mode"]:
+                case "cache_hit":
+                    received = [run(program), run(program)]
+                    wanted = [(0, 1), (1, 0)]
+                case "cache_corrupt":
+                    received = [run(program)]
+                    overwrite_entries(b"not a cache entry")
+                    received += [run(program), run(program)]
+                    wanted = [(0, 1), (0, 1), (1, 0)]
+                case "cache_wrong_shape":
+                    version = self.interpreter_lib.ProgramCache.FORMAT_VERSION
+                    received = [run(program)]
+                    for encoded_items in ([5], 7, [("class",)], [(("class",), b"")]):
+                        overwrite_entries(marshal.dumps((version, encoded_items)))
+                        received.append(run(program))
+                    received.append(run(program))
+                    wanted = [(0, 1), (0, 1), (0, 1), (0, 1), (0, 1), (1, 0)]
+                case "cache_evict":
+                    # comments change the cache key but not the parse tree, so all entries are the same size
+                    variants = [program + [f"# variant {i}\n"] for i in range(3)]
+                    received = [run(variants[0])]
+                    max_bytes = os.path.getsize(entry_paths()[0]) * 5 // 2
+                    received.append(run(variants[1], cache_max_bytes=max_bytes))
+                    # make the first entry older, then use it so that the second becomes the least recently used
+                    now = time.time()
+                    for age, path in zip((30, 20), sorted(entry_paths(), key=os.path.getmtime)):
+                        os.utime(path, (now - age, now - age))
+                    received.append(run(variants[0], cache_max_bytes=max_bytes))
+                    received.append(run(variants[2], cache_max_bytes=max_bytes))
+                    received += [run(variants[0]), run(variants[1])]
+                    wanted = [(0, 1), (0, 1), (1, 0), (0, 1), (1, 0), (0, 1)]
+                case mode:
+                    raise ValueError(f"Unknown test mode {mode}")
+        if received != wanted:
+            print("\nExpected (hits, misses) of each run:")
+            print(wanted)
+            print("\nActual (hits, misses):")
+            print(received)
+            return 0
+        return 1
+
 
 def __generate_test_case_structure(
-    cases, directory, category="", expect_failure=False, visible=lambda _: True
+    cases, directory, category="", expect_failure=False, visible=lambda _: True, **options
 ):
     return [
         {
@@ -99,6 +220,7 @@ def __generate_test_case_structure(
             "expfile": f"{directory}{i}.exp",
             "expect_failure": expect_failure,
             "visible": visible(f"test{i}"),
+            **options,
         }
         for i in cases
     ]
@@ -179,16 +301,55 @@ def generate_test_suite_v1():
 
 def generate_test_suite_v2():
     """wrapper for generate_test_suite for v2"""
-    return __generate_test_suite(
-        2,
-        [
-            "test_compare_null",
-            "test_return_default1",
-            "test_inher2",
-            "test_inher1",
-            "test_let",
-        ],
-        ["test_incompat_return1", "test_let2", "test_inher1", "test_incompat_types2"],
+    tree_walker = {"engine": "tree"}  # tail calls only run in constant python stack space on the tree walker
+    bytecode = {"engine": "bytecode", "max_call_depth": 20000}
+    return (
+        __generate_test_suite(
+            2,
+            [
+                "test_compare_null",
+                "test_return_default1",
+                "test_inher2",
+                "test_inher1",
+                "test_let",
+            ],
+            ["test_incompat_return1", "test_let2", "test_inher1", "test_incompat_types2"],
+        )
+        + __generate_test_case_structure(
+            ["test_deep_tail_recursion"], "v2/tests/", "Deep recursion", interpreter_options=tree_walker
+        )
+        # how deep non-tail recursion can go on the tree walker depends on the host's recursion limit, so it is
+        # measured by `python bench.py depth` rather than tested here
+        + __generate_test_case_structure(
+            ["test_deep_tail_recursion_return"],
+            "v2/fails/",
+            "Deep recursion",
+            True,
+            interpreter_options=tree_walker,
+            error_line=True,
+        )
+        + __generate_test_case_structure(
+            ["test_bytecode_deep_recursion"], "v2/tests/", "Deep recursion", interpreter_options=bytecode
+        )
+        + __generate_test_case_structure(
+            ["test_bytecode_max_call_depth"],
+            "v2/fails/",
+            "Deep recursion",
+            True,
+            interpreter_options=bytecode,
+            error_line=True,
+        )
+        + __generate_test_case_structure(
+            ["test_check_type_errors", "test_check_clean", "test_check_v1_syntax"],
+            "v2/check/",
+            "Check mode",
+            mode="check",
+        )
+        + [
+            case
+            for mode in ("cache_hit", "cache_corrupt", "cache_wrong_shape", "cache_evict")
+            for case in __generate_test_case_structure(["test_inher1"], "v2/tests/", f"Cache {mode}", mode=mode)
+        ]
     )
 
 
@@ -217,7 +378,11 @@ async def main():
     module_name = f"interpreterv{version}"
     interpreter = importlib.import_module(module_name)
 
-    scaffold = TestScaffold(interpreter)
+    # an optional second argument selects the execution engine, e.g. python3 tester.py 2 brewin2py
+    interpreter_options = {}
+    if len(sys.argv) > 2:
+        interpreter_options["engine"] = sys.argv[2]
+    scaffold = TestScaffold(interpreter, interpreter_options)
 
     match version:
         case "1":
@@ -0,0 +1,757 @@
+import linecache
+import re
+import sys
+import types
+import weakref
+
+from astv2 import (
+    BeginStmt,
+    LetStmt,
+    SetStmt,
+    IncrementLocalStmt,
+    IncrementFieldStmt,
+    InputStmt,
+    IfStmt,
+    WhileStmt,
+    ReturnStmt,
+    PrintStmt,
+    CallStmt,
+    UnknownStmt,
+    LiteralExpr,
+    LocalRef,
+    VarRef,
+    MeExpr,
+    BinOpExpr,
+    CompareLocalExpr,
+    UnaryOpExpr,
+    NewExpr,
+    CallExpr,
+    UnknownExpr,
+)
+from bytecodev2 import BytecodeEngine
+from closurev2 import check_assignment
+from intbase import InterpreterBase, ErrorType
+from operationsv2 import PRIMITIVE_OPERATIONS, BOOL_RESULT_OPERATORS, is_known_type
+from operationsv2 import type_mismatch_description, invalid_default_description, condition_error_description
+from type_valuev2 import INT_TYPE, STRING_TYPE, BOOL_TYPE, Value
+
+# the python operator implementing each Brewin binary operator on two unboxed primitive operands. & and | are the
+# bitwise operators rather than and/or so that, like in the tree walker, both operands are always evaluated
+PYTHON_OPERATORS = {
+    "+": "+",
+    "-": "-",
+    "*": "*",
+    "/": "//",  # // for integer ops
+    "%": "%",
+    "==": "==",
+    "!=": "!=",
+    "<": "<",
+    "<=": "<=",
+    ">": ">",
+    ">=": ">=",
+    "&": "&",
+    "|": "|",
+}
+# the name generated code uses for each primitive Type
+PRIMITIVE_TYPE_CONSTANTS = {
+    InterpreterBase.INT_DEF: "INT_TYPE",
+    InterpreterBase.STRING_DEF: "STRING_TYPE",
+    InterpreterBase.BOOL_DEF: "BOOL_TYPE",
+}
+# the function generated code boxes python values of each primitive type with (see type_valuev2.VALUE_FACTORIES)
+PRIMITIVE_VALUE_FACTORIES = {
+    InterpreterBase.INT_DEF: "int_value",
+    InterpreterBase.STRING_DEF: "string_value",
+    InterpreterBase.BOOL_DEF: "bool_value",
+}
+GENERATED_MODULE_NAME = "brewin2py_program"
+# the imports every generated module starts with
+MODULE_HEADER = [
+    "from intbase import ErrorType",
+    "from type_valuev2 import Type, Value, create_default_value, int_value, string_value, bool_value",
+    "from transpilerv2 import INT_TYPE, STRING_TYPE, BOOL_TYPE",
+    "from transpilerv2 import fail, check_condition, assign, assign_object, nullable, "
+    + "not_null, super_object, check_return, format_value",
+]
+
+
+# Execution engine that translates a whole program ahead of time into the source of a python module, with one
+# python class per Brewin class and one function per method, and then runs the compiled functions. Locals and
+# expressions of primitive types are kept as unboxed python values, and type checks are only emitted where the
+# types can't be proven at translation time. The program is translated when its first method is called.
+class TranspilerEngine:
+    def __init__(self):
+        self.functions = {}  # MethodDef -> python function taking (obj, *actual_params)
+        self.translated_class_index = None  # the class index of the program the functions were built from
+        self.fallback_engine = None
+
+    # runs method_def on obj, the ObjectDef part of the class that defines the method; actual_params is a list of
+    # Values that were already checked against the formal parameter types
+    def run_method(self, obj, method_def, actual_params):
+        function = self.functions.get(method_def)
+        if function is not None:
+            return function(obj, *actual_params)
+        if obj.interpreter.class_index is not self.translated_class_index:
+            self.load_program(obj.interpreter)
+            return self.run_method(obj, method_def, actual_params)
+        # the program could not be compiled to python
+        return self.fallback_engine.run_method(obj, method_def, actual_params)
+
+    # translates and loads the program the interpreter is running
+    def load_program(self, interpreter):
+        self.functions = {}
+        self.translated_class_index = interpreter.class_index
+        self.fallback_engine = None
+        source = Transpiler(interpreter).translate()
+        try:
+            module = load_module(source)
+        except (SyntaxError, RecursionError, MemoryError):
+            # python limits how deeply blocks and expressions can nest, so a deeply nested Brewin program may not
+            # compile; run such programs on the bytecode VM instead
+            self.fallback_engine = BytecodeEngine()
+            return
+        self.register_module(module, interpreter.class_index)
+
+    # maps every method of the program with the given class index to its function in module, a module generated
+    # by Transpiler.translate and loaded with load_module (or imported after writing it to a file)
+    def register_module(self, module, class_index):
+        self.functions = {}
+        for class_name, class_def in class_index.items():
+            for method_def in class_def.get_methods():
+                self.functions[method_def] = module.METHODS[
+                    (class_name, method_def.get_method_name())
+                ]
+        self.translated_class_index = class_index
+
+
+# compiles and runs the source of a generated module; returns the module. the source is registered with linecache
+# so that tracebacks through generated code show it. bindings maps names to the objects (see Transpiler.binding)
+# the module refers to without defining them
+def load_module(source, bindings=None):
+    module = types.ModuleType(GENERATED_MODULE_NAME)
+    if bindings:
+        module.__dict__.update(bindings)
+    filename = f"<{GENERATED_MODULE_NAME} {id(module):x}>"
+    code = compile(source, filename, "exec")
+    linecache.cache[filename] = (len(source), None, source.splitlines(True), filename)
+    # the functions of the module only refer to its dict, so the dict refers back to the module to keep it alive
+    # while any of them is; once none is, the module is collected and its source is dropped from linecache
+    module.__dict__["__module_object__"] = module
+    weakref.finalize(module, linecache.cache.pop, filename, None)
+    exec(code, module.__dict__)
+    return module
+
+
+# Translates a whole program, given by an interpreter that holds its type manager and class index, into the source
+# of a python module. Values the generated code needs (Types, literal and default Values) are hoisted into module
+# level constants. The module ends with METHODS, a dict mapping (class name, method name) to each method's function.
+# If run_method is given, translate_method can turn calls that a call resolver resolves into direct calls of
+# run_method(obj, method_def, actual_params); such modules must be loaded with the bindings the translation made.
+class Transpiler:
+    def __init__(self, interpreter, run_method=None):
+        self.interpreter = interpreter
+        self.constants = {}  # python expression -> name of the module level constant holding its value
+        self.constant_lines = []
+        self.class_identifiers = set()
+        self.bindings = {}  # name -> object, for objects generated code refers to that can't be written as source
+        if run_method is not None:
+            self.bindings["run_method"] = run_method
+
+    def translate(self):
+        class_lines = []
+        method_entries = []
+        for class_name, class_def in self.interpreter.class_index.items():
+            class_identifier = Transpiler.unique_identifier("c_", class_name, self.class_identifiers)
+            class_lines.append(f"class {class_identifier}:  # class {class_name}")
+            function_identifiers = set()
+            for method_def in class_def.get_methods():
+                method_name = method_def.get_method_name()
+                function_identifier = Transpiler.unique_identifier("m_", method_name, function_identifiers)
+                class_lines.append("    @staticmethod")
+                class_lines.extend(
+                    "    " + line
+                    for line in MethodTranspiler(
+                        self, class_def, method_def, function_identifier
+                    ).translate()
+                )
+                method_entries.append(
+                    f"    ({class_name!r}, {method_name!r}): {class_identifier}.{function_identifier},"
+                )
+            if not class_def.get_methods():
+                class_lines.append("    pass")
+            class_lines.append("")
+        return "\n".join(
+            ["# generated by brewin2py (transpilerv2.py) from a Brewin program"]
+            + MODULE_HEADER
+            + [""]
+            + self.constant_lines
+            + ["", ""]
+            + class_lines
+            + ["", "METHODS = {"]
+            + method_entries
+            + ["}", ""]
+        )
+
+    # translates a single method of class_def into the source of a module that ends with FUNCTION, the method's
+    # function. call_resolver is passed on to the MethodTranspiler
+    def translate_method(self, class_def, method_def, call_resolver=None):
+        function_identifier = Transpiler.unique_identifier("m_", method_def.get_method_name(), set())
+        function_lines = MethodTranspiler(
+            self, class_def, method_def, function_identifier, call_resolver
+        ).translate()
+        return "\n".join(
+            [
+                f"# generated by brewin2py (transpilerv2.py) from method {method_def.get_method_name()} "
+                + f"of class {class_def.get_name()}"
+            ]
+            + MODULE_HEADER
+            + [""]
+            + self.constant_lines
+            + ["", ""]
+            + function_lines
+            + ["", f"FUNCTION = {function_identifier}", ""]
+        )
+
+    # returns a python identifier made from prefix and a Brewin name that is not in the set taken, and adds it to taken
+    @staticmethod
+    def unique_identifier(prefix, name, taken):
+        base = prefix + re.sub(r"\W", "_", name)
+        identifier = base
+        suffix = 1
+        while identifier in taken:
+            identifier = f"{base}_{suffix}"
+            suffix += 1
+        taken.add(identifier)
+        return identifier
+
+    # returns the name of a module level constant holding the value of the python expression, defining it if needed
+    def constant(self, expression):
+        name = self.constants.get(expression)
+        if name is None:
+            name = f"K{len(self.constants)}"
+            self.constants[expression] = name
+            self.constant_lines.append(f"{name} = {expression}")
+        return name
+
+    # returns the name generated code uses for value, an object that must be passed to load_module in bindings
+    def binding(self, value):
+        for name, bound_value in self.bindings.items():
+            if bound_value is value:
+                return name
+        name = f"B{len(self.bindings)}"
+        self.bindings[name] = value
+        return name
+
+    # returns a python expression for var_type
+    def type_constant(self, var_type):
+        if var_type.type_name in PRIMITIVE_TYPE_CONSTANTS:
+            return PRIMITIVE_TYPE_CONSTANTS[var_type.type_name]
+        return self.constant(f"Type({var_type.type_name!r})")
+
+
+# Translates one method, from its body lowered into nodes (see astv2.py), into the lines of a python function taking
+# (obj, *actual_params), where obj is the ObjectDef part running the method. Each parameter and local becomes a python
+# variable. Each translated expression is returned as (python source, Type) where the Type is the exact type of every
+# value the expression produces, if known at translation time, or None. Expressions of a known primitive type evaluate
+# to unboxed python ints, strs and bools, and everything else to Values. Locals and parameters of primitive types hold
+# unboxed values too, while object locals hold Values whose nulls already carry the variable's type. Errors are only
+# reported when the offending code runs, exactly as in the tree walker.
+# call_resolver, if given, is called as call_resolver(target, method_name, arg_types) for each call on me or super,
+# with target InterpreterBase.ME_DEF or SUPER_DEF and the exact Type of each argument. It returns None, or
+# (python source of the object part to run the method on, MethodDef of the method the call runs) to have the call
+# made directly through the transpiler's run_method, skipping the method lookups of ObjectDef.call_method.
+class MethodTranspiler:
+    def __init__(self, transpiler, class_def, method_def, function_identifier, call_resolver=None):
+        self.transpiler = transpiler
+        self.interpreter = transpiler.interpreter  # used at translation time for type queries only
+        self.class_def = class_def
+        self.method_def = method_def
+        self.function_identifier = function_identifier
+        self.call_resolver = call_resolver
+        self.slot_identifiers = {}  # frame slot -> python identifier of the parameter or local in scope in the slot
+        self.num_variables = 0
+        self.lines = []
+        self.indent = 1
+        self.uses_fields = False
+        self.line_num = None  # line of the last statement emitted
+        self.boxed_forms = {}  # unboxed expression source -> source of an equivalent expression producing its Value
+        self.literal_values = {}  # unboxed literal source -> python expression creating its Value
+
+    def translate(self):
+        line_num = self.method_def.line_num
+        self.line_num = line_num
+        return_type = self.method_def.get_return_type()
+        parameters = ["obj"]
+        if self.method_def.duplicate_param_name is not None:
+            parameters.append("*_actual_params")
+            self.__emit_error(
+                ErrorType.NAME_ERROR, "duplicate formal param name " + self.method_def.duplicate_param_name, line_num
+            )
+        else:
+            for slot, formal in enumerate(self.method_def.formal_params):
+                identifier = self.__declare_variable(slot, formal.name)
+                parameters.append(identifier)
+                if MethodTranspiler.__is_primitive(formal.type):
+                    self.__emit(f"{identifier} = {identifier}.v")
+                else:
+                    self.__emit(
+                        f"{identifier} = nullable({identifier}, {self.transpiler.type_constant(formal.type)})"
+                    )
+            self.__translate_statement(self.method_def.body)
+        # The method didn't explicitly return a value, so return the default return type for the method
+        self.__emit(f"return {self.__default_value(return_type)}")
+        header = [f"def {self.function_identifier}({', '.join(parameters)}):  # line {line_num}"]
+        if self.uses_fields:
+            header.append("    slots = obj.slots")
+        return header + self.lines
+
+    def __emit(self, line):
+        self.lines.append("    " * self.indent + line)
+
+    # emits the statements emitted by translate_body as an indented block, or pass if it emits none
+    def __emit_block(self, translate_body):
+        self.indent += 1
+        num_lines = len(self.lines)
+        translate_body()
+        if len(self.lines) == num_lines:
+            self.__emit("pass")
+        self.indent -= 1
+
+    def __emit_error(self, error_type, description, line_num):
+        self.__emit(self.__error(error_type, description, line_num))
+
+    # returns an expression that reports an error after evaluating each of the expressions in operands
+    @staticmethod
+    def __error(error_type, description, line_num, *operands):
+        return f"fail(obj, ErrorType.{error_type.name}, {description!r}, {line_num!r}{''.join(', ' + operand for operand in operands)})"
+
+    def __default_value(self, var_type):
+        return self.transpiler.constant(
+            f"create_default_value({self.transpiler.type_constant(var_type)})"
+        )
+
+    # returns a new python identifier for the parameter or local named name, held in slot
+    def __declare_variable(self, slot, name):
+        identifier = f"v{self.num_variables}_{re.sub(r'[^0-9A-Za-z_]', '_', name)}"
+        self.num_variables += 1
+        self.slot_identifiers[slot] = identifier
+        return identifier
+
+    @staticmethod
+    def __is_primitive(var_type):
+        return var_type is not None and var_type.type_name in PRIMITIVE_OPERATIONS
+
+    # returns True if a value whose exact type is known at translation time can be assigned to a variable of type
+    # var_type without a runtime check
+    def __is_statically_assignable(self, var_type, value_type):
+        return value_type is not None and self.interpreter.check_type_compatibility(
+            var_type, value_type, True
+        )
+
+    # returns the source of a Value holding the result of a translated expression
+    def __boxed(self, source, static_type):
+        if not MethodTranspiler.__is_primitive(static_type):
+            return source
+        if source in self.boxed_forms:
+            return self.boxed_forms[source]
+        if source in self.literal_values:
+            return self.transpiler.constant(self.literal_values[source])
+        return f"{PRIMITIVE_VALUE_FACTORIES[static_type.type_name]}({source})"
+
+    # returns the source of the unboxed value of an expression producing a Value of a primitive type, remembering
+    # the original so that boxing it again doesn't allocate a new Value
+    def __unboxed(self, boxed_source):
+        source = f"{boxed_source}.v"
+        self.boxed_forms[source] = boxed_source
+        return source
+
+    def __translate_statement(self, code):
+        if code.line_num != self.line_num:
+            self.__emit(f"# line {code.line_num}")
+            self.line_num = code.line_num
+        if self.interpreter.trace_output:
+            self.__emit(f"print({f'{code.line_num}: {code.source}'!r})")
+        MethodTranspiler.__statement_translators[type(code)](self, code)
+
+    # a statement with an unknown keyword, or one that is missing parts
+    def __translate_unknown(self, code):
+        self.__emit_error(ErrorType.SYNTAX_ERROR, code.description, code.line_num)
+
+    # (begin (statement1) (statement2) ... (statementn))
+    def __translate_begin(self, code):
+        for statement in code.statements:
+            self.__translate_statement(statement)
+
+    # (let ((type1 var1 defaultvalue1) ... (typen varn defaultvaluen)) (statement1) ... (statementn))
+    def __translate_let(self, code):
+        line_num = code.line_num
+        for local_def in code.local_defs:
+            default_value = local_def.default_value
+            if default_value is None:
+                self.__emit_error(ErrorType.TYPE_ERROR, invalid_default_description(local_def), line_num)
+                return
+            if not self.interpreter.check_type_compatibility(local_def.type, default_value.type(), True):
+                description = type_mismatch_description(local_def.type, default_value.type())
+                self.__emit_error(ErrorType.TYPE_ERROR, description, line_num)
+                return
+            if local_def.slot is None:
+                self.__emit_error(
+                    ErrorType.NAME_ERROR, "duplicate local variable name " + local_def.name, line_num
+                )
+                return
+        initial_values = []  # (python identifier, source of the value) for each local
+        for local_def in code.local_defs:
+            if MethodTranspiler.__is_primitive(local_def.type):
+                value = repr(local_def.default_value.v)
+            else:
+                value = self.__default_value(local_def.type)  # a null of the variable's type
+            initial_values.append((self.__declare_variable(local_def.slot, local_def.name), value))
+        for identifier, value in initial_values:
+            self.__emit(f"{identifier} = {value}")
+        for statement in code.statements:
+            self.__translate_statement(statement)
+
+    # (set varname expression)
+    def __translate_set(self, code):
+        source, value_type = self.__translate_expression(code.expression)
+        self.__translate_assignment(code, source, value_type)
+
+    # (inputs target_variable) or (inputi target_variable)
+    def __translate_input(self, code):
+        if code.is_string:
+            self.__translate_assignment(code, "obj.interpreter.get_input()", STRING_TYPE)
+        else:
+            self.__translate_assignment(code, "int(obj.interpreter.get_input())", INT_TYPE)
+
+    # assigns the value of a translated expression to the parameter, local or field assigned by code, a SetStmt or
+    # InputStmt
+    def __translate_assignment(self, code, source, value_type):
+        line_num = code.line_num
+        if code.slot is not None:
+            identifier = self.slot_identifiers[code.slot]
+            var_type = code.var_type
+            statically_assignable = self.__is_statically_assignable(var_type, value_type)
+            if MethodTranspiler.__is_primitive(var_type):
+                if not statically_assignable:
+                    source = self.__unboxed(self.__assign(var_type, source, value_type, line_num))
+            elif not statically_assignable:
+                source = f"assign_object(obj, {self.transpiler.type_constant(var_type)}, {self.__boxed(source, value_type)}, {line_num!r})"
+            elif value_type.type_name == InterpreterBase.NULL_DEF:
+                source = self.__default_value(var_type)  # a null of the variable's type
+            self.__emit(f"{identifier} = {source}")
+            return
+
+        if code.name in self.class_def.field_map:
+            field_type = self.class_def.field_map[code.name].type
+            self.uses_fields = True
+            if self.__is_statically_assignable(field_type, value_type):
+                source = self.__boxed(source, value_type)
+            else:
+                source = self.__assign(field_type, source, value_type, line_num)
+            self.__emit(f"slots[{self.class_def.field_slots[code.name]}] = {source}  # {code.name}")
+            return
+
+        self.__emit(
+            MethodTranspiler.__error(
+                ErrorType.NAME_ERROR,
+                "unknown field/variable " + code.name,
+                line_num,
+                self.__boxed(source, value_type),
+            )
+        )
+
+    # returns an expression that checks the value of a translated expression can be assigned to a variable of
+    # type var_type, and evaluates to that value as a Value
+    def __assign(self, var_type, source, value_type, line_num):
+        return f"assign(obj, {self.transpiler.type_constant(var_type)}, {self.__boxed(source, value_type)}, {line_num!r})"
+
+    # returns the source of the unboxed bool value of the condition of code, an IfStmt or WhileStmt
+    def __translate_condition(self, code):
+        source, condition_type = self.__translate_expression(code.condition)
+        if is_known_type(condition_type, BOOL_TYPE):
+            return source
+        description = condition_error_description(code)
+        return f"check_condition(obj, {self.__boxed(source, condition_type)}, {description!r}, {code.line_num!r})"
+
+    # (if expression (statement) [(statement)])
+    def __translate_if(self, code):
+        condition = self.__translate_condition(code)
+        self.__emit(f"if {condition}:")
+        self.__emit_block(lambda: self.__translate_statement(code.then_statement))
+        if code.else_statement is not None:
+            self.__emit("else:")
+            self.__emit_block(lambda: self.__translate_statement(code.else_statement))
+
+    # (while expression (statement))
+    def __translate_while(self, code):
+        condition = self.__translate_condition(code)
+        self.__emit(f"while {condition}:")
+        self.__emit_block(lambda: self.__translate_statement(code.body))
+
+    # (return [expression])
+    def __translate_return(self, code):
+        return_type = self.method_def.get_return_type()
+        if code.expression is None:
+            self.__emit(f"return {self.__default_value(return_type)}")
+            return
+        source, value_type = self.__translate_expression(code.expression)
+        source = self.__boxed(source, value_type)
+        if not is_known_type(value_type, return_type):
+            source = f"check_return(obj, {self.transpiler.type_constant(return_type)}, {source}, {code.line_num!r})"
+        self.__emit(f"return {source}")
+
+    # (print expression1 expression2 ...)
+    def __translate_print(self, code):
+        terms = []
+        for expr in code.expressions:
+            source, term_type = self.__translate_expression(expr)
+            if is_known_type(term_type, STRING_TYPE) or is_known_type(term_type, INT_TYPE):
+                terms.append(f"str({source})")  # an (inputs) past the end of the input gives a None string
+            elif is_known_type(term_type, BOOL_TYPE):
+                terms.append(f"('true' if {source} else 'false')")
+            else:
+                terms.append(f"format_value({source})")
+        self.__emit(f"obj.interpreter.output(''.join(({''.join(term + ', ' for term in terms)})))")
+
+    # (call object_ref/me/super methodname param1 param2 ...) as a statement
+    def __translate_call_statement(self, code):
+        self.__emit(self.__translate_call(code.call)[0])
+
+    def __translate_expression(self, expr):
+        return MethodTranspiler.__expression_translators[type(expr)](self, expr)
+
+    # a parameter or local
+    def __translate_local_ref(self, expr):
+        identifier = self.slot_identifiers[expr.slot]
+        if MethodTranspiler.__is_primitive(expr.var_type):
+            return identifier, expr.var_type
+        return identifier, None
+
+    # a field, or a literal or me that a field could have shadowed
+    def __translate_var_ref(self, expr):
+        if expr.name in self.class_def.field_map:
+            field_type = self.class_def.field_map[expr.name].type
+            self.uses_fields = True
+            field_slot = self.class_def.field_slots[expr.name]
+            if MethodTranspiler.__is_primitive(field_type):
+                return self.__unboxed(f"slots[{field_slot}]"), field_type
+            return (
+                f"nullable(slots[{field_slot}], {self.transpiler.type_constant(field_type)})",
+                None,
+            )
+        if expr.literal is not None:
+            return self.__translate_value(expr.literal)
+        if expr.name == InterpreterBase.ME_DEF:
+            return self.__translate_me(expr)
+        return (
+            MethodTranspiler.__error(ErrorType.NAME_ERROR, "invalid field or parameter " + expr.name, expr.line_num),
+            None,
+        )
+
+    def __translate_literal(self, expr):
+        return self.__translate_value(expr.value)
+
+    # returns the translation of an expression that always evaluates to value, a literal's Value
+    def __translate_value(self, value):
+        value_source = f"Value({self.transpiler.type_constant(value.type())}, {value.v!r})"
+        if MethodTranspiler.__is_primitive(value.type()):
+            source = f"({value.v!r})"
+            self.literal_values[source] = value_source
+            return source, value.type()
+        return self.transpiler.constant(value_source), value.type()
+
+    def __translate_me(self, _expr):
+        return "obj.get_me_as_value()", None
+
+    # a parenthesized expression that isn't an operation, call or new
+    def __translate_unknown_expression(self, _expr):
+        return "None", None
+
+    # (op expression1 expression2)
+    def __translate_binary_operation(self, expr):
+        operator_token = expr.operator
+        line_num = expr.line_num
+        left, left_type = self.__translate_expression(expr.left)
+        right, right_type = self.__translate_expression(expr.right)
+        if is_known_type(right_type, left_type) and MethodTranspiler.__is_primitive(left_type):
+            operations, error_description = PRIMITIVE_OPERATIONS[left_type.type_name]
+            if operator_token not in operations:
+                return (
+                    MethodTranspiler.__error(
+                        ErrorType.TYPE_ERROR, error_description, line_num, left, right
+                    ),
+                    None,
+                )
+            result_type = operations[operator_token][1]
+            return f"({left} {PYTHON_OPERATORS[operator_token]} {right})", result_type
+        source = (
+            f"obj.evaluate_binary_operation({operator_token!r}, {self.__boxed(left, left_type)}, "
+            + f"{self.__boxed(right, right_type)}, {line_num!r})"
+        )
+        if operator_token in BOOL_RESULT_OPERATORS:
+            return self.__unboxed(source), BOOL_TYPE
+        return source, None
+
+    # (op expression)
+    def __translate_unary_operation(self, expr):
+        operand, operand_type = self.__translate_expression(expr.operand)
+        if is_known_type(operand_type, BOOL_TYPE):
+            return f"(not {operand})", BOOL_TYPE
+        return (
+            f"obj.evaluate_unary_operation({expr.operator!r}, {self.__boxed(operand, operand_type)}, {expr.line_num!r})",
+            None,
+        )
+
+    # (new classname)
+    def __translate_new(self, expr):
+        return (
+            f"Value({self.transpiler.type_constant(expr.class_type)}, obj.interpreter.instantiate({expr.class_name!r}, {expr.line_num!r}))",
+            expr.class_type,
+        )
+
+    # (call object_ref/me/super methodname p1 p2 p3)
+    def __translate_call(self, expr):
+        line_num = expr.line_num
+        super_only = False
+        if expr.target is CallExpr.ME:
+            target = "obj"
+        elif expr.target is CallExpr.SUPER:
+            target = f"super_object(obj, {line_num!r})"
+            super_only = True
+        else:
+            target_source, target_type = self.__translate_expression(expr.target)
+            target = f"not_null(obj, {self.__boxed(target_source, target_type)}, {line_num!r}).v"
+        arguments = []
+        arg_types = []
+        for arg in expr.args:
+            source, arg_type = self.__translate_expression(arg)
+            arguments.append(self.__boxed(source, arg_type))
+            arg_types.append(arg_type)
+        if self.call_resolver is not None and expr.target in (CallExpr.ME, CallExpr.SUPER):
+            resolution = self.call_resolver(expr.target, expr.method_name, arg_types)
+            if resolution is not None:
+                target, callee = resolution
+                source = f"run_method({target}, {self.transpiler.binding(callee)}, [{', '.join(arguments)}])"
+                return_type = callee.get_return_type()
+                if MethodTranspiler.__is_primitive(return_type):
+                    return self.__unboxed(source), return_type  # primitive results have exactly the return type
+                return source, None
+        return (
+            f"{target}.call_method({expr.method_name!r}, [{', '.join(arguments)}], {super_only}, {line_num!r})",
+            None,
+        )
+
+    # dispatch tables mapping each statement and expression node class to its translator; the fused nodes translate
+    # like the nodes they replace, since the generated code already specializes on the static types of the operands
+    __statement_translators = {
+        BeginStmt: __translate_begin,
+        LetStmt: __translate_let,
+        SetStmt: __translate_set,
+        IncrementLocalStmt: __translate_set,
+        IncrementFieldStmt: __translate_set,
+        InputStmt: __translate_input,
+        IfStmt: __translate_if,
+        WhileStmt: __translate_while,
+        ReturnStmt: __translate_return,
+        PrintStmt: __translate_print,
+        CallStmt: __translate_call_statement,
+        UnknownStmt: __translate_unknown,
+    }
+    __expression_translators = {
+        LocalRef: __translate_local_ref,
+        VarRef: __translate_var_ref,
+        LiteralExpr: __translate_literal,
+        MeExpr: __translate_me,
+        BinOpExpr: __translate_binary_operation,
+        CompareLocalExpr: __translate_binary_operation,
+        UnaryOpExpr: __translate_unary_operation,
+        NewExpr: __translate_new,
+        CallExpr: __translate_call,
+        UnknownExpr: __translate_unknown_expression,
+    }
+
+
+# runtime support for generated code
+
+
+# reports an error; its extra arguments are the already evaluated operands of the failing expression
+def fail(obj, error_type, description, line_num, *_operands):
+    obj.interpreter.error(error_type, description, line_num)
+
+
+# returns the python bool held by value, the Value of an if or while condition, after checking it is a bool
+def check_condition(obj, value, description, line_num):
+    if value.t != BOOL_TYPE:
+        obj.interpreter.error(ErrorType.TYPE_ERROR, description, line_num)
+    return value.v
+
+
+# returns value after checking that it can be assigned to a variable of type var_type
+def assign(obj, var_type, value, line_num):
+    check_assignment(obj, var_type, value, line_num)
+    return value
+
+
+# like assign, for variables of class types; a null takes the type of the variable
+def assign_object(obj, var_type, value, line_num):
+    check_assignment(obj, var_type, value, line_num)
+    return nullable(value, var_type)
+
+
+# returns value, or a null of type var_type if value is null
+def nullable(value, var_type):
+    if value.is_null():
+        return Value(var_type, None)
+    return value
+
+
+# returns value after checking it is not a null object reference
+def not_null(obj, value, line_num):
+    if value.is_null():
+        obj.interpreter.error(ErrorType.FAULT_ERROR, "null dereference", line_num)
+    return value
+
+
+# returns the superclass part of obj, after checking it has one
+def super_object(obj, line_num):
+    if not obj.super_object:
+        obj.interpreter.error(
+            ErrorType.TYPE_ERROR,
+            "invalid call to super object by class " + obj.class_def.get_name(),
+            line_num,
+        )
+    return obj.super_object
+
+
+# returns the result of a method returning return_type, after checking it can be returned
+def check_return(obj, return_type, result, line_num):
+    if result.is_typeless_null():
+        check_assignment(obj, return_type, result, line_num)
+        result = Value(return_type, None)  # propagate return type to null
+    check_assignment(obj, return_type, result, line_num)
+    return result
+
+
+# returns the text (print) shows for a Value
+def format_value(value):
+    if value.t == BOOL_TYPE:
+        return "true" if value.v else "false"
+    return str(value.v)
+
+
+# Prints the python module brewin2py generates for a program; usage: python3 transpilerv2.py <program.brewin>
+def main():
+    from interpreterv2 import Interpreter  # interpreterv2 imports this module
+
+    if len(sys.argv) < 2:
+        raise ValueError("Error: Missing program argument")
+    interpreter = Interpreter(False, None, False)
+    with open(sys.argv[1], encoding="utf-8") as program_file:
+        program = interpreter.compile(program_file)
+    interpreter.type_manager = program.type_manager
+    interpreter.class_index = program.class_index
+    print(Transpiler(interpreter).translate())
+
+
+if __name__ == "__main__":
+    main()
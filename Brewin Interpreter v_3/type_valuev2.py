@@ -1,21 +1,42 @@
+import weakref
+
 from intbase import InterpreterBase
 
 
 # Enumerated type for our different language data types
+#
+# Types are interned: Type(name) returns the one Type object for that name, creating it the first time, so types
+# compare and hash by identity and can be used as dict keys. The intern table holds Types weakly, so the class
+# types of a program go away with it. Template type names like node@int are names like any
+# other. A Type doesn't know its supertype; that depends on the program, so the TypeManager keeps track of it.
 class Type:
-    def __init__(self, type_name, supertype_name=None):
-        self.type_name = type_name
-        self.supertype_name = supertype_name
+    __slots__ = ("type_name", "__weakref__")
+    __interned = weakref.WeakValueDictionary()  # type name -> Type
 
-    def __eq__(self, other):
-        return (
-            self.type_name == other.type_name
-            and self.supertype_name == other.supertype_name
-        )
+    def __new__(cls, type_name):
+        type_obj = Type.__interned.get(type_name)
+        if type_obj is None:
+            type_obj = super().__new__(cls)
+            type_obj.type_name = str(type_name)  # not a token that carries its line number around
+            Type.__interned[type_obj.type_name] = type_obj
+        return type_obj
+
+    # copies and unpickled Types are the interned one too
+    def __reduce__(self):
+        return Type, (self.type_name,)
+
+    def __repr__(self):
+        return f"Type({self.type_name!r})"
 
 
 # Represents a value, which has a type and its value
+#
+# Values are immutable once created: literals, defaults and the singletons below are shared by every variable and
+# expression holding them. Use the *_value functions below to make primitive Values, so the common ones are shared
+# instead of allocated.
 class Value:
+    __slots__ = ("t", "v")
+
     def __init__(self, type_obj, value=None):
         self.t = type_obj
         self.v = value
@@ -23,52 +44,112 @@ class Value:
     def value(self):
         return self.v
 
-    def set(self, other):
-        self.t = other.t
-        self.v = other.v
-
     def type(self):
         return self.t
 
     def is_null(self):
-        return self.v == None and self.t != Type(InterpreterBase.NOTHING_DEF)
-  
+        return self.v is None and self.t is not NOTHING_TYPE
+
     def is_typeless_null(self):
-        return self.v == None and self.t == Type(InterpreterBase.NULL_DEF)
+        return self.v is None and self.t is NULL_TYPE
     
     def __eq__(self, other):
         return self.t == other.t and self.v == other.v
 
 
+INT_TYPE = Type(InterpreterBase.INT_DEF)
+STRING_TYPE = Type(InterpreterBase.STRING_DEF)
+BOOL_TYPE = Type(InterpreterBase.BOOL_DEF)
+NULL_TYPE = Type(InterpreterBase.NULL_DEF)
+NOTHING_TYPE = Type(InterpreterBase.NOTHING_DEF)
+
+# shared Values
+TRUE_VALUE = Value(BOOL_TYPE, True)
+FALSE_VALUE = Value(BOOL_TYPE, False)
+NULL_VALUE = Value(NULL_TYPE, None)  # the typeless null
+NOTHING_VALUE = Value(NOTHING_TYPE, None)  # the result of a void method
+EMPTY_STRING_VALUE = Value(STRING_TYPE, "")
+SMALL_INT_MIN = -128
+SMALL_INT_MAX = 1023
+SMALL_INT_VALUES = [Value(INT_TYPE, n) for n in range(SMALL_INT_MIN, SMALL_INT_MAX + 1)]
+
+
+def int_value(n):
+    if SMALL_INT_MIN <= n <= SMALL_INT_MAX:
+        return SMALL_INT_VALUES[n - SMALL_INT_MIN]
+    return Value(INT_TYPE, n)
+
+
+def bool_value(b):
+    return TRUE_VALUE if b else FALSE_VALUE
+
+
+def string_value(s):
+    return EMPTY_STRING_VALUE if s == "" else Value(STRING_TYPE, s)
+
+
+# the function that makes Values of each primitive type from python values
+VALUE_FACTORIES = {INT_TYPE: int_value, BOOL_TYPE: bool_value, STRING_TYPE: string_value}
+
+
 # val is a string with the value we want to use to construct a Value object.
 # e.g., '1234' 'null' 'true' '"foobar"'
 def create_value(val):
     if val == InterpreterBase.TRUE_DEF:
-        return Value(Type(InterpreterBase.BOOL_DEF), True)
+        return Value(BOOL_TYPE, True)
     elif val == InterpreterBase.FALSE_DEF:
-        return Value(Type(InterpreterBase.BOOL_DEF), False)
+        return Value(BOOL_TYPE, False)
     elif val[0] == '"':
-        return Value(Type(InterpreterBase.STRING_DEF), val.strip('"'))
+        return Value(STRING_TYPE, val.strip('"'))
     elif val.lstrip('-').isnumeric():
-        return Value(Type(InterpreterBase.INT_DEF), int(val))
+        return Value(INT_TYPE, int(val))
     elif val == InterpreterBase.NULL_DEF:
-        return Value(Type(InterpreterBase.NULL_DEF), None)
+        return Value(NULL_TYPE, None)
     else:
         return None
 
 
+# Resolves literal tokens into Values once, so that every occurrence of a literal in the programs an interpreter
+# loads shares a single Value (and Type) instead of allocating its own. Values are never modified once created, so
+# sharing them is safe. get returns None for tokens that aren't literals, like create_value. Literals with a shared
+# Value above (true, false, null, small ints and "") resolve to it without an entry, and so do names, so the pool
+# only holds the strings and large ints whose Values it saves allocating again.
+class LiteralPool:
+    def __init__(self):
+        self.values = {}  # literal token -> Value
+
+    def get(self, token):
+        value = self.values.get(token)
+        if value is not None:
+            return value
+        value = create_value(token)
+        if value is None:
+            return None
+        if value.t is BOOL_TYPE:
+            return bool_value(value.v)
+        if value.t is NULL_TYPE:
+            return NULL_VALUE
+        if value.t is INT_TYPE and SMALL_INT_MIN <= value.v <= SMALL_INT_MAX:
+            return int_value(value.v)
+        if value.v == "":
+            return EMPTY_STRING_VALUE
+        self.values[token] = value
+        return value
+
+    def __len__(self):
+        return len(self.values)
+
+
 # create a default value of the specified type; type_def is a Type object
 def create_default_value(type_def):
-    if type_def == Type(InterpreterBase.BOOL_DEF):
-        return Value(Type(InterpreterBase.BOOL_DEF), False)
-    elif type_def == Type(InterpreterBase.STRING_DEF):
-        return Value(Type(InterpreterBase.STRING_DEF), "")
-    elif type_def == Type(InterpreterBase.INT_DEF):
-        return Value(Type(InterpreterBase.INT_DEF), 0)
-    elif type_def == Type(
-        InterpreterBase.NOTHING_DEF
-    ):  # used for void return type on methods
-        return Value(Type(InterpreterBase.NOTHING_DEF), None)
+    if type_def is BOOL_TYPE:
+        return FALSE_VALUE
+    elif type_def is STRING_TYPE:
+        return EMPTY_STRING_VALUE
+    elif type_def is INT_TYPE:
+        return int_value(0)
+    elif type_def is NOTHING_TYPE:  # used for void return type on methods
+        return NOTHING_VALUE
     else:
         return Value(
             type_def, None
@@ -77,9 +158,15 @@ def create_default_value(type_def):
 
 # Used to track user-defined types (for classes) as well as check for type compatibility between
 # values of same/different types for assignment/comparison
+#
+# Once every class has been added, freeze numbers the types in depth-first order of the hierarchy, so the subtypes of
+# each type are the types numbered from it to the last type in its subtree; is_a_subtype then compares two numbers
+# instead of walking the supertype chain. Adding a class unfreezes the manager until freeze is called again.
 class TypeManager:
     def __init__(self):
         self.map_typename_to_type = {}
+        self.supertype_names = {}  # typename -> the name of its supertype, or None
+        self.intervals = None  # typename -> (depth-first number, number of the last type in its subtree) once frozen
         self.__setup_primitive_types()
 
     # used to register a new class name (and its supertype name, if present as a valid type so it can be used
@@ -87,8 +174,35 @@ class TypeManager:
     # needs to be called the moment we parse the class name and superclass name to enable things like linked lists
     # and other self-referential structures
     def add_class_type(self, class_name, superclass_name):
-        class_type = Type(class_name, superclass_name)
-        self.map_typename_to_type[class_name] = class_type
+        self.map_typename_to_type[class_name] = Type(class_name)
+        self.supertype_names[class_name] = superclass_name
+        self.intervals = None
+
+    # encodes the hierarchy of the types added so far for constant time subtype tests
+    def freeze(self):
+        subtypes = {typename: [] for typename in self.map_typename_to_type}
+        roots = []
+        for typename, supertype_name in self.supertype_names.items():
+            if supertype_name in subtypes:
+                subtypes[supertype_name].append(typename)
+            else:
+                roots.append(typename)
+        first_numbers = {}
+        intervals = {}
+        # the hierarchy may be thousands of classes deep, so the depth-first walk keeps its own stack;
+        # a typename is pushed once to number it, and once more with the flag set to close its subtree
+        stack = [(typename, False) for typename in reversed(roots)]
+        number = 0
+        while stack:
+            typename, closing = stack.pop()
+            if closing:
+                intervals[typename] = (first_numbers[typename], number - 1)
+                continue
+            first_numbers[typename] = number
+            number += 1
+            stack.append((typename, True))
+            stack.extend((subtype, False) for subtype in reversed(subtypes[typename]))
+        self.intervals = intervals
 
     def is_valid_type(self, typename):
         return typename in self.map_typename_to_type
@@ -101,6 +215,17 @@ class TypeManager:
 
     # args are strings
     def is_a_subtype(self, suspected_supertype, suspected_subtype):
+        intervals = self.intervals
+        if intervals is None:
+            return self.__is_a_subtype_by_walking(suspected_supertype, suspected_subtype)
+        supertype_interval = intervals.get(suspected_supertype)
+        subtype_interval = intervals.get(suspected_subtype)
+        if supertype_interval is None or subtype_interval is None:
+            return False
+        return supertype_interval[0] <= subtype_interval[0] <= supertype_interval[1]
+
+    # is_a_subtype for a manager that isn't frozen
+    def __is_a_subtype_by_walking(self, suspected_supertype, suspected_subtype):
         if not self.is_valid_type(suspected_supertype) or not self.is_valid_type(
             suspected_subtype
         ):
@@ -111,11 +236,11 @@ class TypeManager:
                 suspected_supertype == cur_type
             ):  # passing a Student object to a Student parameter
                 return True
-            type_info = self.get_type_info(cur_type)
-            if type_info.supertype_name is None:
+            supertype_name = self.supertype_names[cur_type]
+            if supertype_name is None:
                 return False
             cur_type = (
-                type_info.supertype_name #check suspected supertype is in the inheritance chain
+                supertype_name #check suspected supertype is in the inheritance chain
             )  # check the base class of the subtype next
 
     # typea and typeb are Type objects
@@ -137,7 +262,7 @@ class TypeManager:
         ):  # person == animal
             return True
         # if the types are identical then they're compatible
-        if typea == typeb:
+        if typea is typeb:
             return True
         # if either is a primitive type, but the types aren't the same, they can't match
         if (
@@ -163,15 +288,6 @@ class TypeManager:
             InterpreterBase.STRING_DEF,
             InterpreterBase.BOOL_DEF,
         }
-        self.map_typename_to_type[InterpreterBase.INT_DEF] = Type(
-            InterpreterBase.INT_DEF
-        )
-        self.map_typename_to_type[InterpreterBase.STRING_DEF] = Type(
-            InterpreterBase.STRING_DEF
-        )
-        self.map_typename_to_type[InterpreterBase.BOOL_DEF] = Type(
-            InterpreterBase.BOOL_DEF
-        )
-        self.map_typename_to_type[InterpreterBase.NULL_DEF] = Type(
-            InterpreterBase.NULL_DEF
-        )
+        for type_obj in (INT_TYPE, STRING_TYPE, BOOL_TYPE, NULL_TYPE):
+            self.map_typename_to_type[type_obj.type_name] = type_obj
+            self.supertype_names[type_obj.type_name] = None
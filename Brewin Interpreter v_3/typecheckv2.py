@@ -0,0 +1,406 @@
+import sys
+
+from astv2 import (
+    BeginStmt,
+    LetStmt,
+    SetStmt,
+    IncrementLocalStmt,
+    IncrementFieldStmt,
+    InputStmt,
+    IfStmt,
+    WhileStmt,
+    ReturnStmt,
+    PrintStmt,
+    CallStmt,
+    UnknownStmt,
+    LiteralExpr,
+    LocalRef,
+    VarRef,
+    MeExpr,
+    BinOpExpr,
+    CompareLocalExpr,
+    UnaryOpExpr,
+    NewExpr,
+    CallExpr,
+    UnknownExpr,
+)
+from intbase import InterpreterBase, ErrorType
+from operationsv2 import PRIMITIVE_OPERATIONS, BOOL_RESULT_OPERATORS, is_known_type
+from operationsv2 import type_mismatch_description, invalid_default_description, condition_error_description
+from type_valuev2 import Type, INT_TYPE, STRING_TYPE, BOOL_TYPE, NULL_TYPE, VALUE_FACTORIES
+
+
+# An error the program reports if the code at line_num runs
+class TypeCheckError:
+    def __init__(self, error_type, description, line_num):
+        self.error_type = error_type
+        self.description = description
+        self.line_num = line_num
+
+    def __str__(self):
+        return f"{self.error_type} on line {self.line_num}: {self.description}"
+
+
+# Whole-program static type checker. It runs once over the method bodies of a compiled program, given by an
+# interpreter that holds its type manager and class index, and:
+# - clears dynamic_check on each node (see astv2.py) whose runtime type check is proven to always pass, and sets
+#   the operation of binary operations on operands of a known primitive type, so the tree walker skips the checks;
+# - returns a TypeCheckError for each site that reports an error whenever it runs, without running the program.
+#
+# Each expression is given a static Type, or None if its type isn't known. The static type of an expression of a
+# primitive type (or null) is its exact type, and that of an expression of a class type is an upper bound: the
+# expression evaluates to an object of that class or a subclass, or to a null of that type, except for (new) whose
+# class is exact. Like the tree walker, the checker allows an object to be assigned to a variable of a subclass,
+# leaving the check to runtime.
+class TypeChecker:
+    def __init__(self, interpreter):
+        self.interpreter = interpreter
+        self.errors = []
+        # (method name, number of parameters) -> the return type of every method with that signature, or None if
+        # they don't all return the same type; a call's result comes from one of them
+        self.return_types = {}
+        self.method_names = set()
+        for class_def in interpreter.class_index.values():
+            for method_def in class_def.get_methods():
+                signature = (method_def.get_method_name(), len(method_def.formal_params))
+                return_type = method_def.get_return_type()
+                if signature not in self.return_types:
+                    self.return_types[signature] = return_type
+                elif not is_known_type(self.return_types[signature], return_type):
+                    self.return_types[signature] = None
+                self.method_names.add(method_def.get_method_name())
+
+    # checks every method of the program; returns the list of TypeCheckErrors found
+    def check(self):
+        main_class = self.interpreter.class_index.get(InterpreterBase.MAIN_CLASS_DEF)
+        if main_class is None:
+            self.report(ErrorType.TYPE_ERROR, f"No class named {InterpreterBase.MAIN_CLASS_DEF} found", None)
+        elif not self.__has_main_method(main_class):
+            self.report(ErrorType.NAME_ERROR, "unknown method " + InterpreterBase.MAIN_FUNC_DEF, None)
+        for class_def in self.interpreter.class_index.values():
+            for method_def in class_def.get_methods():
+                MethodChecker(self, class_def, method_def).check()
+        return self.errors
+
+    # returns True if class_def or one of its superclasses has a main method without parameters
+    @staticmethod
+    def __has_main_method(class_def):
+        while class_def is not None:
+            method_def = class_def.method_map.get(InterpreterBase.MAIN_FUNC_DEF)
+            if method_def is not None and not method_def.formal_params:
+                return True
+            class_def = class_def.get_superclass()
+        return False
+
+    def report(self, error_type, description, line_num):
+        self.errors.append(TypeCheckError(error_type, description, line_num))
+
+
+# Checks the body of one method (see TypeChecker)
+class MethodChecker:
+    def __init__(self, checker, class_def, method_def):
+        self.checker = checker
+        self.interpreter = checker.interpreter
+        self.class_def = class_def
+        self.method_def = method_def
+
+    def check(self):
+        if self.method_def.duplicate_param_name is not None:
+            self.checker.report(
+                ErrorType.NAME_ERROR,
+                "duplicate formal param name " + self.method_def.duplicate_param_name,
+                self.method_def.line_num,
+            )
+            return  # the body never runs
+        self.__check_statement(self.method_def.body)
+
+    # returns True if a value of static type value_type can always be assigned to a variable of type var_type
+    def __always_assignable(self, var_type, value_type):
+        return value_type is not None and self.interpreter.check_type_compatibility(
+            var_type, value_type, True
+        )
+
+    # returns True if a value of static type value_type can never be assigned to a variable of type var_type; exact
+    # is True if value_type is the exact type of the value
+    def __never_assignable(self, var_type, value_type, exact=False):
+        if value_type is None or self.__always_assignable(var_type, value_type):
+            return False
+        # an object whose static type is a superclass of the variable's type may be of the variable's type
+        return exact or not self.interpreter.is_a_subtype(value_type.type_name, var_type.type_name)
+
+    # checks an assignment; returns True if its runtime check always passes
+    def __check_assignment(self, var_type, value_type, line_num, exact=False):
+        if self.__always_assignable(var_type, value_type):
+            return True
+        if self.__never_assignable(var_type, value_type, exact):
+            self.checker.report(
+                ErrorType.TYPE_ERROR,
+                type_mismatch_description(var_type, value_type),
+                line_num,
+            )
+        return False
+
+    def __check_statement(self, code):
+        MethodChecker.__statement_checkers[type(code)](self, code)
+
+    def __check_unknown(self, code):
+        self.checker.report(ErrorType.SYNTAX_ERROR, code.description, code.line_num)
+
+    # (begin (statement1) (statement2) ... (statementn))
+    def __check_begin(self, code):
+        for statement in code.statements:
+            self.__check_statement(statement)
+
+    # (let ((type1 var1 defaultvalue1) ... (typen varn defaultvaluen)) (statement1) ... (statementn))
+    def __check_let(self, code):
+        for local_def in code.local_defs:
+            if local_def.default_value is None:
+                self.checker.report(ErrorType.TYPE_ERROR, invalid_default_description(local_def), code.line_num)
+            else:
+                local_def.dynamic_check = not self.__check_assignment(
+                    local_def.type, local_def.default_value.type(), code.line_num
+                )
+            if local_def.slot is None:
+                self.checker.report(
+                    ErrorType.NAME_ERROR, "duplicate local variable name " + local_def.name, code.line_num
+                )
+        self.__check_begin(code)
+
+    # (set varname expression)
+    def __check_set(self, code):
+        value_type = self.__check_expression(code.expression)
+        code.dynamic_check = not self.__check_target(
+            code, value_type, isinstance(code.expression, NewExpr)
+        )
+
+    # (inputs varname) or (inputi varname)
+    def __check_input(self, code):
+        code.dynamic_check = not self.__check_target(code, STRING_TYPE if code.is_string else INT_TYPE)
+
+    # checks the assignment of a value of static type value_type by a SetStmt or InputStmt; returns True if its
+    # runtime check always passes
+    def __check_target(self, code, value_type, exact=True):
+        if code.slot is not None:
+            return self.__check_assignment(code.var_type, value_type, code.line_num, exact)
+        field_def = self.class_def.field_map.get(code.name)
+        if field_def is not None:
+            return self.__check_assignment(field_def.type, value_type, code.line_num, exact)
+        self.checker.report(ErrorType.NAME_ERROR, "unknown field/variable " + code.name, code.line_num)
+        return False
+
+    # (if expression (statement) [(statement)])
+    def __check_if(self, code):
+        code.dynamic_check = not self.__check_condition(code)
+        self.__check_statement(code.then_statement)
+        if code.else_statement is not None:
+            self.__check_statement(code.else_statement)
+
+    # (while expression (statement))
+    def __check_while(self, code):
+        code.dynamic_check = not self.__check_condition(code)
+        self.__check_statement(code.body)
+
+    # returns True if the condition of an if or while is always a bool
+    def __check_condition(self, code):
+        condition_type = self.__check_expression(code.condition)
+        if condition_type is None:
+            return False
+        if is_known_type(condition_type, BOOL_TYPE):
+            return True
+        self.checker.report(ErrorType.TYPE_ERROR, condition_error_description(code), code.line_num)
+        return False
+
+    # (return [expression])
+    def __check_return(self, code):
+        if code.expression is None:
+            return
+        value_type = self.__check_expression(code.expression)
+        if is_known_type(value_type, NULL_TYPE):
+            # the null takes the return type, which the tree walker does in its dynamic check
+            self.__check_assignment(self.method_def.get_return_type(), value_type, code.line_num)
+            return
+        code.dynamic_check = not self.__check_assignment(
+            self.method_def.get_return_type(),
+            value_type,
+            code.line_num,
+            isinstance(code.expression, NewExpr),
+        )
+
+    # (print expression1 expression2 ...)
+    def __check_print(self, code):
+        for expr in code.expressions:
+            self.__check_expression(expr)
+
+    # (call object_ref/me/super methodname param1 param2 ...) as a statement
+    def __check_call_statement(self, code):
+        self.__check_call(code.call)
+
+    # returns the static Type of an expression
+    def __check_expression(self, expr):
+        return MethodChecker.__expression_checkers[type(expr)](self, expr)
+
+    def __check_local_ref(self, expr):
+        return expr.var_type
+
+    # a field, or a literal or me that a field could have shadowed
+    def __check_var_ref(self, expr):
+        field_def = self.class_def.field_map.get(expr.name)
+        if field_def is not None:
+            return field_def.type
+        if expr.literal is not None:
+            return expr.literal.type()
+        if expr.name == InterpreterBase.ME_DEF:
+            return self.__check_me(expr)
+        self.checker.report(ErrorType.NAME_ERROR, "invalid field or parameter " + expr.name, expr.line_num)
+        return None
+
+    def __check_literal(self, expr):
+        return expr.value.type()
+
+    def __check_me(self, _expr):
+        return Type(self.class_def.get_name())
+
+    def __check_unknown_expression(self, _expr):
+        return None
+
+    # (op expression1 expression2)
+    def __check_binary_operation(self, expr):
+        left_type = self.__check_expression(expr.left)
+        right_type = self.__check_expression(expr.right)
+        result_type = BOOL_TYPE if expr.operator in BOOL_RESULT_OPERATORS else None
+        if left_type is None or right_type is None:
+            return result_type
+        left_primitive = left_type.type_name in PRIMITIVE_OPERATIONS
+        right_primitive = right_type.type_name in PRIMITIVE_OPERATIONS
+        if left_primitive and left_type == right_type:
+            operations, description = PRIMITIVE_OPERATIONS[left_type.type_name]
+            if expr.operator not in operations:
+                self.checker.report(ErrorType.TYPE_ERROR, description, expr.line_num)
+                return None
+            function, result_type = operations[expr.operator]
+            expr.operation = (function, VALUE_FACTORIES[result_type])
+            return result_type
+        # objects can only be compared if one's class is derived from the other's, or one is null
+        if (
+            left_primitive
+            or right_primitive
+            or not self.interpreter.check_type_compatibility(left_type, right_type, False)
+        ):
+            self.checker.report(
+                ErrorType.TYPE_ERROR,
+                f"operator {expr.operator} applied to two incompatible types",
+                expr.line_num,
+            )
+            return None
+        return result_type
+
+    # (op expression)
+    def __check_unary_operation(self, expr):
+        if is_known_type(self.__check_expression(expr.operand), BOOL_TYPE):
+            return BOOL_TYPE
+        return None
+
+    # (new classname)
+    def __check_new(self, expr):
+        if expr.class_name not in self.interpreter.class_index:
+            self.checker.report(ErrorType.TYPE_ERROR, f"No class named {expr.class_name} found", expr.line_num)
+            return None
+        return expr.class_type
+
+    # (call object_ref/me/super methodname p1 p2 p3)
+    def __check_call(self, expr):
+        # the classes whose methods (or their superclasses') the call may run, or None if they aren't known
+        candidate_classes = None
+        if expr.target is CallExpr.ME:
+            candidate_classes = [self.class_def]
+        elif expr.target is CallExpr.SUPER:
+            if self.class_def.get_superclass() is None:
+                self.checker.report(
+                    ErrorType.TYPE_ERROR,
+                    "invalid call to super object by class " + self.class_def.get_name(),
+                    expr.line_num,
+                )
+                return None
+            candidate_classes = [self.class_def.get_superclass()]
+        else:
+            target_type = self.__check_expression(expr.target)
+            if is_known_type(target_type, NULL_TYPE):
+                self.checker.report(ErrorType.FAULT_ERROR, "null dereference", expr.line_num)
+                return None
+            if target_type is not None and target_type.type_name in self.interpreter.class_index:
+                # the object may be of the target's class or any class derived from it
+                candidate_classes = [
+                    class_def
+                    for class_def in self.interpreter.class_index.values()
+                    if self.interpreter.is_a_subtype(target_type.type_name, class_def.get_name())
+                ]
+        arg_types = [self.__check_expression(arg) for arg in expr.args]
+        if candidate_classes is not None and not any(
+            self.__may_have_method(class_def, expr.method_name, arg_types)
+            for class_def in candidate_classes
+        ):
+            self.checker.report(ErrorType.NAME_ERROR, "unknown method " + expr.method_name, expr.line_num)
+            return None
+        return self.checker.return_types.get((expr.method_name, len(expr.args)))
+
+    # returns True if class_def or one of its superclasses may have a method named method_name that takes
+    # arguments of static types arg_types
+    def __may_have_method(self, class_def, method_name, arg_types):
+        while class_def is not None:
+            method_def = class_def.method_map.get(method_name)
+            if (
+                method_def is not None
+                and len(method_def.formal_params) == len(arg_types)
+                and not any(
+                    self.__never_assignable(formal.type, arg_type)
+                    for formal, arg_type in zip(method_def.formal_params, arg_types)
+                )
+            ):
+                return True
+            class_def = class_def.get_superclass()
+        return False
+
+    __statement_checkers = {
+        BeginStmt: __check_begin,
+        LetStmt: __check_let,
+        SetStmt: __check_set,
+        IncrementLocalStmt: __check_set,
+        IncrementFieldStmt: __check_set,
+        InputStmt: __check_input,
+        IfStmt: __check_if,
+        WhileStmt: __check_while,
+        ReturnStmt: __check_return,
+        PrintStmt: __check_print,
+        CallStmt: __check_call_statement,
+        UnknownStmt: __check_unknown,
+    }
+    __expression_checkers = {
+        LiteralExpr: __check_literal,
+        LocalRef: __check_local_ref,
+        VarRef: __check_var_ref,
+        MeExpr: __check_me,
+        BinOpExpr: __check_binary_operation,
+        CompareLocalExpr: __check_binary_operation,
+        UnaryOpExpr: __check_unary_operation,
+        NewExpr: __check_new,
+        CallExpr: __check_call,
+        UnknownExpr: __check_unknown_expression,
+    }
+
+
+# Reports the type errors in a program without running it; usage: python3 typecheckv2.py <program.brewin>
+def main():
+    from interpreterv2 import Interpreter  # interpreterv2 imports this module
+
+    if len(sys.argv) < 2:
+        raise ValueError("Error: Missing program argument")
+    interpreter = Interpreter(False, None, False)
+    with open(sys.argv[1], encoding="utf-8") as program_file:
+        errors = interpreter.check(program_file)
+    for error in errors:
+        print(error)
+    sys.exit(1 if errors else 0)
+
+
+if __name__ == "__main__":
+    main()